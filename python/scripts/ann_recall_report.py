@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-brute-force report for the approximate face index.
+
+Usage:
+    python scripts/ann_recall_report.py --synthetic 100000
+    python scripts/ann_recall_report.py --from-db --nlist 512 --nprobe 4 8 16 32
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+from the_judge.infrastructure.tracking.ivf_index import IVFIndex
+
+
+def synthetic_gallery(size, dim=512, identities=None, seed=0):
+    """Clustered unit vectors: several noisy captures per simulated visitor."""
+    rng = np.random.default_rng(seed)
+    identities = identities or max(1, size // 20)
+    centers = rng.standard_normal((identities, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, identities, size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"emb-{i}" for i in range(size)], vectors
+
+
+def database_gallery():
+    from the_judge.domain.tracking.model import FaceEmbedding
+    from the_judge.infrastructure.db.engine import initialize_database
+    from the_judge.infrastructure.db.unit_of_work import SqlAlchemyUnitOfWork
+
+    initialize_database()
+    with SqlAlchemyUnitOfWork() as uow:
+        embeddings = [e for e in uow.repository.list(FaceEmbedding) if e.normed_embedding is not None]
+    return [e.id for e in embeddings], np.stack([e.normed_embedding for e in embeddings])
+
+
+def recall_at_k(index, exact, queries, k):
+    """Fraction of the exact top-k that the index also returns, plus mean latency per query."""
+    truth = exact.search(queries, k)
+    start = time.perf_counter()
+    found = [index.search(q, k)[0] for q in queries]
+    latency = (time.perf_counter() - start) / len(queries)
+
+    hits = sum(len({hit[0] for hit in t} & {hit[0] for hit in f}) for t, f in zip(truth, found))
+    return hits / sum(len(t) for t in truth), latency
+
+
+def exact_latency(exact, queries, k):
+    start = time.perf_counter()
+    for q in queries:
+        exact.search(q, k)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=50000, help="Synthetic gallery size")
+    parser.add_argument("--from-db", action="store_true", help="Use embeddings from the configured database")
+    parser.add_argument("--nlist", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=1)
+    args = parser.parse_args()
+
+    ids, vectors = database_gallery() if args.from_db else synthetic_gallery(args.synthetic)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = EmbeddingGallery()
+    owners = ids  # Visitor ids are irrelevant for recall; reuse the embedding ids
+    exact.add(ids, owners, vectors)
+    print(f"Gallery: {len(ids)} embeddings, dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+    print(f"Brute force: {exact_latency(exact, queries, args.k) * 1e3:.3f} ms/query\n")
+    print(f"{'nlist':>6} {'nprobe':>7} {'recall':>8} {'ms/query':>9} {'build s':>8}")
+
+    for nlist in args.nlist:
+        start = time.perf_counter()
+        index = IVFIndex(nlist=nlist, min_points_per_list=1)
+        index.load(ids, owners, vectors)
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            recall, latency = recall_at_k(index, exact, queries, args.k)
+            print(f"{nlist:>6} {nprobe:>7} {recall:>8.3f} {latency * 1e3:>9.3f} {build:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark face/body matching: the original per-pair loop against the vectorized
+cost matrix, and the dense assignment against the spatially pre-filtered one.
+
+Usage:
+    python scripts/bench_face_body_matcher.py --faces 30 300 1000 --bodies 40 400 1300 --repeat 20
+
+The default sizes run up to crowds large enough for the matcher to take the sparse path
+(the "used" column shows which one FaceBodyMatcher picks at each size).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from the_judge.infrastructure.tracking.face_body_matcher import FaceBodyMatcher
+
+
+def crowded_scene(faces, bodies, width=3840, height=2160, seed=0):
+    """People scattered over a wide frame: a body per person, a face near the top of most bodies."""
+    rng = np.random.default_rng(seed)
+    body_w = rng.uniform(80, 260, bodies)
+    body_h = body_w * rng.uniform(2.2, 3.2, bodies)
+    bx1 = rng.uniform(0, width - body_w)
+    by1 = rng.uniform(0, height - body_h)
+    body_boxes = np.stack([bx1, by1, bx1 + body_w, by1 + body_h], axis=1).round()
+
+    owners = rng.integers(0, bodies, faces)
+    face_w = body_w[owners] * rng.uniform(0.18, 0.4, faces)
+    fx1 = bx1[owners] + (body_w[owners] - face_w) * rng.uniform(0.2, 0.8, faces)
+    fy1 = by1[owners] + body_h[owners] * rng.uniform(0.0, 0.15, faces)
+    face_boxes = np.stack([fx1, fy1, fx1 + face_w, fy1 + face_w * 1.2], axis=1).round()
+    return face_boxes, body_boxes
+
+
+def legacy_cost_matrix(face_boxes, body_boxes):
+    """The original nested-loop scoring, kept as the reference implementation."""
+    cost_matrix = np.zeros((len(face_boxes), len(body_boxes)))
+
+    for i, (fx1, fy1, fx2, fy2) in enumerate(face_boxes.tolist()):
+        for j, (bx1, by1, bx2, by2) in enumerate(body_boxes.tolist()):
+            ix1, iy1 = max(fx1, bx1), max(fy1, by1)
+            ix2, iy2 = min(fx2, bx2), min(fy2, by2)
+
+            if ix1 >= ix2 or iy1 >= iy2:
+                cost_matrix[i, j] = 1.0
+                continue
+
+            intersection_area = (ix2 - ix1) * (iy2 - iy1)
+            face_area = (fx2 - fx1) * (fy2 - fy1)
+            proportion_inside = intersection_area / face_area
+
+            if proportion_inside == 0.0:
+                cost_matrix[i, j] = 1.0
+                continue
+
+            face_center_y = (fy1 + fy2) / 2
+            body_height = by2 - by1
+            body_top_region = by1 + body_height * 0.4
+            vertical_dist_from_top = max(0, face_center_y - body_top_region)
+            vertical_position = np.exp(-vertical_dist_from_top / (body_height * 0.25))
+
+            face_width = fx2 - fx1
+            body_width = bx2 - bx1
+
+            if body_width <= 0:
+                cost_matrix[i, j] = 1.0
+                continue
+
+            width_ratio = face_width / body_width
+            if width_ratio >= 0.25:
+                width_score = 1.0
+            elif width_ratio >= 0.15:
+                width_score = 0.2
+            else:
+                width_score = 0.0
+
+            if width_score <= 0.0:
+                cost_matrix[i, j] = 1.0
+                continue
+
+            match_score = (
+                proportion_inside * 0.5 +
+                vertical_position * 0.3 +
+                width_score * 0.2
+            )
+
+            cost_matrix[i, j] = 1.0 - match_score
+
+    return cost_matrix
+
+
+def total_score(assignments):
+    """Matching quality; both solvers are optimal, so only ties may pick different pairs."""
+    return sum(score for _, _, score in assignments if score > 0)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, nargs="+", default=[10, 30, 100, 300, 600, 1000])
+    parser.add_argument("--bodies", type=int, nargs="+", default=[15, 40, 130, 400, 800, 1300])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    matcher = FaceBodyMatcher()
+    print("Cost matrix")
+    print(f"{'faces':>6} {'bodies':>7} {'loop ms':>9} {'vector ms':>10} {'speedup':>8} {'max |diff|':>11}")
+    for faces, bodies in zip(args.faces, args.bodies):
+        face_boxes, body_boxes = crowded_scene(faces, bodies)
+        legacy, legacy_time = timed(lambda: legacy_cost_matrix(face_boxes, body_boxes), args.repeat)
+        vector, vector_time = timed(lambda: FaceBodyMatcher._cost_matrix(face_boxes, body_boxes), args.repeat)
+        diff = float(np.abs(legacy - vector).max())
+        print(f"{faces:>6} {bodies:>7} {legacy_time * 1e3:>9.3f} {vector_time * 1e3:>10.3f} "
+              f"{legacy_time / vector_time:>7.1f}x {diff:>11.2e}")
+
+    print("\nAssignment")
+    print(f"{'faces':>6} {'bodies':>7} {'dense ms':>9} {'sparse ms':>10} {'speedup':>8} {'optimal':>8} {'used':>7}")
+    for faces, bodies in zip(args.faces, args.bodies):
+        face_boxes, body_boxes = crowded_scene(faces, bodies)
+        dense, dense_time = timed(lambda: matcher._assign_dense(face_boxes, body_boxes), args.repeat)
+        sparse, sparse_time = timed(lambda: matcher._assign_sparse(face_boxes, body_boxes), args.repeat)
+        same = abs(total_score(dense) - total_score(sparse)) < 1e-9
+        used = "sparse" if faces * bodies >= matcher.sparse_min_pairs else "dense"
+        print(f"{faces:>6} {bodies:>7} {dense_time * 1e3:>9.3f} {sparse_time * 1e3:>10.3f} "
+              f"{dense_time / sparse_time:>7.1f}x {str(same):>8} {used:>7}")
+
+
+if __name__ == "__main__":
+    main()
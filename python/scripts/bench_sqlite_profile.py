@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark frame persistence under each SQLite profile.
+
+Several threads persist frames concurrently the way the track stage does (one
+unit of work per frame: history rows plus a visitor update) while another
+thread polls active sessions like the timeout worker.
+
+Usage:
+    python scripts/bench_sqlite_profile.py --frames 500 --threads 4 --faces 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from the_judge.common.datetime_utils import now
+from the_judge.domain.tracking.model import Body, Composite, Face, FaceEmbedding, Frame, Visitor, VisitorSession
+from the_judge.infrastructure.db.engine import SQLITE_PROFILES, create_db_engine
+from the_judge.infrastructure.db.orm import metadata, start_mappers
+from the_judge.infrastructure.db.repository import TrackingRepository
+
+
+def frame_rows(faces):
+    frame = Frame(id=str(uuid.uuid4()), camera_name="camera-1", captured_at=now(), collection_id="bench")
+    rows = [frame]
+    for _ in range(faces):
+        vector = np.random.rand(512).astype(np.float32)
+        embedding = FaceEmbedding(str(uuid.uuid4()), vector, vector / np.linalg.norm(vector))
+        face = Face(str(uuid.uuid4()), frame.id, (10, 10, 50, 50), embedding.id, 1.0, 0.9, 0.8,
+                    "frontal", 30, "F", frame.captured_at)
+        body = Body(str(uuid.uuid4()), frame.id, (0, 0, 80, 200), frame.captured_at)
+        rows.extend([embedding, face, body])
+    return frame, rows
+
+
+def run(profile, frames, threads, faces):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", profile=profile, pool_size=threads + 1)
+    metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+
+    visitors = []
+    with session_factory() as session:
+        for i in range(threads):
+            visitor = Visitor.create_new(f"visitor-{i}", now())
+            session.add(visitor)
+            session.add(VisitorSession(visitor_id=visitor.id, start_frame_id="bench",
+                                       started_at=now(), captured_at=now()))
+            visitors.append(visitor)
+        session.commit()
+
+    latencies = []
+    errors = []
+    done = threading.Event()
+
+    def persist(visitor, count):
+        for _ in range(count):
+            frame, rows = frame_rows(faces)
+            start = time.perf_counter()
+            try:
+                with session_factory() as session:
+                    repository = TrackingRepository(session)
+                    repository.add_all(rows, flush=False)
+                    visitor.frame_count += 1
+                    visitor.last_seen = frame.captured_at
+                    repository.merge(visitor, flush=False)
+                    session.commit()
+            except Exception as error:
+                errors.append(error)
+            latencies.append(time.perf_counter() - start)
+
+    def poll_sessions():
+        while not done.is_set():
+            with session_factory() as session:
+                TrackingRepository(session).list_by(VisitorSession, ended_at=None)
+            time.sleep(0.01)
+
+    poller = threading.Thread(target=poll_sessions)
+    workers = [threading.Thread(target=persist, args=(v, frames // threads)) for v in visitors]
+    poller.start()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    poller.join()
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "frames_per_s": len(latencies) / elapsed,
+        "p50_ms": 1e3 * statistics.median(latencies),
+        "p95_ms": 1e3 * latencies[int(0.95 * (len(latencies) - 1))],
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--faces", type=int, default=3)
+    args = parser.parse_args()
+
+    start_mappers()
+    print(f"{args.frames} frames, {args.threads} writer threads, {args.faces} faces per frame")
+    print(f"{'profile':>11} {'frames/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for profile in SQLITE_PROFILES:
+        result = run(profile, args.frames, args.threads, args.faces)
+        print(f"{profile:>11} {result['frames_per_s']:>9.1f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Re-encode stored face embeddings with the configured embedding_dtype / embedding_storage.
+
+Usage:
+    python scripts/migrate_embeddings.py --batch-size 1000 --vacuum
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from the_judge.infrastructure.db.engine import initialize_database
+from the_judge.infrastructure.db.migrations import migrate_embedding_storage
+from the_judge.settings import get_settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim freed pages afterwards (SQLite)")
+    args = parser.parse_args()
+
+    cfg = get_settings()
+    initialize_database()
+    migrated = migrate_embedding_storage(args.batch_size, vacuum=args.vacuum)
+    print(f"Re-encoded {migrated} embeddings as {cfg.embedding_dtype} ({cfg.embedding_storage})")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from tests.test_visitor_tracking import run_all_tests as run_tracking_tests
 from tests.test_visitor_domain import test_visitor_business_rules
 from tests.test_collection_buffer import run_all_tests as run_buffer_tests
+from tests.test_embedding_gallery import run_all_tests as run_gallery_tests
+from tests.test_face_body_matcher import run_all_tests as run_matcher_tests
+from tests.test_ingest_queue import run_all_tests as run_ingest_tests
+from tests.test_persistence import run_all_tests as run_persistence_tests
 
 
 def main():
@@ -28,6 +32,22 @@ def main():
         run_tracking_tests()
         print("\n" + "=" * 50)
         
+        # Test 4: Embedding gallery search
+        run_gallery_tests()
+        print("\n" + "=" * 50)
+        
+        # Test 5: Face/body assignment
+        run_matcher_tests()
+        print("\n" + "=" * 50)
+        
+        # Test 6: Ingest backpressure
+        run_ingest_tests()
+        print("\n" + "=" * 50)
+        
+        # Test 7: Database persistence
+        run_persistence_tests()
+        print("\n" + "=" * 50)
+        
         print("\n🎉 ALL TESTS PASSED! 🎉")
         print("Your visitor tracking system is working correctly.")
         
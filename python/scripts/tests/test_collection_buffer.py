@@ -2,11 +2,14 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
+import asyncio
 import uuid
 import numpy as np
 
 from the_judge.domain.tracking.model import Face, FaceEmbedding, Body, Composite, Visitor, VisitorState, VisitorCollection
 from the_judge.application.services.collection_buffer import CollectionBuffer
+from the_judge.application.services.collection_batcher import CollectionBatcher
+from the_judge.infrastructure.tracking.face_recognizer import FaceRecognizer
 from the_judge.common.datetime_utils import now
 
 
@@ -111,6 +114,28 @@ def test_collection_buffer():
     assert len(buffer.current_collection.composites) == 3
     print("✓ Visitor deduplication works correctly")
     
+    print("\nTesting: Late frames land in their own collection")
+    
+    window = CollectionBuffer(max_collections=2)
+    first = window.get_or_create_collection("c1")
+    window.get_or_create_collection("c2")
+    assert window.get_or_create_collection("c1") is first
+    assert window.current_collection.id == "c2"
+    assert window.add_composite(create_test_composite(visitor_id="visitor-late"), first) == True
+    assert len(first.composites) == 1 and len(window.current_collection.composites) == 0
+    print("✓ Previous collection still reachable after the next trigger")
+    
+    window.get_or_create_collection("c3")
+    assert len(window) == 2 and window.get_collection("c1") is None
+    print("✓ Oldest collection evicted beyond the window size")
+    
+    current = window.current_collection
+    stale = window.get_or_create_collection("c1")
+    assert stale is not first and len(stale.composites) == 0
+    assert window.current_collection is current and window.get_collection("c1") is None
+    assert len(window) == 2
+    print("✓ Late frames of an evicted collection neither resurrect it nor replace the current one")
+    
     print("\n🎉 All collection buffer tests passed!")
 
 
@@ -160,9 +185,71 @@ def test_composite_enrichment():
     print("\n🎉 All composite enrichment tests passed!")
 
 
+def test_collection_matching():
+    print("\n=== Testing Collection Matching ===\n")
+
+    print("Testing: Best match in the collection wins, not the first above threshold")
+
+    base = np.random.rand(512)
+    base /= np.linalg.norm(base)
+    noise = np.random.rand(512)
+    near = base + 0.05 * noise
+    far = base + 0.6 * noise
+
+    buffer = CollectionBuffer()
+    collection = buffer.get_or_create_collection("match-collection")
+    for visitor_id, vector in (("visitor-far", far), ("visitor-near", near)):
+        composite = create_test_composite(visitor_id=visitor_id)
+        composite.embedding.normed_embedding = vector / np.linalg.norm(vector)
+        buffer.add_composite(composite)
+
+    recognizer = FaceRecognizer(face_model=None, uow_factory=None, threshold=0.5)
+    query = create_test_composite()
+    query.embedding.normed_embedding = base
+    assert recognizer.match_against_collection(query, collection).id == "visitor-near"
+    print("✓ Closest visitor returned")
+
+    query.embedding.normed_embedding = -base
+    assert recognizer.match_against_collection(query, collection) is None
+    assert recognizer.match_against_collection(query, buffer.get_or_create_collection("empty")) is None
+    print("✓ No match below threshold or in an empty collection")
+
+    print("\n🎉 All collection matching tests passed!")
+
+
+def test_collection_batcher():
+    print("\n=== Testing Collection Batcher ===\n")
+
+    print("Testing: Frames grouped per collection, released when complete or late")
+
+    batches = []
+
+    async def on_batch(items):
+        batches.append(items)
+
+    async def scenario():
+        batcher = CollectionBatcher(on_batch, max_wait=0.05, expected_size=lambda: 3)
+        for collection_id, camera in [("c1", "cam-1"), ("c2", "cam-1"), ("c1", "cam-2"), ("c1", "cam-3")]:
+            batcher.add(collection_id, camera)
+        await asyncio.sleep(0)
+        assert batches == [["cam-1", "cam-2", "cam-3"]]
+        await asyncio.sleep(0.1)
+        assert batches[-1] == ["cam-1"]
+        batcher.add("c3", "cam-2")
+        await batcher.drain()
+        assert batches[-1] == ["cam-2"]
+
+    asyncio.run(scenario())
+    print("✓ Complete collection released at once, stragglers after the deadline")
+
+    print("\n🎉 All collection batcher tests passed!")
+
+
 def run_all_tests():
     test_collection_buffer()
     test_composite_enrichment()
+    test_collection_matching()
+    test_collection_batcher()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,277 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from the_judge.infrastructure.db.types.numpy_array import NumpyArray
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+from the_judge.infrastructure.tracking.ivf_index import IVFIndex
+from the_judge.infrastructure.tracking.persistent_index import EmbeddingIndexFile, PersistentIndex
+from the_judge.infrastructure.tracking.prototype_store import PrototypeStore
+
+
+def random_normed(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_gallery_matches_brute_force():
+    print("=== Testing Embedding Gallery ===\n")
+
+    print("Testing: Batched search agrees with per-pair dot products")
+
+    vectors = random_normed(500)
+    ids = [f"emb-{i}" for i in range(len(vectors))]
+    gallery = EmbeddingGallery(initial_capacity=16)
+    gallery.add(ids, [f"visitor-{i % 50}" for i in range(len(ids))], vectors)
+
+    queries = random_normed(8, seed=1)
+    results = gallery.search(queries, k=5)
+
+    for query, hits in zip(queries, results):
+        expected = np.argsort(-(vectors @ query))[:5]
+        assert [h[0] for h in hits] == [ids[i] for i in expected]
+        assert hits[0][1] == f"visitor-{expected[0] % 50}"
+        assert abs(hits[0][2] - float(vectors[expected[0]] @ query)) < 1e-5
+    print("✓ Top-k results match brute force and carry visitor ids")
+
+
+def test_gallery_add_and_remove():
+    print("\nTesting: Removal keeps ids and rows in sync")
+
+    vectors = random_normed(10)
+    ids = [f"emb-{i}" for i in range(len(vectors))]
+    gallery = EmbeddingGallery(initial_capacity=4)
+    owners = [f"visitor-{i}" for i in range(len(ids))]
+    gallery.add(ids, owners, vectors)
+    gallery.add(ids[:3], owners[:3], vectors[:3])  # Duplicates are ignored
+    assert len(gallery) == 10
+
+    gallery.remove(["emb-0", "emb-5", "missing"])
+    assert len(gallery) == 8
+    assert "emb-0" not in gallery and "emb-9" in gallery
+
+    for i in (1, 9):
+        hits = gallery.search(vectors[i], k=1)[0]
+        assert hits[0][:2] == (ids[i], owners[i])
+        assert abs(hits[0][2] - 1.0) < 1e-5
+    print("✓ Swapped rows still resolve to the right ids")
+
+    empty = EmbeddingGallery()
+    assert empty.search(vectors[:2]) == [[], []]
+    print("✓ Empty gallery returns no hits")
+
+    print("\n🎉 All embedding gallery tests passed!")
+
+
+def test_ivf_index():
+    print("\n=== Testing IVF Index ===\n")
+
+    print("Testing: Exact until trained, then exact again with full probing")
+
+    vectors = random_normed(400)
+    ids = [f"emb-{i}" for i in range(len(vectors))]
+    owners = [f"visitor-{i}" for i in range(len(vectors))]
+    index = IVFIndex(nlist=8, nprobe=8, min_points_per_list=40)
+
+    index.add(ids[:100], owners[:100], vectors[:100])
+    assert not index.is_trained
+    assert index.search(vectors[7], k=1)[0][0][0] == "emb-7"
+    print("✓ Untrained index searches exhaustively")
+
+    index.add(ids[100:], owners[100:], vectors[100:])
+    assert index.wait_for_training(timeout=5)
+    assert index.is_trained
+    assert len(index) == 400
+
+    exact = EmbeddingGallery()
+    exact.add(ids, owners, vectors)
+    queries = random_normed(10, seed=2)
+    for ivf_hits, exact_hits in zip(index.search(queries, k=3), exact.search(queries, k=3)):
+        assert [h[:2] for h in ivf_hits] == [h[:2] for h in exact_hits]
+    print("✓ Probing every list reproduces brute-force results")
+
+    print("\nTesting: Removal after training")
+
+    index.nprobe = 1
+    index.remove(["emb-3"])
+    assert "emb-3" not in index and len(index) == 399
+    hits = index.search(vectors[3], k=5)[0]
+    assert "emb-3" not in [h[0] for h in hits]
+    assert index.search(vectors[4], k=1)[0][0][0] == "emb-4"
+    print("✓ Removed embeddings are no longer returned")
+
+    print("\nTesting: Retraining runs off the add path")
+
+    index = IVFIndex(nlist=8, nprobe=8, min_points_per_list=40)
+    release = threading.Event()
+    spherical_kmeans = index._spherical_kmeans
+    index._spherical_kmeans = lambda sample: release.wait(5) and spherical_kmeans(sample)
+    index.add(ids[:320], owners[:320], vectors[:320])
+    assert not index.is_trained and not index.wait_for_training(timeout=0.01)
+    index.add(ids[320:], owners[320:], vectors[320:])
+    index.remove(["emb-5"])
+    assert index.search(vectors[350], k=1)[0][0][0] == "emb-350"
+    print("✓ Adds and searches are served from the old lists while training")
+
+    release.set()
+    assert index.wait_for_training(timeout=5) and index.is_trained
+    assert len(index) == 399 and "emb-5" not in index
+    assert index.search(vectors[350], k=1)[0][0][0] == "emb-350"
+    assert "emb-5" not in [h[0] for h in index.search(vectors[5], k=5)[0]]
+    print("✓ Changes made during training survive the swap")
+
+    print("\nTesting: Loading while a retrain is in flight")
+
+    index = IVFIndex(nlist=8, nprobe=8, min_points_per_list=40)
+    release = threading.Event()
+    index._spherical_kmeans = lambda sample: release.wait(5) and spherical_kmeans(sample)
+    index.add(ids[:320], owners[:320], vectors[:320])
+    index.load(ids[320:], owners[320:], vectors[320:])
+    assert len(index) == 400 and index.loaded
+    release.set()
+    assert index.wait_for_training(timeout=5) and index.is_trained
+    assert len(index) == 400
+    assert index.search(vectors[390], k=1)[0][0][0] == "emb-390"
+    print("✓ Loaded rows survive the background swap")
+
+    print("\n🎉 All IVF index tests passed!")
+
+
+def test_persistent_index_round_trip():
+    print("\n=== Testing Persistent Index ===\n")
+
+    print("Testing: Restart restores live rows from the index file")
+
+    vectors = random_normed(300)
+    ids = [f"{i:036d}" for i in range(len(vectors))]
+    owners = [f"{i % 7:036d}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "embeddings.idx"
+
+        index = PersistentIndex(EmbeddingGallery(), path, dtype=np.float16, checkpoint_every=10_000)
+        assert index.restore() == set()
+        index.load(ids[:200], owners[:200], vectors[:200])
+        index.add(ids[200:], owners[200:], vectors[200:])
+        index.remove(ids[:160])  # More than half tombstoned: compacted on close
+        index.close()
+
+        restored = PersistentIndex(EmbeddingGallery(), path, dtype=np.float16)
+        assert restored.restore() == set(ids[160:])
+        assert len(restored) == 140
+        hit = restored.search(vectors[250], k=1)[0][0]
+        assert hit[:2] == (ids[250], owners[250]) and abs(hit[2] - 1.0) < 1e-2
+        print("✓ Deleted rows stay deleted and float16 rows round-trip")
+
+        print("\nTesting: Rows written after the last checkpoint are dropped on restart")
+
+        restored.load([], [], [])
+        restored.add(["x" * 36], ["y" * 36], vectors[:1])
+        restored._file._unmap()  # Simulate a crash: no checkpoint, header count unchanged
+
+        recovered = PersistentIndex(EmbeddingGallery(), path, dtype=np.float16)
+        assert recovered.restore() == set(ids[160:])
+        recovered.close()
+        print("✓ Un-checkpointed tail is left for database reconciliation")
+
+        print("\nTesting: Truncated or foreign files are rebuilt with the configured dim")
+
+        with open(path, "r+b") as fh:
+            fh.truncate(EmbeddingIndexFile.HEADER_SIZE + 100)
+        truncated = PersistentIndex(EmbeddingGallery(), path, dim=64, dtype=np.float16)
+        assert truncated.restore() == set()
+        truncated.close()
+        assert EmbeddingIndexFile.read_header(path)[1] == 64
+
+        path.write_bytes(EmbeddingIndexFile.HEADER.pack(b"NOTANIDX", 2, 0, 7, 1, 0).ljust(4096, b"\0"))
+        foreign = PersistentIndex(EmbeddingGallery(), path, dim=64)
+        assert foreign.restore() == set()
+        foreign.add(ids[:5], owners[:5], vectors[:5])
+        foreign.close()
+        assert EmbeddingIndexFile.read_header(path)[1:] == (64, 4096, 5)
+        print("✓ The header's dim is only trusted after magic, version and length check out")
+
+    print("\n🎉 All persistent index tests passed!")
+
+
+def test_prototype_store():
+    print("\n=== Testing Prototype Store ===\n")
+
+    print("Testing: Many sightings collapse into a few prototype rows")
+
+    rng = np.random.default_rng(3)
+    centers = random_normed(20, seed=4)
+    store = PrototypeStore(max_exemplars=3)
+    for visitor in range(20):
+        for _ in range(30):
+            sample = centers[visitor] + 0.1 * rng.standard_normal(64).astype(np.float32)
+            store.update(f"visitor-{visitor}", sample / np.linalg.norm(sample), rng.random())
+
+    assert len(store) == 20
+    assert len(store._rows) <= 20 * 4
+    visitor_id, sim, runner_up = store.search(centers[[7]])[0]
+    assert visitor_id == "visitor-7"
+    assert sim > 0.9 and runner_up < sim
+    print("✓ Query resolves to the right visitor with a clear margin")
+
+    print("\nTesting: Rebuild and removal")
+
+    ids = [f"visitor-{i // 5}" for i in range(50)]
+    rebuilt = PrototypeStore(max_exemplars=2)
+    rebuilt.rebuild(ids, np.repeat(centers[:10], 5, axis=0))
+    assert len(rebuilt) == 10
+    assert rebuilt.search(centers[[4]])[0][0] == "visitor-4"
+
+    rebuilt.remove(["visitor-4"])
+    assert len(rebuilt) == 9
+    assert rebuilt.search(centers[[4]])[0][0] != "visitor-4"
+    print("✓ Rebuilt prototypes match and removed visitors disappear")
+
+    print("\n🎉 All prototype store tests passed!")
+
+
+def test_quantized_storage():
+    print("\n=== Testing Quantized Embedding Storage ===\n")
+
+    print("Testing: Encoded sizes and round-trip error per dtype")
+
+    vector = random_normed(1, dim=512)[0]
+    for dtype, size, tolerance in (("float32", 2048, 0.0), ("float16", 1024, 1e-3), ("int8", 512, 1e-2)):
+        encoded = NumpyArray.encode(vector, dtype)
+        decoded = NumpyArray.decode(encoded)
+        assert len(encoded) - size <= 16
+        assert decoded.dtype == np.float32 and decoded.shape == (512,)
+        assert np.abs(decoded - vector).max() <= tolerance
+    print("✓ float16 halves and int8 quarters the payload")
+
+    assert np.array_equal(NumpyArray.decode(vector.tobytes()), vector)
+    print("✓ Legacy headerless float32 blobs still decode")
+
+    gallery = EmbeddingGallery(dtype=np.float16)
+    gallery.SCORE_CHUNK_ROWS = 7
+    vectors = random_normed(50)
+    gallery.add([f"emb-{i}" for i in range(50)], [f"visitor-{i}" for i in range(50)], vectors)
+    assert [hits[0][0] for hits in gallery.search(vectors[:5])] == [f"emb-{i}" for i in range(5)]
+    print("✓ float16 gallery scores in chunks and finds exact matches")
+
+    print("\n🎉 All quantized storage tests passed!")
+
+
+def run_all_tests():
+    test_gallery_matches_brute_force()
+    test_gallery_add_and_remove()
+    test_ivf_index()
+    test_persistent_index_round_trip()
+    test_prototype_store()
+    test_quantized_storage()
+
+
+if __name__ == "__main__":
+    run_all_tests()
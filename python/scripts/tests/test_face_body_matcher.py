@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import uuid
+
+import numpy as np
+
+from the_judge.domain.tracking.model import Face, FaceEmbedding, Body, Composite
+from the_judge.infrastructure.tracking.face_body_matcher import FaceBodyMatcher
+from the_judge.common.datetime_utils import now
+from scripts.bench_face_body_matcher import crowded_scene, legacy_cost_matrix, total_score
+
+
+def create_face(bbox):
+    face = Face(
+        id=str(uuid.uuid4()), frame_id="frame-1", bbox=tuple(bbox), embedding_id="emb-1",
+        embedding_norm=1.0, det_score=0.9, quality_score=0.8, pose="frontal", age=25, sex="M",
+        captured_at=now()
+    )
+    return Composite(face=face, embedding=FaceEmbedding(id="emb-1", embedding=None, normed_embedding=None))
+
+
+def create_body(bbox):
+    return Body(id=str(uuid.uuid4()), frame_id="frame-1", bbox=tuple(bbox), captured_at=now())
+
+
+def test_cost_matrix_matches_loop():
+    print("=== Testing Face/Body Matcher ===\n")
+
+    print("Testing: Vectorized cost matrix equals the per-pair loop")
+
+    for seed, (faces, bodies) in enumerate([(1, 1), (5, 3), (30, 40), (60, 45)]):
+        face_boxes, body_boxes = crowded_scene(faces, bodies, width=1920, height=1080, seed=seed)
+        expected = legacy_cost_matrix(face_boxes, body_boxes)
+        assert np.array_equal(FaceBodyMatcher._cost_matrix(face_boxes, body_boxes), expected)
+    print("✓ Identical costs on synthetic crowded scenes")
+
+
+def test_sparse_assignment():
+    print("\nTesting: Pre-filtered component assignment is as good as the dense one")
+
+    matcher = FaceBodyMatcher()
+    for seed in range(5):
+        face_boxes, body_boxes = crowded_scene(120, 150, seed=seed)
+        dense = matcher._assign_dense(face_boxes, body_boxes)
+        sparse = matcher._assign_sparse(face_boxes, body_boxes)
+        assert abs(total_score(dense) - total_score(sparse)) < 1e-9
+        costs = FaceBodyMatcher._cost_matrix(face_boxes, body_boxes)
+        assert all(costs[f, b] < 1.0 for f, b, _ in sparse)
+    print("✓ Same total score, only overlapping pairs assigned")
+
+    face_boxes, body_boxes = crowded_scene(3, 4, seed=0)
+    assert matcher._assign_sparse(face_boxes, body_boxes + 5000) == []
+    print("✓ No overlaps, no assignments")
+
+
+def test_match_faces_to_bodies():
+    print("\nTesting: Assignment of faces to the bodies they sit on")
+
+    bodies = [create_body((100, 100, 200, 400)), create_body((400, 100, 500, 400)), create_body((900, 0, 950, 50))]
+    faces = [create_face((430, 110, 470, 160)), create_face((130, 110, 170, 160)), create_face((700, 600, 740, 650))]
+
+    matched = FaceBodyMatcher().match_faces_to_bodies(faces, bodies)
+    assert [c.body.id if c.body else None for c in matched] == [bodies[1].id, bodies[0].id, None]
+    assert [c.face.id for c in matched] == [c.face.id for c in faces]
+    print("✓ Faces paired with overlapping bodies, stray face left unmatched")
+
+    print("\n🎉 All face/body matcher tests passed!")
+
+
+def run_all_tests():
+    test_cost_matrix_matches_loop()
+    test_sparse_assignment()
+    test_match_faces_to_bodies()
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,242 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from the_judge.application.services.ingest_queue import IngestQueue
+from the_judge.application.services.pipeline import Pipeline, ReorderBuffer, Stage
+from the_judge.application.services.processing_service import FrameProcessingService
+from the_judge.domain.tracking.model import Frame
+from the_judge.domain.tracking.ports import ObjectDetectorPort
+from the_judge.common.datetime_utils import now
+from the_judge.infrastructure.tracking.frame_collector import FrameCollector
+
+
+async def flood(queue, cameras, frames_per_camera, handler_delay):
+    handled = []
+
+    async def handler(item):
+        handled.append(item)
+        await asyncio.sleep(handler_delay)
+
+    queue.start(handler, consumers=2)
+    for i in range(frames_per_camera):
+        for camera in cameras:
+            await queue.put(camera, (camera, i))
+            assert len(queue) <= len(cameras) * queue.capacity
+    await asyncio.sleep(handler_delay * 20)
+    await queue.stop()
+    return handled
+
+
+def test_drop_policies_bound_memory():
+    print("=== Testing Ingest Queue ===\n")
+
+    print("Testing: Sustained overload keeps the queue bounded")
+
+    queue = IngestQueue(per_camera_capacity=3, policy="drop_oldest")
+    handled = asyncio.run(flood(queue, ["cam-1", "cam-2"], 200, 0.001))
+    stats = queue.stats()
+    assert stats["high_watermark"] <= 6
+    assert stats["dropped"] > 0 and stats["enqueued"] == 400
+    assert stats["processed"] == len(handled) == 400 - stats["dropped"]
+    assert ("cam-1", 199) in handled and ("cam-2", 199) in handled
+    print("✓ drop_oldest: depth capped, newest frames still processed")
+
+    queue = IngestQueue(per_camera_capacity=3, policy="keep_latest")
+    handled = asyncio.run(flood(queue, ["cam-1", "cam-2", "cam-3"], 100, 0.001))
+    assert queue.stats()["high_watermark"] <= 3
+    assert all((camera, 99) in handled for camera in ("cam-1", "cam-2", "cam-3"))
+    print("✓ keep_latest: one pending frame per camera, latest wins")
+
+
+def test_block_policy_applies_backpressure():
+    print("\nTesting: Block policy loses nothing and processes cameras round-robin")
+
+    queue = IngestQueue(per_camera_capacity=2, policy="block")
+    handled = asyncio.run(flood(queue, ["cam-1", "cam-2"], 20, 0.001))
+    assert queue.dropped == 0 and len(handled) == 40
+    assert queue.stats()["high_watermark"] <= 4
+    assert [i for camera, i in handled if camera == "cam-1"] == list(range(20))
+    print("✓ Producer waited for room, per-camera order preserved")
+
+
+def test_frame_writes_are_bounded():
+    print("\nTesting: A slow disk cannot pile up encoded frames")
+
+    written = []
+    disk = threading.Event()
+
+    def slow_write(filepath, data):
+        disk.wait(5)
+        written.append(filepath)
+
+    async def scenario():
+        collector = FrameCollector(bus=SimpleNamespace(handle=lambda event: None), max_pending_writes=3)
+        collector._write_frame = slow_write
+        await collector.register_camera(SimpleNamespace(camera_name="cam-1"))
+        for i in range(20):
+            await collector.ingest_frame(
+                SimpleNamespace(camera_name="cam-1", frame_data=b"jpeg", collection_id=f"c{i}")
+            )
+            assert len(collector._pending_writes) <= 3
+        disk.set()
+        await collector.flush()
+        await asyncio.sleep(0)
+        return collector
+
+    collector = asyncio.run(scenario())
+    assert collector.dropped_writes == 17 and len(written) == 3
+    assert not collector._pending_writes
+    print("✓ Writes beyond the limit skipped, finished writes pruned")
+
+    print("\n🎉 All ingest queue tests passed!")
+
+
+def test_pipeline_overlaps_stages():
+    print("\n=== Testing Processing Pipeline ===\n")
+
+    print("Testing: Slow stages of consecutive items overlap")
+
+    done = []
+    finished = threading.Event()
+
+    def slow(step):
+        def run(item):
+            time.sleep(0.02)
+            return item + [step]
+        return run
+
+    def last(item):
+        done.append(item)
+        if len(done) == 10:
+            finished.set()
+
+    pipeline = Pipeline([Stage("infer", slow("infer"), capacity=2), Stage("persist", slow("persist"), capacity=2),
+                         Stage("done", last)])
+    pipeline.start()
+    start = time.perf_counter()
+    for i in range(10):
+        pipeline.submit([i])
+    assert finished.wait(5)
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    assert [item[0] for item in done] == list(range(10))
+    assert all(item[1:] == ["infer", "persist"] for item in done)
+    assert elapsed < 10 * 0.04 * 0.8
+    stats = pipeline.stats()
+    assert stats["infer"]["processed"] == 10 and stats["persist"]["depth"] == 0
+    print(f"✓ 10 items through two 20ms stages in {elapsed * 1e3:.0f}ms, per-stage stats reported")
+
+
+class PoolDetector(ObjectDetectorPort):
+    def __init__(self, processes):
+        self.workers = processes
+
+    def detect_batch(self, images, frame_ids):
+        return [[] for _ in images], [[] for _ in images]
+
+
+def test_detect_stage_fills_process_pool():
+    print("\nTesting: In process mode every inference process gets a detect thread")
+
+    service = FrameProcessingService(None, None, None, None, None, None,
+                                     stage_workers={"detect": 1}, object_detector=PoolDetector(3))
+    assert service.stats()["detect"]["workers"] == 3
+    service.close()
+
+    service = FrameProcessingService(None, None, None, None, None, None,
+                                     stage_workers={"detect": 4}, object_detector=PoolDetector(2))
+    assert service.stats()["detect"]["workers"] == 4
+    service.close()
+    print("✓ Detect stage is as wide as the process pool, or the configured width if larger")
+
+
+def test_face_error_wins_over_body_error():
+    print("\nTesting: A failing face detector's error is not masked by the body detector")
+
+    def fail(error):
+        def detect(images, frame_ids):
+            time.sleep(0.01)
+            raise error
+        return detect
+
+    service = FrameProcessingService(
+        SimpleNamespace(detect_faces_batch=fail(ValueError("face model"))),
+        SimpleNamespace(detect_bodies_batch=fail(RuntimeError("body model"))),
+        None, None, None, None, concurrent_detection=True
+    )
+    frame = Frame(id="frame-1", camera_name="cam-1", captured_at=now(), collection_id="c1")
+    job = SimpleNamespace(frames=[frame], images=[np.zeros((2, 2, 3), dtype=np.uint8)])
+    try:
+        service._detect_stage(job)
+        assert False, "detect stage should have raised"
+    except ValueError as error:
+        assert str(error) == "face model"
+    service.close()
+    print("✓ Face detector exception propagates after the body call finished")
+
+
+def test_frames_tracked_in_order():
+    print("\nTesting: Frames overtaking each other in parallel stages are tracked in arrival order")
+
+    buffer = ReorderBuffer()
+    tickets = [buffer.ticket() for _ in range(4)]
+    assert buffer.push(tickets[2], "c") == [] and buffer.push(tickets[1], None) == []
+    assert buffer.push(tickets[0], "a") == ["a", "c"] and buffer.push(tickets[3], "d") == ["d"]
+    assert len(buffer) == 0
+    print("✓ Reorder buffer releases items in ticket order, skipping dropped ones")
+
+    tracked = []
+    tracking = SimpleNamespace(track_frame=lambda frame, paired, bodies: tracked.append(frame.id))
+    service = FrameProcessingService(
+        None, None, SimpleNamespace(match_faces_to_bodies=lambda faces, bodies: faces), tracking, None, None,
+        stage_workers={"decode": 4, "detect": 3, "track": 4}, object_detector=PoolDetector(3)
+    )
+    assert not any(thread.name.startswith("decode-") for thread in threading.enumerate())
+    assert service.stats()["track"]["workers"] == 1
+    service.start()
+    print("✓ Stage workers start with the service, not the constructor; tracking has one worker")
+
+    def jittery_decode(data):
+        time.sleep(random.uniform(0, 0.01))
+        return None if data == b"corrupt" else np.zeros((2, 2, 3), dtype=np.uint8)
+
+    service._decode_image = jittery_decode
+    frames = [Frame(id=f"frame-{i}", camera_name="cam-1", captured_at=now(), collection_id=f"c{i}")
+              for i in range(40)]
+
+    async def scenario():
+        await asyncio.gather(*(
+            service.process_batch_async([(frame, b"corrupt" if i % 7 == 3 else b"jpeg")])
+            for i, frame in enumerate(frames)
+        ))
+
+    asyncio.run(scenario())
+    service.close()
+    assert tracked == [frame.id for i, frame in enumerate(frames) if i % 7 != 3]
+    print(f"✓ {len(tracked)} frames tracked in order, undecodable frames did not hold the rest back")
+
+    print("\n🎉 All pipeline tests passed!")
+
+
+def run_all_tests():
+    test_drop_policies_bound_memory()
+    test_block_policy_applies_backpressure()
+    test_frame_writes_are_bounded()
+    test_pipeline_overlaps_stages()
+    test_detect_stage_fills_process_pool()
+    test_face_error_wins_over_body_error()
+    test_frames_tracked_in_order()
+
+
+if __name__ == "__main__":
+    run_all_tests()
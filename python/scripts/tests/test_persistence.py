@@ -0,0 +1,315 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import Session
+
+from the_judge.domain.tracking.model import Body, Composite, Face, FaceEmbedding, Frame, Visitor
+from the_judge.infrastructure.db.engine import create_db_engine
+from the_judge.infrastructure.db.history_writer import HistoryWriter
+from the_judge.infrastructure.db.orm import metadata, detections, face_embeddings, faces, frames, sessions, visitors
+from the_judge.infrastructure.db.repository import TrackingRepository
+from the_judge.infrastructure.db.retention import RetentionEngine, RetentionPolicy
+from the_judge.common.datetime_utils import now
+
+
+def temp_engine(foreign_keys=False):
+    path = os.path.join(tempfile.mkdtemp(), "tracking.db")
+    engine = create_engine(f"sqlite:///{path}")
+    if foreign_keys:
+        event.listen(engine, "connect", lambda conn, record: conn.execute("PRAGMA foreign_keys=ON"))
+    metadata.create_all(engine)
+    return engine
+
+
+def insert_frames(engine, *frame_rows):
+    """Frame rows are committed with visitor state, not by the history writer."""
+    with engine.begin() as conn:
+        conn.execute(frames.insert(), [
+            {"id": f.id, "camera_name": f.camera_name, "captured_at": f.captured_at, "collection_id": f.collection_id}
+            for f in frame_rows
+        ])
+
+
+def create_frame(captured_at=None):
+    return Frame(id=str(uuid.uuid4()), camera_name="camera-1", captured_at=captured_at or now(),
+                 collection_id="collection-1")
+
+
+def create_composite(frame, visitor):
+    embedding = np.random.rand(512).astype(np.float32)
+    embedding_id = str(uuid.uuid4())
+    face = Face(
+        id=str(uuid.uuid4()), frame_id=frame.id, bbox=(10, 10, 50, 50), embedding_id=embedding_id,
+        embedding_norm=float(np.linalg.norm(embedding)), det_score=0.9, quality_score=0.8,
+        pose="frontal", age=25, sex="M", captured_at=frame.captured_at
+    )
+    normed = embedding / np.linalg.norm(embedding)
+    return Composite(face=face, embedding=FaceEmbedding(embedding_id, embedding, normed), visitor=visitor)
+
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_write_behind_batches_history():
+    print("=== Testing Persistence ===\n")
+
+    print("Testing: History rows are batched across frames and flushed on demand")
+
+    engine = temp_engine()
+    writer = HistoryWriter(engine, max_rows=10_000, max_delay=60.0)
+    writer.start()
+    visitor = Visitor.create_new("visitor", now())
+
+    for _ in range(30):
+        frame = create_frame()
+        composites = [create_composite(frame, visitor) for _ in range(2)]
+        frame_detections = [visitor.create_detection(frame, c) for c in composites]
+        writer.add([], composites, frame_detections)
+
+    assert count(engine, detections) == 0
+    assert writer.flush(timeout=5)
+    assert count(engine, face_embeddings) == 60 and count(engine, faces) == 60 and count(engine, detections) == 60
+    assert count(engine, frames) == 0
+    assert writer.stats()["batches"] == 1
+    print("✓ 30 frames (180 rows) written in one batch, frame rows left to the tracking transaction")
+
+    frame = create_frame()
+    writer.add([], [create_composite(frame, visitor)], [])
+    writer.close()
+    assert count(engine, faces) == 61 and writer.stats()["pending_rows"] == 0
+    print("✓ Pending rows written on close")
+
+
+def test_history_satisfies_foreign_keys():
+    print("\nTesting: History batches reference rows already committed, with foreign keys enforced")
+
+    engine = temp_engine(foreign_keys=True)
+    writer = HistoryWriter(engine, max_delay=0.01)
+    writer.start()
+    visitor = Visitor.create_new("visitor", now())
+    frame = create_frame()
+    # What the tracking transaction commits: the frame, the visitor and its session.
+    insert_frames(engine, frame)
+    with engine.begin() as conn:
+        conn.execute(visitors.insert(), [{"id": visitor.id, "name": visitor.name, "state": visitor.state}])
+        conn.execute(sessions.insert(), [
+            {"id": str(uuid.uuid4()), "visitor_id": visitor.id, "start_frame_id": frame.id,
+             "started_at": frame.captured_at, "captured_at": frame.captured_at}
+        ])
+    composites = [create_composite(frame, visitor) for _ in range(2)]
+    bodies = [Body(str(uuid.uuid4()), frame.id, (0, 0, 10, 10), frame.captured_at)]
+    writer.add(bodies, composites, [visitor.create_detection(frame, c) for c in composites])
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert count(engine, detections) == 2 and writer.stats()["retries"] == 0
+    print("✓ Session and history rows accepted with foreign_keys=ON")
+
+
+def test_failed_batch_is_retried():
+    print("\nTesting: A failed batch is retried, not dropped")
+
+    engine = temp_engine()
+    failures = {"left": 2}
+
+    def flaky(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT") and failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("database is locked")
+
+    event.listen(engine, "before_cursor_execute", flaky)
+    writer = HistoryWriter(engine, max_delay=0.01, retry_delay=0.01)
+    writer.start()
+    visitor = Visitor.create_new("visitor", now())
+    frame = create_frame()
+    composites = [create_composite(frame, visitor) for _ in range(2)]
+    writer.add([], composites, [visitor.create_detection(frame, c) for c in composites])
+
+    assert writer.flush(timeout=5)
+    assert count(engine, faces) == 2 and count(engine, detections) == 2
+    assert writer.stats()["retries"] == 2 and writer.stats()["failed_batches"] == 0
+    print("✓ Rows arrive after two failed attempts")
+
+    failures["left"] = 10 ** 6
+    writer.max_retries, writer.max_retry_delay = 1, 0.01
+    writer.add([], [create_composite(frame, visitor)], [])
+    try:
+        writer.flush(timeout=5)
+        assert False, "flush should report the failure"
+    except RuntimeError:
+        pass
+    try:
+        writer.add([], [create_composite(frame, visitor)], [])
+        assert False, "add should refuse rows while writes fail"
+    except RuntimeError:
+        pass
+    assert writer.stats()["failing"] and writer.stats()["pending_rows"] == 2
+    print("✓ Persistent failure surfaces on add and flush, with the batch still held")
+
+    failures["left"] = 0
+    deadline = time.monotonic() + 5
+    while writer.stats()["failing"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert count(engine, faces) == 3 and not writer.stats()["failing"]
+    print("✓ Held batch written once the database recovers")
+
+
+def test_bulk_visitor_delete():
+    print("\nTesting: Expired visitors are deleted with a constant number of statements")
+
+    engine = temp_engine()
+    writer = HistoryWriter(engine)
+    writer.start()
+    crowd = [Visitor.create_new(f"visitor-{i}", now()) for i in range(200)]
+    frame = create_frame()
+    composites = [create_composite(frame, visitor) for visitor in crowd for _ in range(3)]
+    insert_frames(engine, frame)
+    writer.add([], composites, [c.visitor.create_detection(frame, c) for c in composites])
+    writer.close()
+    with engine.begin() as conn:
+        conn.execute(visitors.insert(), [{"id": v.id, "name": v.name, "state": v.state} for v in crowd])
+        conn.execute(sessions.insert(), [
+            {"id": str(uuid.uuid4()), "visitor_id": v.id, "start_frame_id": frame.id,
+             "started_at": frame.captured_at, "captured_at": frame.captured_at}
+            for v in crowd
+        ])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    expired = [v.id for v in crowd[:150]]
+    with Session(engine) as session:
+        embedding_ids = TrackingRepository(session).delete_visitors(expired)
+        session.commit()
+    statement_count = len(statements)
+
+    assert len(embedding_ids) == 450
+    assert count(engine, visitors) == 50 and count(engine, sessions) == 50
+    assert count(engine, detections) == count(engine, faces) == count(engine, face_embeddings) == 150
+    assert statement_count == 6
+    print(f"✓ 150 visitors and 1500 dependent rows deleted in {statement_count} statements")
+
+
+def test_retention_prunes_history():
+    print("\nTesting: Retention keeps recent and best detections, summarizes sessions, drops orphan frames")
+
+    engine = temp_engine()
+    writer = HistoryWriter(engine)
+    writer.start()
+    visitor = Visitor.create_new("visitor", now())
+    ages = [timedelta(days=40 + i) for i in range(10)] + [timedelta(minutes=i) for i in range(10)]
+    kept = set()
+    history_frames = []
+    for i, age in enumerate(ages):
+        frame = create_frame(now() - age)
+        composite = create_composite(frame, visitor)
+        composite.face.quality_score = 1.0 if i in (3, 7, 15) else 0.1 * (i % 5)
+        detection = visitor.create_detection(frame, composite)
+        detection.captured_at = frame.captured_at
+        history_frames.append(frame)
+        writer.add([], [composite], [detection])
+        # The 3 best and the 6 newest survive.
+        if i in (3, 7, 15) or 10 <= i < 16:
+            kept.add(detection.id)
+    orphan = create_frame(now() - timedelta(hours=2))
+    insert_frames(engine, *history_frames, orphan)
+    writer.add([Body(str(uuid.uuid4()), orphan.id, (0, 0, 10, 10), orphan.captured_at)], [], [])
+    writer.close()
+
+    old = now() - timedelta(days=20)
+    with engine.begin() as conn:
+        conn.execute(visitors.insert(), [{"id": visitor.id, "name": visitor.name, "state": visitor.state}])
+        conn.execute(sessions.insert(), [
+            {"id": str(uuid.uuid4()), "visitor_id": visitor.id, "start_frame_id": "f", "frame_count": 2,
+             "started_at": old + timedelta(hours=h), "ended_at": old + timedelta(hours=h, minutes=5),
+             "captured_at": old + timedelta(hours=h, minutes=5)}
+            for h in range(3)
+        ])
+
+    evicted = []
+    policy = RetentionPolicy(max_age=timedelta(days=30), max_detections_per_visitor=6, keep_best_embeddings=3,
+                             batch_size=4)
+    stats = RetentionEngine(policy, engine, on_embeddings_deleted=evicted.extend).run_once()
+
+    with engine.connect() as conn:
+        remaining = set(conn.execute(select(detections.c.id)).scalars())
+        summary = conn.execute(select(sessions)).one()
+    assert remaining == kept
+    assert stats.detections == stats.embeddings == len(evicted) == 12
+    assert stats.frames == 9 and stats.bodies == 1
+    assert stats.sessions_merged == 2 and summary.frame_count == 6
+    print(f"✓ Reclaimed {stats.detections} detections, {stats.frames} frames and "
+          f"{stats.sessions_merged} sessions; best and newest detections kept")
+
+
+
+def test_retention_vacuums_without_locking_out_tracking():
+    print("\nTesting: Freed pages are returned incrementally; a full VACUUM waits for its window")
+
+    def database_with_free_pages(engine):
+        metadata.create_all(engine)
+        old = now() - timedelta(hours=3)
+        with engine.begin() as conn:
+            conn.execute(frames.insert(), [
+                {"id": str(uuid.uuid4()), "camera_name": "camera-1" * 20, "captured_at": old, "collection_id": "c"}
+                for _ in range(5000)
+            ])
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        return statements
+
+    def pragma(engine, name):
+        with engine.connect() as conn:
+            return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+    engine = create_db_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tracking.db')}", profile="production")
+    statements = database_with_free_pages(engine)
+    policy = RetentionPolicy(vacuum_step_pages=16, full_vacuum_hours=(0, 24))
+    stats = RetentionEngine(policy, engine).run_once()
+    assert stats.frames == 5000 and stats.bytes_reclaimed > 0
+    assert pragma(engine, "freelist_count") == 0
+    assert "VACUUM" not in statements
+    print(f"✓ Incremental vacuum returned {stats.bytes_reclaimed // 1024} KiB in steps, no full VACUUM")
+
+    engine = temp_engine()
+    statements = database_with_free_pages(engine)
+    pages = pragma(engine, "page_count")
+    stats = RetentionEngine(RetentionPolicy(), engine).run_once()
+    assert stats.bytes_reclaimed == 0 and pragma(engine, "page_count") == pages
+    assert "VACUUM" not in statements
+    print("✓ Without a maintenance window a legacy file is never fully vacuumed")
+
+    with engine.begin() as conn:
+        conn.execute(frames.insert(), [
+            {"id": str(uuid.uuid4()), "camera_name": "c", "captured_at": now() - timedelta(hours=3),
+             "collection_id": "c"} for _ in range(10)
+        ])
+    stats = RetentionEngine(RetentionPolicy(full_vacuum_hours=(0, 24)), engine).run_once()
+    assert "VACUUM" in statements and stats.bytes_reclaimed > 0
+    assert pragma(engine, "auto_vacuum") == 2
+    print("✓ Inside the window it runs once and converts the file to incremental vacuum")
+
+    print("\n🎉 All persistence tests passed!")
+
+
+def run_all_tests():
+    test_write_behind_batches_history()
+    test_history_satisfies_foreign_keys()
+    test_failed_batch_is_retried()
+    test_bulk_visitor_delete()
+    test_retention_prunes_history()
+    test_retention_vacuums_without_locking_out_tracking()
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -21,27 +21,48 @@ class MockRepository:
     def __init__(self):
         self.added_entities = []
         self.merged_entities = []
+        self.saved_entities = []
         self.deleted_entities = []
         self._storage = {}
     
-    def add(self, entity):
+    def add(self, entity, flush=True):
         self.added_entities.append(entity)
         self._storage[entity.id] = entity
     
-    def merge(self, entity):
+    def add_all(self, entities, flush=True):
+        for entity in entities:
+            self.add(entity, flush)
+    
+    def flush(self):
+        pass
+    
+    def merge(self, entity, flush=True):
         self.merged_entities.append(entity)
         self._storage[entity.id] = entity
     
+    def save_changes(self, entities):
+        for entity in entities:
+            if entity.id in self._storage:
+                self.saved_entities.append(entity)
+            else:
+                self.add(entity)
+    
     def delete(self, entity):
         self.deleted_entities.append(entity)
         if entity.id in self._storage:
             del self._storage[entity.id]
     
-    def get(self, entity_class, entity_id):
+    def get(self, entity_class, entity_id, load=None):
         entity = self._storage.get(entity_id)
         return entity if isinstance(entity, entity_class) else None
     
-    def list_by(self, entity_class, **kwargs):
+    def list(self, entity_class, load=None):
+        return [e for e in self._storage.values() if isinstance(e, entity_class)]
+    
+    def list_by_ids(self, entity_class, entity_ids, load=None):
+        return [e for e in (self.get(entity_class, i) for i in entity_ids) if e is not None]
+    
+    def list_by(self, entity_class, load=None, **kwargs):
         results = []
         for entity in self._storage.values():
             if isinstance(entity, entity_class):
@@ -53,12 +74,16 @@ class MockRepository:
                 if match:
                     results.append(entity)
         return results
+    
+    def list_values(self, entity_class, *columns, **filters):
+        return [tuple(getattr(e, c) for c in columns) for e in self.list_by(entity_class, **filters)]
 
 
 class MockUnitOfWork:
     def __init__(self):
         self.repository = MockRepository()
         self.committed = False
+        self.commit_hooks = []
     
     def __enter__(self):
         return self
@@ -66,8 +91,14 @@ class MockUnitOfWork:
     def __exit__(self, *args):
         pass
     
+    def on_commit(self, hook):
+        self.commit_hooks.append(hook)
+    
     def commit(self):
         self.committed = True
+        hooks, self.commit_hooks = self.commit_hooks, []
+        for hook in hooks:
+            hook()
 
 
 class MockFaceRecognizer(FaceRecognizerPort):
@@ -187,9 +218,9 @@ def test_visitor_promotion_after_threshold():
     
     service.handle_frame(uow, frame, [composite], [])
     
-    merged_visitors = [e for e in uow.repository.merged_entities if isinstance(e, Visitor)]
-    assert len(merged_visitors) == 1
-    updated_visitor = merged_visitors[0]
+    saved_visitors = [e for e in uow.repository.saved_entities if isinstance(e, Visitor)]
+    assert len(saved_visitors) == 1
+    updated_visitor = saved_visitors[0]
     assert updated_visitor.seen_count == 3
     assert updated_visitor.state == VisitorState.ACTIVE
     
@@ -219,13 +250,13 @@ def test_collection_scoped_seen_count():
     frame = create_frame(collection_id="same-collection")
     
     service.handle_frame(uow, frame, [composite1], [])
-    merged_visitors = [e for e in uow.repository.merged_entities if isinstance(e, Visitor)]
-    initial_count = merged_visitors[0].seen_count
+    saved_visitors = [e for e in uow.repository.saved_entities if isinstance(e, Visitor)]
+    initial_count = saved_visitors[0].seen_count
     
-    uow.repository.merged_entities.clear()
+    uow.repository.saved_entities.clear()
     service.handle_frame(uow, frame, [composite2], [])
-    merged_visitors = [e for e in uow.repository.merged_entities if isinstance(e, Visitor)]
-    final_count = merged_visitors[0].seen_count
+    saved_visitors = [e for e in uow.repository.saved_entities if isinstance(e, Visitor)]
+    final_count = saved_visitors[0].seen_count
     
     assert initial_count == 2
     assert final_count == 2
@@ -260,6 +291,20 @@ def test_detections_always_created():
     assert detection.face.id == "face-3"
     assert detection.visitor == existing_visitor
     print("✓ Detection created successfully")
+    
+    writer = Mock()
+    uow = MockUnitOfWork()
+    uow.repository.add(existing_visitor)
+    service = TrackingService(recognizer, lambda: uow, bus, history_writer=writer)
+    frame = create_frame()
+    service.handle_frame(uow, frame, [create_composite(face_id="face-3")], [])
+    assert frame in uow.repository.added_entities
+    assert not any(isinstance(e, Detection) for e in uow.repository.added_entities)
+    writer.add.assert_not_called()
+    uow.commit()
+    bodies, composites, detections = writer.add.call_args.args
+    assert len(composites) == 1 and detections[0].frame == frame
+    print("✓ With a history writer the frame row commits with the session, its history after the commit")
 
 
 def test_session_management():
@@ -335,6 +380,147 @@ def test_collection_buffer_integration():
     print("✓ Collection buffer integration works correctly")
 
 
+def test_timeouts_only_touch_due_visitors():
+    print("Testing: Timeout sweep only touches visitors past their deadline")
+    
+    stale_visitor = Visitor.create_new("Stale Visitor", now() - timedelta(seconds=90))
+    fresh_visitor = Visitor.create_new("Fresh Visitor", now())
+    
+    uow = MockUnitOfWork()
+    uow.repository.add(stale_visitor)
+    uow.repository.add(fresh_visitor)
+    
+    recognizer = MockFaceRecognizer()
+    recognizer.set_recognition_result("face-stale", stale_visitor)
+    recognizer.set_recognition_result("face-fresh", fresh_visitor)
+    
+    bus = MockMessageBus()
+    service = TrackingService(recognizer, lambda: uow, bus)
+    
+    stale_frame = create_frame()
+    stale_frame.captured_at = now() - timedelta(seconds=90)
+    service.handle_frame(uow, stale_frame, [create_composite(face_id="face-stale")], [])
+    uow.commit()
+    service.handle_frame(uow, create_frame(), [create_composite(face_id="face-fresh")], [])
+    uow.commit()
+    assert len(service.timeouts) == 2
+    
+    uow.repository.saved_entities.clear()
+    service._handle_timeouts()
+    
+    saved_visitors = [e for e in uow.repository.saved_entities if isinstance(e, Visitor)]
+    assert saved_visitors == [stale_visitor]
+    assert stale_visitor.state == VisitorState.MISSING
+    assert stale_visitor.id not in service.timeouts and fresh_visitor.id in service.timeouts
+    print("✓ Only the visitor past its deadline was loaded and written")
+
+
+def test_rollback_leaves_live_state_untouched():
+    print("Testing: A frame whose transaction rolls back publishes nothing and keeps its changes pending")
+    
+    known_visitor = Visitor.create_new("Known Visitor", now())
+    uow = MockUnitOfWork()
+    uow.repository.add(known_visitor)
+    
+    recognizer = MockFaceRecognizer()
+    recognizer.set_recognition_result("face-known", known_visitor)
+    recognizer.add_to_gallery = Mock()
+    service = TrackingService(recognizer, lambda: uow, MockMessageBus())
+    
+    service.handle_frame(uow, create_frame(), [create_composite(face_id="face-known"),
+                                               create_composite(face_id="face-new")], [])
+    uow.commit_hooks.clear()  # Rolled back
+    
+    assert len(service.visitors) == 1 and len(service.timeouts) == 0
+    recognizer.add_to_gallery.assert_not_called()
+    assert {"frame_count", "last_seen"} <= known_visitor.dirty
+    print("✓ Registry, deadlines and gallery unchanged; dirty fields kept for the next save")
+    
+    service.handle_frame(uow, create_frame(), [create_composite(face_id="face-known")], [])
+    uow.commit()
+    assert not known_visitor.dirty and known_visitor.id in service.timeouts
+    recognizer.add_to_gallery.assert_called_once()
+    print("✓ Next committed frame publishes and settles the changes")
+
+
+def test_resighted_visitor_is_not_purged():
+    print("Testing: A visitor seen again after expiring is not purged")
+    
+    visitor = Visitor.create_new("Returning Visitor", now())
+    uow = MockUnitOfWork()
+    uow.repository.add(visitor)
+    uow.repository.delete_visitors = Mock(return_value=[])
+    
+    recognizer = MockFaceRecognizer()
+    recognizer.set_recognition_result("face-returning", visitor)
+    recognizer.forget_visitors = Mock()
+    recognizer.add_to_gallery = Mock()
+    service = TrackingService(recognizer, lambda: uow, MockMessageBus())
+    service.handle_frame(uow, create_frame(), [create_composite(face_id="face-returning")], [])
+    uow.commit()
+    
+    # The sweep expires it while a frame that already recognized it is being tracked.
+    service._expire_visitor(visitor)
+    assert visitor.id not in service.visitors
+    service.handle_frame(uow, create_frame(), [create_composite(face_id="face-returning")], [])
+    uow.commit()
+    
+    assert visitor.id in service.visitors and visitor.id in service.timeouts
+    assert service.purge_expired() == 0
+    uow.repository.delete_visitors.assert_not_called()
+    print("✓ Re-sighted visitor back in the registry and its rows kept")
+
+
+def test_purge_waits_for_history_writer():
+    print("Testing: Expired visitors are not purged while their history is still buffered")
+    
+    visitor = Visitor.create_new("Expired Visitor", now())
+    uow = MockUnitOfWork()
+    uow.repository.delete_visitors = Mock(return_value=["emb-1"])
+    recognizer = MockFaceRecognizer()
+    recognizer.remove_from_gallery = Mock()
+    writer = Mock()
+    writer.flush.return_value = False
+    service = TrackingService(recognizer, lambda: uow, MockMessageBus(), history_writer=writer)
+    service._expired.add(visitor.id)
+    
+    assert service.purge_expired() == 0
+    uow.repository.delete_visitors.assert_not_called()
+    assert visitor.id in service._expired
+    print("✓ Purge skipped and visitor kept queued when the writer has not drained")
+    
+    writer.flush.return_value = True
+    assert service.purge_expired() == 1
+    uow.repository.delete_visitors.assert_called_once_with([visitor.id])
+    recognizer.remove_from_gallery.assert_called_once_with(["emb-1"])
+    assert not service._expired
+    print("✓ Purged on the next sweep once the writer caught up")
+
+
+def test_registry_skips_expired_visitors():
+    print("Testing: Visitors expired before a restart are not loaded back as live")
+    
+    live = Visitor.create_new("Live Visitor", now())
+    expired = Visitor.create_new("Expired Visitor", now())
+    expired.state = VisitorState.EXPIRED
+    uow = MockUnitOfWork()
+    uow.repository.add(live)
+    uow.repository.add(expired)
+    uow.repository.delete_visitors = Mock(return_value=[])
+    recognizer = MockFaceRecognizer()
+    recognizer.remove_from_gallery = Mock()
+    service = TrackingService(recognizer, lambda: uow, MockMessageBus())
+    
+    service._ensure_registry(uow)
+    assert live.id in service.visitors and expired.id not in service.visitors
+    assert expired.id not in service.timeouts
+    print("✓ Only live visitors enter the registry")
+    
+    assert service.purge_expired() == 1
+    uow.repository.delete_visitors.assert_called_once_with([expired.id])
+    print("✓ Expired visitor queued for the next purge")
+
+
 def run_all_tests():
     print("=== Running Visitor Tracking Tests ===\n")
     
@@ -360,6 +546,21 @@ def run_all_tests():
         test_collection_buffer_integration()
         print()
         
+        test_timeouts_only_touch_due_visitors()
+        print()
+        
+        test_rollback_leaves_live_state_untouched()
+        print()
+        
+        test_resighted_visitor_is_not_purged()
+        print()
+        
+        test_purge_waits_for_history_writer()
+        print()
+        
+        test_registry_skips_expired_visitors()
+        print()
+        
         print("🎉 All tests passed!")
         
     except Exception as e:
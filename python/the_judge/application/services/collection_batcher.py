@@ -0,0 +1,78 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from the_judge.common.logger import setup_logger
+
+logger = setup_logger("CollectionBatcher")
+
+
+@dataclass
+class _PendingBatch:
+    items: List[Any] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    done: Optional[asyncio.Future] = None
+
+
+class CollectionBatcher:
+    """Groups items by collection id and releases each group as one batch.
+
+    A collection trigger makes every camera send a frame at nearly the same
+    moment. A group is released once ``expected_size()`` items arrived, it
+    reaches ``max_size``, or ``max_wait`` seconds passed since its first item,
+    whichever comes first.
+    """
+
+    def __init__(
+        self,
+        on_batch: Callable[[List[Any]], Awaitable[None]],
+        *,
+        max_wait: float = 0.25,
+        max_size: int = 16,
+        expected_size: Optional[Callable[[], int]] = None,
+    ):
+        self.on_batch = on_batch
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.expected_size = expected_size
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._running: set[asyncio.Task] = set()
+
+    def add(self, collection_id: str, item: Any) -> asyncio.Future:
+        """Queue an item. The returned future resolves once its batch has been processed."""
+        batch = self._pending.get(collection_id)
+        if batch is None:
+            loop = asyncio.get_running_loop()
+            batch = self._pending[collection_id] = _PendingBatch(done=loop.create_future())
+            batch.timer = loop.call_later(self.max_wait, self._release, collection_id)
+        batch.items.append(item)
+
+        target = self.max_size
+        if self.expected_size is not None:
+            target = min(target, max(self.expected_size(), 1))
+        if len(batch.items) >= target:
+            self._release(collection_id)
+        return batch.done
+
+    async def drain(self) -> None:
+        """Release every pending group and wait for all batches to finish."""
+        for collection_id in list(self._pending):
+            self._release(collection_id)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _release(self, collection_id: str) -> None:
+        batch = self._pending.pop(collection_id, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self.on_batch(batch.items))
+        self._running.add(task)
+        task.add_done_callback(lambda t: self._on_batch_done(t, batch))
+
+    def _on_batch_done(self, task: asyncio.Task, batch: _PendingBatch) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Batch failed: %s", task.exception())
+        if not batch.done.done():
+            batch.done.set_result(None)
@@ -1,28 +1,63 @@
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
+from datetime import timedelta
 from typing import Dict, Optional, List
 from the_judge.domain.tracking.model import Visitor, VisitorCollection, Composite, VisitorState
 from the_judge.common.datetime_utils import now
 
 
 @dataclass
-class CollectionBuffer:    
-    # Visitor composites from all cameras in latest collection.
+class CollectionBuffer:
+    # Sliding window of recent collections, oldest first. Cameras answer a trigger at
+    # different speeds, so frames of the previous collection can still arrive after
+    # the next one has started.
+    max_collections: int = 4
+    max_age: timedelta = timedelta(minutes=5)
+    # Most recently started collection.
     current_collection: Optional[VisitorCollection] = None
+    # Ids dropped from the window, so a very late frame cannot bring its collection back.
+    max_evicted: int = 64
+    _collections: "OrderedDict[str, VisitorCollection]" = field(default_factory=OrderedDict, repr=False)
+    _evicted: "OrderedDict[str, None]" = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
     def get_or_create_collection(self, collection_id: str) -> VisitorCollection:
-        if not self.current_collection or self.current_collection.id != collection_id:
-            self.current_collection = VisitorCollection(
-                id=collection_id,
-                created_at=now()
-            )
-        return self.current_collection
+        with self._lock:
+            collection = self._collections.get(collection_id)
+            if collection is None and collection_id in self._evicted:
+                # Stale: dedup only within this frame, and leave the window and current collection alone.
+                return VisitorCollection(id=collection_id, created_at=now())
+            if collection is None:
+                collection = VisitorCollection(id=collection_id, created_at=now())
+                self._collections[collection_id] = collection
+                self.current_collection = collection
+                self._evict()
+            return collection
 
-    def add_composite(self, composite: Composite) -> bool:
-        visitor = composite.visitor        
-        # Check if new in current collection
-        if self.current_collection:
-            is_new = not any(c.visitor.id == visitor.id for c in self.current_collection.composites)
-            self.current_collection.composites.append(composite)
-            return is_new
+    def get_collection(self, collection_id: str) -> Optional[VisitorCollection]:
+        with self._lock:
+            return self._collections.get(collection_id)
+
+    def add_composite(self, composite: Composite, collection: Optional[VisitorCollection] = None) -> bool:
+        # New in the collection: a set lookup, the collection also indexes the embedding.
+        collection = collection or self.current_collection
+        if collection:
+            with self._lock:
+                return collection.add(composite)
         return False
-        
\ No newline at end of file
+
+    def __len__(self) -> int:
+        return len(self._collections)
+
+    def _evict(self) -> None:
+        """Drop collections beyond the window size or older than max_age, never the current one."""
+        cutoff = now() - self.max_age
+        while len(self._collections) > 1:
+            oldest = next(iter(self._collections.values()))
+            if len(self._collections) <= self.max_collections and oldest.created_at >= cutoff:
+                break
+            del self._collections[oldest.id]
+            self._evicted[oldest.id] = None
+            if len(self._evicted) > self.max_evicted:
+                self._evicted.popitem(last=False)
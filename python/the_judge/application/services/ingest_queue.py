@@ -0,0 +1,115 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Set
+
+from the_judge.common.logger import setup_logger
+
+logger = setup_logger("IngestQueue")
+
+
+class IngestQueue:
+    """Bounded per-camera frame queue between ingestion and processing.
+
+    Each camera holds at most ``per_camera_capacity`` pending frames and
+    consumers take cameras round-robin, so one fast camera cannot starve the
+    others and pending memory is bounded by cameras x capacity. When a
+    camera's queue is full the policy decides:
+
+    - ``block``: the producer waits for room (backpressure on the socket).
+    - ``drop_oldest``: the camera's oldest pending frame is discarded.
+    - ``keep_latest``: capacity 1, a new frame replaces the pending one.
+    """
+
+    POLICIES = ("block", "drop_oldest", "keep_latest")
+
+    def __init__(self, per_camera_capacity: int = 4, policy: str = "drop_oldest"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown ingest policy {policy!r}, expected one of {self.POLICIES}")
+        self.policy = policy
+        self.capacity = 1 if policy == "keep_latest" else max(per_camera_capacity, 1)
+        self._queues: Dict[str, Deque[Any]] = {}
+        self._ready: Deque[str] = deque()
+        self._ready_set: Set[str] = set()
+        self._cond = asyncio.Condition()
+        self._consumers: List[asyncio.Task] = []
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.in_flight = 0
+        self.high_watermark = 0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def put(self, camera: str, item: Any) -> None:
+        async with self._cond:
+            queue = self._queues.setdefault(camera, deque())
+            if len(queue) >= self.capacity:
+                if self.policy == "block":
+                    await self._cond.wait_for(lambda: len(queue) < self.capacity)
+                else:
+                    queue.popleft()
+                    self._on_drop(camera)
+
+            queue.append(item)
+            self.enqueued += 1
+            self.high_watermark = max(self.high_watermark, len(self))
+            if camera not in self._ready_set:
+                self._ready.append(camera)
+                self._ready_set.add(camera)
+            self._cond.notify_all()
+
+    async def get(self) -> Any:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._ready)
+            camera = self._ready.popleft()
+            queue = self._queues[camera]
+            item = queue.popleft()
+            if queue:
+                self._ready.append(camera)
+            else:
+                self._ready_set.discard(camera)
+            self._cond.notify_all()
+            return item
+
+    def start(self, handler: Callable[[Any], Awaitable[None]], consumers: int = 4) -> None:
+        """Spawn consumers that await ``handler`` per item, so at most ``consumers`` items are in flight."""
+        for _ in range(consumers):
+            self._consumers.append(asyncio.create_task(self._consume(handler)))
+
+    async def stop(self) -> None:
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self),
+            "depth_per_camera": {camera: len(q) for camera, q in self._queues.items()},
+            "in_flight": self.in_flight,
+            "high_watermark": self.high_watermark,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "processed": self.processed,
+        }
+
+    async def _consume(self, handler: Callable[[Any], Awaitable[None]]) -> None:
+        while True:
+            item = await self.get()
+            self.in_flight += 1
+            try:
+                await handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingest handler failed")
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+
+    def _on_drop(self, camera: str) -> None:
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            logger.warning("Processing is behind, dropped %d frames so far (last from %s): %s",
+                           self.dropped, camera, self.stats())
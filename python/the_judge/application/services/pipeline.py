@@ -0,0 +1,152 @@
+import itertools
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from the_judge.common.logger import setup_logger
+
+logger = setup_logger("Pipeline")
+
+_STOP = object()
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+
+
+class Stage:
+    """A step run by its own worker threads, fed by a bounded input queue.
+
+    ``fn`` returns the item to hand to the next stage, or None to stop the
+    item here. A full downstream queue blocks the workers, which in turn
+    fills this stage's queue: backpressure travels upstream.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, capacity: int = 8):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=capacity)
+        self.next: Optional["Stage"] = None
+        self.on_error: Callable[[Any, BaseException], None] = lambda item, error: None
+        self.stats = StageStats()
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as error:
+                logger.exception("Stage %s failed", self.name)
+                with self._stats_lock:
+                    self.stats.errors += 1
+                self.on_error(item, error)
+                continue
+            finally:
+                with self._stats_lock:
+                    self.stats.processed += 1
+                    self.stats.busy_seconds += time.perf_counter() - start
+            if result is not None and self.next is not None:
+                self.next.queue.put(result)
+
+
+class ReorderBuffer:
+    """Hands items back in ticket order, whatever order they arrive in.
+
+    Every ticket must be pushed exactly once; push None for an item that
+    was dropped on the way, or everything after it waits forever.
+    """
+
+    def __init__(self):
+        self._tickets = itertools.count()
+        self._next = 0
+        self._pending: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def ticket(self) -> int:
+        with self._lock:
+            return next(self._tickets)
+
+    def push(self, ticket: int, item: Any) -> List[Any]:
+        """Add an item; returns the items now due, in order."""
+        ready = []
+        with self._lock:
+            if ticket < self._next:
+                return ready
+            self._pending[ticket] = item
+            while self._next in self._pending:
+                item = self._pending.pop(self._next)
+                self._next += 1
+                if item is not None:
+                    ready.append(item)
+        return ready
+
+
+class Pipeline:
+    """Chain of stages, so slow steps of one item overlap with other steps of the next."""
+
+    def __init__(self, stages: List[Stage], on_error: Callable[[Any, BaseException], None] = None):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.next = downstream
+        if on_error is not None:
+            for stage in stages:
+                stage.on_error = on_error
+        self._started_at: Optional[float] = None
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, item: Any) -> None:
+        """Blocks while the first stage's queue is full."""
+        self.stages[0].queue.put(item)
+
+    def stop(self) -> None:
+        """Finish queued items stage by stage, then stop the workers."""
+        for stage in self.stages:
+            stage.stop()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        elapsed = max(time.perf_counter() - (self._started_at or time.perf_counter()), 1e-9)
+        report = {}
+        for stage in self.stages:
+            s = stage.stats
+            report[stage.name] = {
+                "depth": stage.queue.qsize(),
+                "workers": stage.workers,
+                "processed": s.processed,
+                "errors": s.errors,
+                "per_second": s.processed / elapsed,
+                # Share of worker time spent busy: near 1.0 marks the bottleneck stage.
+                "utilization": s.busy_seconds / (elapsed * stage.workers),
+                "avg_ms": 1e3 * s.busy_seconds / s.processed if s.processed else 0.0,
+            }
+        return report
@@ -1,25 +1,52 @@
 import asyncio
 import cv2
+import threading
 import uuid
 import numpy as np
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
 
 from the_judge.domain.tracking.model import Frame, Face, Body, Visitor, Composite
-from the_judge.domain.tracking.ports import FaceDetectorPort, BodyDetectorPort, FaceBodyMatcherPort
+from the_judge.domain.tracking.ports import FaceDetectorPort, BodyDetectorPort, FaceBodyMatcherPort, ObjectDetectorPort
 from the_judge.domain.tracking.events import FrameProcessed, FrameSaved
 from the_judge.application.messagebus import MessageBus
 from the_judge.application.services.tracking_service import TrackingService
+from the_judge.application.services.collection_batcher import CollectionBatcher
+from the_judge.application.services.pipeline import Pipeline, ReorderBuffer, Stage
 from the_judge.infrastructure.db.unit_of_work import AbstractUnitOfWork
 from the_judge.settings import get_settings
 from the_judge.common.logger import setup_logger
 
 logger = setup_logger("FrameProcessingService")
 
+FrameSource = Union[bytes, str]
+
+
+@dataclass
+class FrameJob:
+    """Frames travelling through the processing stages together."""
+    items: List[Tuple[Frame, FrameSource]]
+    on_done: Optional[Callable[[], None]] = None
+    # Submission order; jobs are tracked in this order whatever order the stages finish them in.
+    seq: Optional[int] = None
+    frames: List[Frame] = field(default_factory=list)
+    images: List[np.ndarray] = field(default_factory=list)
+    faces: List[List[Composite]] = field(default_factory=list)
+    bodies: List[List[Body]] = field(default_factory=list)
+    paired: List[List[Composite]] = field(default_factory=list)
+
+    def finish(self) -> None:
+        if self.on_done is not None:
+            self.on_done()
+            self.on_done = None
+
 
 class FrameProcessingService:
+    STAGES = ("decode", "detect", "match", "track")
+
     def __init__(
         self,
         face_detector: FaceDetectorPort,
@@ -28,7 +55,13 @@ class FrameProcessingService:
         tracking_service: TrackingService,
         bus: MessageBus,
         uow_factory: Callable[[], AbstractUnitOfWork],
-        max_workers: int = 4,
+        stage_workers: Optional[Dict[str, int]] = None,
+        stage_capacity: int = 8,
+        batch_wait: Optional[float] = None,
+        batch_max: int = 16,
+        expected_batch_size: Optional[Callable[[], int]] = None,
+        object_detector: Optional[ObjectDetectorPort] = None,
+        concurrent_detection: bool = False,
     ):
         self.face_detector = face_detector
         self.body_detector = body_detector
@@ -36,47 +69,182 @@ class FrameProcessingService:
         self.tracking_service = tracking_service
         self.bus = bus
         self.uow_factory = uow_factory
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.visitors: list[Visitor] = []
         self.settings = get_settings()
-    
-    async def on_frame_saved(self, event: FrameSaved) -> None:
-        image_path = (
-            Path(self.settings.get_stream_path(event.frame.collection_id))
-            / f"{event.frame.camera_name}.jpg"
+        # Runs both models in one call (e.g. in worker processes) instead of the two detectors.
+        self.object_detector = object_detector
+        # Face (ONNX) and body (torch) inference release the GIL, so both models can run at once.
+        self._detection_pool = ThreadPoolExecutor(
+            max_workers=(stage_workers or {}).get("detect", 1), thread_name_prefix="detect-bodies"
+        ) if concurrent_detection else None
+        # With a batch wait, frames of one collection are detected together across cameras.
+        self.batcher = None if batch_wait is None else CollectionBatcher(
+            self.process_batch_async,
+            max_wait=batch_wait,
+            max_size=batch_max,
+            expected_size=expected_batch_size,
         )
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(
-            self.executor, self.process_frame, event.frame, str(image_path)
+        # Decoding, inference, matching and the database transaction run as separate stages,
+        # so inference of the next frames overlaps with persisting the previous ones.
+        # Several decode/detect workers finish jobs out of order; frames of a camera must not be
+        # tracked out of order, or last_seen, frame counts and deadlines would move backwards.
+        # Tracking is therefore serialized, and the track stage gets a single worker.
+        self._order = ReorderBuffer()
+        self._track_lock = threading.Lock()
+        workers = {"decode": 2, "detect": 1, "match": 1, **(stage_workers or {}), "track": 1}
+        if object_detector is not None:
+            # One detect thread per worker process, or the pool sits idle.
+            workers["detect"] = max(workers["detect"], object_detector.workers)
+        self.pipeline = Pipeline(
+            [
+                Stage(name, getattr(self, f"_{name}_stage"), workers[name], stage_capacity)
+                for name in self.STAGES
+            ],
+            on_error=lambda job, error: self._drop(job),
         )
+    
+    async def on_frame_saved(self, event: FrameSaved) -> None:
+        if event.frame_data is not None:
+            source = event.frame_data
+        else:
+            source = str(
+                Path(self.settings.get_stream_path(event.frame.collection_id))
+                / f"{event.frame.camera_name}.jpg"
+            )
+        if self.batcher is not None:
+            # Resolve with the batch, so callers awaiting this frame keep in-flight work bounded.
+            await asyncio.shield(self.batcher.add(event.frame.collection_id, (event.frame, source)))
+            return
+        await self.process_batch_async([(event.frame, source)])
 
-    def process_frame(self, frame: Frame, image_path: str) -> None:
-        frame_id = frame.id
+    async def process_batch_async(self, items: List[Tuple[Frame, FrameSource]]) -> None:
+        """Feed the frames into the pipeline and wait until they are tracked."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        job = FrameJob(items, seq=self._order.ticket(), on_done=lambda: loop.call_soon_threadsafe(
+            lambda: done.done() or done.set_result(None)
+        ))
         try:
-            image = self._load_image(image_path)
-            if image is None:
-                logger.error("Failed to load image %s", image_path)
+            # Submitting blocks while the decode queue is full; keep that off the event loop.
+            await loop.run_in_executor(None, self.pipeline.submit, job)
+        except BaseException:
+            self._drop(job)
+            raise
+        await done
+
+    def process_frame(self, frame: Frame, source: FrameSource) -> None:
+        """Process one frame. ``source`` is the encoded image, or a path for frames only on disk."""
+        self.process_batch([(frame, source)])
+
+    def process_batch(self, items: List[Tuple[Frame, FrameSource]]) -> None:
+        """Run every stage inline on the calling thread."""
+        job = FrameJob(items)
+        for name in self.STAGES:
+            job = getattr(self, f"_{name}_stage")(job)
+            if job is None:
                 return
 
-            composites, bodies = self._detect_objects(image, frame.id)
+    def start(self) -> None:
+        """Start the stage workers; frames submitted before this wait in the decode queue."""
+        self.pipeline.start()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-stage queue depth, throughput and utilization."""
+        return self.pipeline.stats()
 
-            paired_composites = self.face_body_matcher.match_faces_to_bodies(composites, bodies)
-            
-            with self.uow_factory() as uow:
-                uow.repository.add(frame)
-                self.tracking_service.handle_frame(uow, frame, paired_composites, bodies)
-                logger.info("Processed frame %s from collection %s: %d faces, %d bodies", frame.id, frame.collection_id, len(composites), len(bodies))
-                uow.commit()
+    def close(self) -> None:
+        self.pipeline.stop()
+        logger.info("Pipeline stats: %s", self.pipeline.stats())
+        if self._detection_pool is not None:
+            self._detection_pool.shutdown(wait=True)
+        if self.object_detector is not None:
+            self.object_detector.close()
+
+    def _decode_stage(self, job: FrameJob) -> Optional[FrameJob]:
+        for frame, source in job.items:
+            try:
+                image = self._decode_image(source) if isinstance(source, bytes) else self._load_image(source)
+            except Exception:
+                logger.exception("Error decoding frame %s", frame.id)
+                continue
+            if image is None:
+                logger.error("Failed to decode frame %s", frame.id)
+                continue
+            job.frames.append(frame)
+            job.images.append(image)
+        job.items = []
+        if not job.frames:
+            self._drop(job)
+            return None
+        return job
+
+    def _detect_stage(self, job: FrameJob) -> FrameJob:
+        """Detect all frames of the job in one model batch."""
+        frame_ids = [frame.id for frame in job.frames]
+        if self.object_detector is not None:
+            job.faces, job.bodies = self.object_detector.detect_batch(job.images, frame_ids)
+        elif self._detection_pool is not None:
+            bodies = self._detection_pool.submit(self.body_detector.detect_bodies_batch, job.images, frame_ids)
+            try:
+                job.faces = self.face_detector.detect_faces_batch(job.images, frame_ids)
+            except BaseException:
+                # The body call still reads job.images; let it finish, but keep the face error.
+                wait([bodies])
+                raise
+            job.bodies = bodies.result()
+        else:
+            job.faces = self.face_detector.detect_faces_batch(job.images, frame_ids)
+            job.bodies = self.body_detector.detect_bodies_batch(job.images, frame_ids)
+        # Pixels are not needed past this point.
+        job.images = []
+        return job
+
+    def _match_stage(self, job: FrameJob) -> FrameJob:
+        job.paired = [
+            self.face_body_matcher.match_faces_to_bodies(composites, bodies)
+            for composites, bodies in zip(job.faces, job.bodies)
+        ]
+        return job
+
+    def _track_stage(self, job: FrameJob) -> None:
+        """Track jobs in submission order, holding back any that overtook an earlier one."""
+        if job.seq is None:
+            self._track_job(job)
+        else:
+            self._release(job.seq, job)
+
+    def _drop(self, job: FrameJob) -> None:
+        """Give up on a job that will never reach tracking, so later jobs are not held back for it."""
+        job.finish()
+        if job.seq is not None:
+            self._release(job.seq, None)
+
+    def _release(self, seq: int, job: Optional[FrameJob]) -> None:
+        with self._track_lock:
+            for ready in self._order.push(seq, job):
+                self._track_job(ready)
+
+    def _track_job(self, job: FrameJob) -> None:
+        """Recognize, track and persist each frame in its own transaction."""
+        try:
+            for frame, faces, paired, bodies in zip(job.frames, job.faces, job.paired, job.bodies):
+                self._track_frame(frame, faces, paired, bodies)
+        finally:
+            job.finish()
+
+    def _track_frame(self, frame: Frame, composites: List[Composite], paired_composites: List[Composite], bodies: List[Body]) -> None:
+        try:
+            self.tracking_service.track_frame(frame, paired_composites, bodies)
+            logger.info("Processed frame %s from collection %s: %d faces, %d bodies", frame.id, frame.collection_id, len(composites), len(bodies))
 
         except Exception:
-            logger.exception("Error processing frame %s", frame_id)
+            logger.exception("Error processing frame %s", frame.id)
+
+    def _decode_image(self, data: bytes):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        # Convert in place: no second full-frame allocation.
+        return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
 
     def _load_image(self, image_path: str):
         img = cv2.imread(image_path)
-        return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-    def _detect_objects(self, image: np.ndarray, frame_id: str) -> tuple[list[Composite], list[Body]]:
-        faces = self.face_detector.detect_faces(image, frame_id)
-        bodies = self.body_detector.detect_bodies(image, frame_id)
-
-        return faces, bodies
+        return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
@@ -0,0 +1,65 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class TimeoutScheduler:
+    """Min-heap of visitor ids keyed on their next state-transition deadline.
+
+    Rescheduling or cancelling a visitor leaves its old heap entry in place;
+    entries that no longer match ``_deadlines`` are skipped when popped.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._deadlines: Dict[str, datetime] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, visitor_id: str) -> bool:
+        return visitor_id in self._deadlines
+
+    def schedule(self, visitor_id: str, deadline: Optional[datetime]) -> None:
+        """Set (or move) the visitor's deadline; None cancels it."""
+        with self._lock:
+            if deadline is None:
+                self._deadlines.pop(visitor_id, None)
+                return
+            if self._deadlines.get(visitor_id) == deadline:
+                return
+            self._deadlines[visitor_id] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), visitor_id))
+            self._compact()
+
+    def cancel(self, visitor_id: str) -> None:
+        self.schedule(visitor_id, None)
+
+    def pop_due(self, current_time: datetime) -> List[str]:
+        """Remove and return every visitor whose deadline is at or before current_time."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= current_time:
+                deadline, _, visitor_id = heapq.heappop(self._heap)
+                if self._deadlines.get(visitor_id) == deadline:
+                    del self._deadlines[visitor_id]
+                    due.append(visitor_id)
+        return due
+
+    def next_deadline(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def _compact(self) -> None:
+        # Every sighting reschedules, so stale entries pile up; rebuild once they dominate.
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [
+                (deadline, next(self._seq), visitor_id) for visitor_id, deadline in self._deadlines.items()
+            ]
+            heapq.heapify(self._heap)
@@ -1,7 +1,8 @@
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Set
 from randomname import get_name
 import uuid
 import asyncio
+import threading
 
 from the_judge.domain.tracking.model import Visitor, Detection, VisitorState, Body, Composite, Frame, VisitorSession, VisitorCollection
 from the_judge.domain.tracking.ports import FaceRecognizerPort
@@ -9,6 +10,9 @@ from the_judge.infrastructure.db.unit_of_work import AbstractUnitOfWork
 from the_judge.application.messagebus import MessageBus
 from the_judge.domain.tracking.events import FrameProcessed
 from the_judge.application.services.collection_buffer import CollectionBuffer
+from the_judge.application.services.timeout_scheduler import TimeoutScheduler
+from the_judge.application.services.visitor_registry import VisitorRegistry
+from the_judge.infrastructure.db.history_writer import HistoryWriter
 from the_judge.common.logger import setup_logger
 from the_judge.common.datetime_utils import now
 
@@ -20,21 +24,49 @@ class TrackingService:
         self,
         face_recognizer: FaceRecognizerPort,
         uow_factory: Callable[[], AbstractUnitOfWork],
-        bus: MessageBus
+        bus: MessageBus,
+        collection_buffer: Optional[CollectionBuffer] = None,
+        history_writer: Optional[HistoryWriter] = None,
+        visitor_registry: Optional[VisitorRegistry] = None,
+        purge_interval: float = 10.0
     ):
         self.face_recognizer = face_recognizer
         self.uow_factory = uow_factory
         self.bus = bus
-        self.collection_buffer = CollectionBuffer()
+        self.collection_buffer = collection_buffer or CollectionBuffer()
+        self.history_writer = history_writer
+        self.timeouts = TimeoutScheduler()
+        self.visitors = visitor_registry if visitor_registry is not None else VisitorRegistry()
+        self.purge_interval = purge_interval
+        self._expired: Set[str] = set()
+        # The track thread and the timeout sweep change the same registry visitors; whichever holds
+        # this lock sees and writes them alone, through its commit. It also guards the heap and _expired.
+        self._lock = threading.RLock()
+        self._purge_task = None
         self._timeout_task = None
         self._running = False
 
+    def track_frame(self, frame: Frame, paired_composites: List[Composite], bodies: List[Body]) -> None:
+        """Track one frame in its own transaction, never interleaved with the timeout sweep."""
+        with self._lock, self.uow_factory() as uow:
+            self.handle_frame(uow, frame, paired_composites, bodies)
+            uow.commit()
+
     def handle_frame(
             self, uow: AbstractUnitOfWork, 
             frame: Frame, 
             paired_composites: List[Composite], 
             bodies: List[Body]) -> None:
+        with self._lock:
+            self._handle_frame(uow, frame, paired_composites, bodies)
+
+    def _handle_frame(
+            self, uow: AbstractUnitOfWork, 
+            frame: Frame, 
+            paired_composites: List[Composite], 
+            bodies: List[Body]) -> None:
         
+        self._ensure_registry(uow)
         collection = self.collection_buffer.get_or_create_collection(frame.collection_id)
 
         # Ensure all composites have a (new) visitor
@@ -46,12 +78,14 @@ class TrackingService:
 
         # Update state of detected visitors and create detections.
         for composite in recognized_composites:
-            is_new_in_collection = self.collection_buffer.add_composite(composite)
+            is_new_in_collection = self.collection_buffer.add_composite(composite, collection)
             composite.visitor.mark_sighting(frame, is_new_in_collection)
             composite.visitor.update_state(frame.captured_at)
             detections.append(composite.visitor.create_detection(frame, composite))
             dirty_visitors[composite.visitor.id] = composite.visitor
 
+        # Live state (registry, deadlines, gallery) only changes once the frame's transaction has committed.
+        uow.on_commit(lambda: self._publish_frame(list(dirty_visitors.values()), recognized_composites))
         self._persist_data(uow, frame, bodies, recognized_composites, detections, dirty_visitors.values())
 
         self._publish_visitor_events(recognized_composites)
@@ -67,11 +101,11 @@ class TrackingService:
         for composite in composites:
             # There may be matches with current collection buffer, either match or create a new visitor.
             if not composite.visitor:
-                matched_visitor = self.face_recognizer.match_against_collection(composite, collection.composites)
+                matched_visitor = self.face_recognizer.match_against_collection(composite, collection)
                 
-                if matched_visitor:
-                    visitor = uow.repository.get(Visitor, matched_visitor.id)
-                else:
+                # The registry drops expired visitors the collection may still hold.
+                visitor = self.visitors.get(matched_visitor.id) if matched_visitor else None
+                if visitor is None:
                     visitor = Visitor.create_new(get_name(), composite.face.captured_at)
                     
                 composite.visitor = visitor
@@ -81,22 +115,38 @@ class TrackingService:
             composites: List[Composite], detections: List[Detection], 
             dirty_visitors) -> None:
 
-        uow.repository.add(frame)
-        
-        for body in bodies:
-            uow.repository.add(body)
-        
-        for composite in composites:
-            uow.repository.add(composite.embedding)
-            uow.repository.add(composite.face)
-        
-        for detection in detections:
-            uow.repository.add(detection)
-        
-        for visitor in dirty_visitors:
-            uow.repository.merge(visitor)
-            if visitor.current_session:
-                uow.repository.merge(visitor.current_session)
+        if self.history_writer is not None:
+            # Append-only history goes out in a later batch once visitor state is committed;
+            # a failing writer refuses the frame before anything is. The frame row is committed
+            # now, since sessions opened or closed by this frame reference it.
+            self.history_writer.check()
+            uow.repository.add_all([frame], flush=False)
+            uow.on_commit(lambda: self.history_writer.add(bodies, composites, detections))
+        else:
+            # Everything is staged and written by the commit's single flush.
+            rows = [frame, *bodies]
+            for composite in composites:
+                rows.append(composite.embedding)
+                rows.append(composite.face)
+            rows.extend(detections)
+            uow.repository.add_all(rows, flush=False)
+
+        self._save_changes(uow, list(dirty_visitors))
+
+    def _save_changes(self, uow: AbstractUnitOfWork, visitors: List[Visitor]) -> None:
+        entities = visitors + [visitor.current_session for visitor in visitors if visitor.current_session]
+        uow.repository.save_changes(entities)
+        # Until the commit succeeds the changes are still pending; a rollback keeps them for the next save.
+        uow.on_commit(lambda: [entity.dirty.clear() for entity in entities])
+
+    def _publish_frame(self, visitors: List[Visitor], composites: List[Composite]) -> None:
+        with self._lock:
+            for visitor in visitors:
+                self.visitors.add(visitor)
+                self.timeouts.schedule(visitor.id, visitor.next_deadline())
+                # Seen again before its rows were purged: it is live, keep it.
+                self._expired.discard(visitor.id)
+        self.face_recognizer.add_to_gallery(composites)
 
     def _publish_visitor_events(self, composites: List[Composite]) -> None:
         for composite in composites:
@@ -105,78 +155,150 @@ class TrackingService:
                     self.bus.handle(event)
                 composite.visitor.events.clear()
 
-    def _cleanup_visitor(self, uow: AbstractUnitOfWork, visitor: Visitor) -> None:
-        for event in visitor.events:
-            self.bus.handle(event)
-        visitor.events.clear()
+    def _expire_visitor(self, visitor: Visitor) -> None:
+        """Drop an expired visitor from live state; its rows are purged later in bulk."""
+        with self._lock:
+            self.face_recognizer.forget_visitors([visitor.id])
+            self.timeouts.cancel(visitor.id)
+            self.visitors.remove(visitor.id)
+            self._expired.add(visitor.id)
 
-        detections = uow.repository.list_by(Detection, visitor_id=visitor.id)
-        embeddings = {d.embedding for d in detections}
+    def purge_expired(self) -> int:
+        """Delete every expired visitor's rows in a few set-based statements. Returns the visitor count."""
+        with self._lock:
+            # Anything back in the registry was seen again after it expired.
+            visitor_ids = [vid for vid in self._expired if vid not in self.visitors]
+            self._expired = set()
+        if not visitor_ids:
+            return 0
+        try:
+            # Their detections may still be buffered; deleting now would leave those rows behind.
+            if self.history_writer is not None and not self.history_writer.flush(timeout=self.purge_interval):
+                logger.warning("History writer has not drained; purging %d expired visitors next sweep", len(visitor_ids))
+                self._requeue_expired(visitor_ids)
+                return 0
+            with self.uow_factory() as uow:
+                embedding_ids = uow.repository.delete_visitors(visitor_ids)
+                uow.commit()
+        except Exception:
+            self._requeue_expired(visitor_ids)
+            raise
+        self.face_recognizer.remove_from_gallery(embedding_ids)
+        logger.info("Purged %d expired visitors and %d embeddings", len(visitor_ids), len(embedding_ids))
+        return len(visitor_ids)
 
-        for detection in detections:
-            uow.repository.delete(detection)
-        for embedding in embeddings:
-            uow.repository.delete(embedding)
+    def _requeue_expired(self, visitor_ids: List[str]) -> None:
+        with self._lock:
+            self._expired.update(vid for vid in visitor_ids if vid not in self.visitors)
 
-        uow.repository.delete(visitor)
+    def _ensure_registry(self, uow: AbstractUnitOfWork) -> None:
+        """Load every live visitor with its open session, and schedule their timeouts, the first time it is needed."""
+        with self._lock:
+            if self.visitors.loaded:
+                return
+            self.visitors.load([
+                visitor
+                for state in VisitorState if state != VisitorState.EXPIRED
+                for visitor in uow.repository.list_by(Visitor, load={"current_session": "selectin"}, state=state)
+            ])
+            # Expired before a restart but not purged yet: the next sweep deletes them.
+            self._expired.update(vid for vid, in uow.repository.list_values(Visitor, "id", state=VisitorState.EXPIRED))
+            active = self.visitors.active()
+            for visitor in active:
+                self.timeouts.schedule(visitor.id, visitor.next_deadline())
+            logger.info("Visitor registry loaded: %d visitors, %d with open sessions, %d expired awaiting purge",
+                        len(self.visitors), len(active), len(self._expired))
 
     def _handle_timeouts(self) -> None:
-        with self.uow_factory() as uow:
+        with self._lock:
             current_time = now()
-            
-            # Get visitors with active sessions 
-            active_sessions = uow.repository.list_by(VisitorSession, ended_at=None)
-            visitor_ids = [session.visitor_id for session in active_sessions]
-            
-            # Get the actual visitor objects
-            active_visitors = []
-            for visitor_id in visitor_ids:
-                visitor = uow.repository.get(Visitor, visitor_id)
-                if visitor:
-                    active_visitors.append(visitor)
-            
+            due_ids = self.timeouts.pop_due(current_time)
+            if not due_ids:
+                return
+            try:
+                self._apply_timeouts(due_ids, current_time)
+            except Exception:
+                # Popped deadlines would otherwise be lost; retry them on the next tick.
+                for visitor_id in due_ids:
+                    if visitor_id not in self.timeouts:
+                        self.timeouts.schedule(visitor_id, current_time)
+                raise
+
+    def _apply_timeouts(self, due_ids: List[str], current_time) -> None:
+        due_visitors = [v for v in map(self.visitors.get, due_ids) if v is not None]
+        rescheduled = []
+        with self.uow_factory() as uow:
             # Let domain model handle state transitions
-            for visitor in active_visitors:
+            for visitor in due_visitors:
                 visitor.update_state(current_time)
-                
-                uow.repository.merge(visitor)
-                if visitor.current_session:
-                    uow.repository.merge(visitor.current_session)
-                
-                # Publish any domain events generated during state transition
-                for event in visitor.events:
-                    self.bus.handle(event)
-                visitor.events.clear()
-            
-            # Now handle visitors that became expired during update_state
-            expired_visitors = [v for v in active_visitors if v.state == VisitorState.EXPIRED]
-            for visitor in expired_visitors:
-                self._cleanup_visitor(uow, visitor)
+                # A transition always emits an event; otherwise the deadline passed with nothing to write.
+                if visitor.events:
+                    self._save_changes(uow, [visitor])
+                    
+                    # Publish any domain events generated during state transition
+                    for event in visitor.events:
+                        self.bus.handle(event)
+                    visitor.events.clear()
+
+                # Like the full scan did, only visitors with an open session are followed.
+                session = visitor.current_session
+                if visitor.state != VisitorState.EXPIRED and session and session.is_active:
+                    rescheduled.append(visitor)
             
             uow.commit()
 
+        for visitor in rescheduled:
+            self.timeouts.schedule(visitor.id, visitor.next_deadline())
+
+        # Visitors that became expired during update_state leave live state now;
+        # deleting their rows is left to the purge task.
+        for visitor in due_visitors:
+            if visitor.state == VisitorState.EXPIRED:
+                self._expire_visitor(visitor)
+
     async def start_timeout_worker(self) -> None:
         if self._running:
             return
         self._running = True
         logger.info("Starting timeout worker")
+        with self.uow_factory() as uow:
+            self._ensure_registry(uow)
         self._timeout_task = asyncio.create_task(self._timeout_loop())
+        self._purge_task = asyncio.create_task(self._purge_loop())
 
     async def stop_timeout_worker(self) -> None:
         self._running = False
-        if self._timeout_task:
-            self._timeout_task.cancel()
-            try:
-                await self._timeout_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._timeout_task, self._purge_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        try:
+            self.purge_expired()
+        except Exception as e:
+            logger.error(f"Final expiry purge failed: {e}")
 
     async def _timeout_loop(self) -> None:
         logger.info("Timeout worker loop started")
         while self._running:
-            await asyncio.sleep(1)
+            # Sleep until the next deadline; new sightings are picked up within a second.
+            deadline = self.timeouts.next_deadline()
+            delay = 1.0 if deadline is None else (deadline - now()).total_seconds()
+            await asyncio.sleep(min(max(delay, 0.01), 1.0))
             try:
                 logger.debug("Running timeout check")
-                self._handle_timeouts()
+                # In a thread: it may wait for the frame being tracked to commit.
+                await asyncio.to_thread(self._handle_timeouts)
+            except Exception as e:
+                logger.error(f"Timeout worker error: {e}")
+
+    async def _purge_loop(self) -> None:
+        # Bulk deletes run in a thread so they never hold up the timeout sweep or the event loop.
+        while self._running:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await asyncio.to_thread(self.purge_expired)
             except Exception as e:
-                logger.error(f"Timeout worker error: {e}")
\ No newline at end of file
+                logger.error(f"Expiry purge error: {e}")
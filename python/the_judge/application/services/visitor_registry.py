@@ -0,0 +1,52 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from the_judge.domain.tracking.model import Visitor
+
+
+class VisitorRegistry:
+    """Every live visitor, with its open session, kept in memory.
+
+    Only this process changes visitors, so once loaded the registry is the
+    source of truth for tracking state and the database is its write-through
+    log: frames and timeouts read visitors from here, never from SQL.
+    """
+
+    def __init__(self):
+        self._visitors: Dict[str, Visitor] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._visitors)
+
+    def __contains__(self, visitor_id: str) -> bool:
+        return visitor_id in self._visitors
+
+    def load(self, visitors: Iterable[Visitor]) -> None:
+        with self._lock:
+            self._visitors = {visitor.id: visitor for visitor in visitors}
+            self.loaded = True
+
+    def get(self, visitor_id: str) -> Optional[Visitor]:
+        return self._visitors.get(visitor_id)
+
+    def get_many(self, visitor_ids: Iterable[str]) -> Dict[str, Visitor]:
+        with self._lock:
+            return {vid: self._visitors[vid] for vid in visitor_ids if vid in self._visitors}
+
+    def add(self, visitor: Visitor) -> None:
+        with self._lock:
+            self._visitors[visitor.id] = visitor
+
+    def remove(self, visitor_id: str) -> None:
+        with self._lock:
+            self._visitors.pop(visitor_id, None)
+
+    def active(self) -> List[Visitor]:
+        """Visitors with an open session."""
+        with self._lock:
+            return [
+                v for v in self._visitors.values()
+                if v.current_session is not None and v.current_session.is_active
+            ]
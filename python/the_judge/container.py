@@ -1,17 +1,29 @@
 # the_judge/container.py
 from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
 
 from the_judge.settings import get_settings
 from the_judge.infrastructure.db.engine import initialize_database
 from the_judge.infrastructure.db.unit_of_work import SqlAlchemyUnitOfWork
+from the_judge.infrastructure.db.history_writer import HistoryWriter
+from the_judge.infrastructure.db.retention import RetentionEngine, RetentionPolicy
 from the_judge.infrastructure.tracking.providers import InsightFaceProvider, YOLOProvider
 from the_judge.infrastructure.tracking.face_detector import FaceDetector
 from the_judge.infrastructure.tracking.face_recognizer import FaceRecognizer
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+from the_judge.infrastructure.tracking.ivf_index import IVFIndex
+from the_judge.infrastructure.tracking.persistent_index import PersistentIndex
+from the_judge.infrastructure.tracking.prototype_store import PrototypeStore
 from the_judge.infrastructure.tracking.body_detector import BodyDetector
 from the_judge.infrastructure.tracking.face_body_matcher import FaceBodyMatcher
 from the_judge.infrastructure.tracking.frame_collector import FrameCollector
+from the_judge.infrastructure.tracking.process_pool_detector import ProcessPoolDetector
 from the_judge.application.services.processing_service import FrameProcessingService
 from the_judge.application.services.tracking_service import TrackingService
+from the_judge.application.services.collection_buffer import CollectionBuffer
+from the_judge.application.services.ingest_queue import IngestQueue
+from the_judge.application.services.visitor_registry import VisitorRegistry
 from the_judge.application.messagebus import MessageBus
 from the_judge.domain.tracking.events import FrameSaved, FrameProcessed
 from the_judge.entrypoints.socket_client import SocketIOClient
@@ -22,57 +34,169 @@ class App:
     ws_client: SocketIOClient
     bus: MessageBus
     tracking_service: TrackingService
+    processing_service: FrameProcessingService
+    face_recognizer: FaceRecognizer
+    frame_collector: FrameCollector
+    ingest_queue: IngestQueue
+    ingest_consumers: int
+    history_writer: Optional[HistoryWriter] = None
+    retention: Optional[RetentionEngine] = None
+    retention_interval: float = 3600.0
 
     async def start(self):
+        if self.history_writer is not None:
+            self.history_writer.start()
         await self.tracking_service.start_timeout_worker()
+        self.processing_service.start()
+        if self.retention is not None:
+            await self.retention.start(self.retention_interval)
+        self.ingest_queue.start(self.processing_service.on_frame_saved, self.ingest_consumers)
         await self.ws_client.connect()
 
     async def stop(self):
+        if self.retention is not None:
+            await self.retention.stop()
         await self.tracking_service.stop_timeout_worker() 
         await self.ws_client.disconnect()
+        await self.ingest_queue.stop()
+        if self.processing_service.batcher is not None:
+            await self.processing_service.batcher.drain()
+        await self.frame_collector.flush()
+        self.processing_service.close()
+        if self.history_writer is not None:
+            self.history_writer.close()
+        self.face_recognizer.close()
+
+
+def _days(days: Optional[float]) -> Optional[timedelta]:
+    return None if days is None else timedelta(days=days)
+
+
+def create_embedding_index(cfg):
+    if cfg.face_index_backend == "ivf":
+        index = IVFIndex(nlist=cfg.ivf_nlist, nprobe=cfg.ivf_nprobe, dtype=cfg.face_index_dtype)
+    else:
+        index = EmbeddingGallery(dtype=cfg.face_index_dtype)
+
+    if not cfg.face_index_path:
+        return index
+    return PersistentIndex(
+        index,
+        cfg.face_index_path,
+        dim=cfg.face_embedding_dim,
+        dtype=cfg.face_index_dtype,
+        checkpoint_every=cfg.face_index_checkpoint_every,
+        checkpoint_seconds=cfg.face_index_checkpoint_seconds,
+    )
 
 
 def create_app() -> App:
+    cfg = get_settings()
     initialize_database()
 
-    face_provider = InsightFaceProvider()
-    body_provider = YOLOProvider()
-    
-    face_model = FaceDetector(face_provider.get_face_model())
-    body_model = BodyDetector(body_provider.get_body_model())
+    if cfg.inference_mode == "process":
+        # Workers load their own models; keep them out of this process.
+        object_detector = ProcessPoolDetector(cfg.inference_processes, cfg.inference_device)
+        face_model = body_model = None
+    else:
+        object_detector = None
+        face_model = FaceDetector(InsightFaceProvider(cfg.inference_device).get_face_model())
+        body_model = BodyDetector(YOLOProvider(cfg.inference_device).get_body_model())
     
     face_body_matcher = FaceBodyMatcher()
     
     bus = MessageBus()
     uow_factory = SqlAlchemyUnitOfWork
     
+    visitor_registry = VisitorRegistry()
+
     face_recognizer = FaceRecognizer(
         face_model,
-        uow_factory
+        uow_factory,
+        threshold=cfg.face_recognition_threshold,
+        gallery=create_embedding_index(cfg),
+        prototypes=PrototypeStore(cfg.prototype_exemplars) if cfg.prototype_matching else None,
+        prototype_margin=cfg.prototype_margin,
+        visitor_source=visitor_registry.get_many
     )
     
+    history_writer = HistoryWriter(
+        max_rows=cfg.history_batch_rows,
+        max_delay=cfg.history_batch_seconds
+    ) if cfg.history_write_behind else None
+
     tracking_service = TrackingService(
         face_recognizer=face_recognizer,
         uow_factory=uow_factory,
-        bus=bus
+        bus=bus,
+        collection_buffer=CollectionBuffer(
+            max_collections=cfg.collection_window_size,
+            max_age=timedelta(seconds=cfg.collection_window_seconds)
+        ),
+        history_writer=history_writer,
+        visitor_registry=visitor_registry,
+        purge_interval=cfg.expiry_purge_seconds
     )
 
+    ingest_queue = IngestQueue(cfg.ingest_queue_capacity, cfg.ingest_policy)
+    frame_collector = FrameCollector(
+        bus=bus,
+        ingest_queue=ingest_queue,
+        max_pending_writes=cfg.persist_frames_max_pending
+    )
+    
     processing_service = FrameProcessingService(
         face_detector=face_model,
         body_detector=body_model,
         face_body_matcher=face_body_matcher,
         tracking_service=tracking_service,
         bus=bus,
-        uow_factory=uow_factory
-    )
-    
-    frame_collector = FrameCollector(
-        bus=bus
+        uow_factory=uow_factory,
+        stage_workers={
+            "decode": cfg.pipeline_decode_workers,
+            "detect": cfg.pipeline_detect_workers,
+        },
+        stage_capacity=cfg.pipeline_queue_size,
+        batch_wait=cfg.collection_batch_wait,
+        batch_max=cfg.collection_batch_max,
+        expected_batch_size=lambda: frame_collector.camera_count,
+        object_detector=object_detector,
+        concurrent_detection=cfg.concurrent_detection
     )
     
-    bus.subscribe(FrameSaved, processing_service.on_frame_saved)
+    # FrameSaved flows through the ingest queue; consumers are started with the app.
+    # Enough consumers to fill a cross-camera batch, otherwise enough to keep every stage busy.
+    ingest_consumers = cfg.collection_batch_max if cfg.collection_batch_wait is not None else cfg.pipeline_queue_size
     #bus.subscribe(FrameProcessed, tracking_service.handle_frame_processed)
     
+    retention = None
+    if cfg.retention_enabled:
+        retention = RetentionEngine(
+            RetentionPolicy(
+                max_age=_days(cfg.retention_max_age_days),
+                max_detections_per_visitor=cfg.retention_max_detections_per_visitor,
+                keep_best_embeddings=cfg.retention_keep_best_embeddings,
+                session_summary_age=_days(cfg.retention_session_summary_days),
+                batch_size=cfg.retention_batch_size,
+                vacuum_step_pages=cfg.retention_vacuum_step_pages,
+                full_vacuum_hours=cfg.retention_full_vacuum_hours,
+                vacuum_free_ratio=cfg.retention_vacuum_free_ratio,
+            ),
+            on_embeddings_deleted=face_recognizer.remove_from_gallery
+        )
+
     ws_client = SocketIOClient(frame_collector)
     
-    return App(ws_client=ws_client, bus=bus, tracking_service=tracking_service)
\ No newline at end of file
+    return App(
+        ws_client=ws_client,
+        bus=bus,
+        tracking_service=tracking_service,
+        processing_service=processing_service,
+        face_recognizer=face_recognizer,
+        frame_collector=frame_collector,
+        ingest_queue=ingest_queue,
+        ingest_consumers=ingest_consumers,
+        history_writer=history_writer,
+        retention=retention,
+        retention_interval=cfg.retention_interval_seconds
+    )
\ No newline at end of file
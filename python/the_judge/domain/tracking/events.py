@@ -3,7 +3,7 @@ from __future__ import annotations  # Add this line
 from dataclasses import dataclass
 from abc import ABC
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 if TYPE_CHECKING:
     from the_judge.domain.tracking.model import Visitor, Frame, VisitorSession
 
@@ -13,6 +13,8 @@ class Event(ABC):
 @dataclass
 class FrameSaved(Event):
     frame: Frame
+    # Encoded image as received; processing decodes it without a disk round-trip.
+    frame_data: Optional[bytes] = None
 
 @dataclass
 class FrameProcessed(Event):
@@ -74,6 +74,43 @@ class VisitorCollection:
     id: str
     created_at: datetime
     composites: List[Composite] = field(default_factory=list)
+    visitor_ids: Set[str] = field(default_factory=set)
+    # Normed embeddings of visitor composites, row-aligned with _embedding_visitors.
+    _embeddings: Optional[np.ndarray] = field(default=None, repr=False)
+    _embedding_visitors: List[Visitor] = field(default_factory=list, repr=False)
+
+    def add(self, composite: Composite) -> bool:
+        """Append a composite. Returns True if its visitor is new in this collection."""
+        self.composites.append(composite)
+        visitor = composite.visitor
+        if visitor is None:
+            return False
+
+        normed = composite.embedding.normed_embedding if composite.embedding else None
+        if normed is not None:
+            self._append_embedding(np.asarray(normed, dtype=np.float32).ravel(), visitor)
+
+        if visitor.id in self.visitor_ids:
+            return False
+        self.visitor_ids.add(visitor.id)
+        return True
+
+    def embeddings(self) -> tuple[np.ndarray, List[Visitor]]:
+        """Matrix of collected normed embeddings and the visitor owning each row."""
+        size = len(self._embedding_visitors)
+        if not size:
+            return np.empty((0, 0), dtype=np.float32), []
+        return self._embeddings[:size], self._embedding_visitors
+
+    def _append_embedding(self, vector: np.ndarray, visitor: Visitor) -> None:
+        size = len(self._embedding_visitors)
+        if self._embeddings is None or size == self._embeddings.shape[0]:
+            grown = np.empty((max(16, 2 * size), vector.shape[0]), dtype=np.float32)
+            if size:
+                grown[:size] = self._embeddings
+            self._embeddings = grown
+        self._embeddings[size] = vector
+        self._embedding_visitors.append(visitor)
 
 class VisitorState(Enum):
     TEMPORARY = "temporary"
@@ -97,6 +134,8 @@ class Visitor:
     created_at: datetime = field(default_factory=datetime_utils.now)
     current_session: Optional[VisitorSession] = None
     events: List = field(default_factory=list, compare=False)
+    # Names of fields changed since the last save, so only those are written.
+    dirty: Set[str] = field(default_factory=set, compare=False, repr=False)
 
     @classmethod
     def create_new(cls, name: str, current_time: datetime) -> "Visitor":
@@ -105,8 +144,10 @@ class Visitor:
     def mark_sighting(self, frame: Frame, increment_seen: bool) -> None:
         if increment_seen:
             self.seen_count += 1
+            self.dirty.add("seen_count")
         self.frame_count += 1
         self.last_seen = frame.captured_at
+        self.dirty.update(("frame_count", "last_seen"))
 
         if self.current_session and self.current_session.is_active:
             self.current_session.increment_frame(frame)
@@ -138,6 +179,18 @@ class Visitor:
             self.state = VisitorState.RETURNING
             self._emit_event_if_changed(old_state, VisitorReturned(visitor=self))
 
+        if self.state != old_state:
+            self.dirty.add("state")
+
+    def next_deadline(self) -> Optional[datetime]:
+        """Earliest time update_state can change this visitor without a new sighting."""
+        if self.state == VisitorState.MISSING or self._should_be_promoted(self.last_seen):
+            return self.last_seen
+        deadline = self.last_seen + self.MISSING_AFTER
+        if self.state == VisitorState.TEMPORARY:
+            deadline = min(deadline, self.last_seen + self.REMOVE_AFTER)
+        return deadline
+
     def create_detection(self, frame: Frame, composite: Composite) -> Detection:
         return Detection(
             id=str(uuid.uuid4()),
@@ -188,6 +241,7 @@ class VisitorSession:
     captured_at: Optional[datetime] = None
     frame_count: int = 1
     ended_at: Optional[datetime] = None
+    dirty: Set[str] = field(default_factory=set, compare=False, repr=False)
 
     @classmethod
     def create_new(cls, visitor_id: str, frame: Frame) -> "VisitorSession":
@@ -201,9 +255,11 @@ class VisitorSession:
     def increment_frame(self, frame: Frame) -> None:
         self.captured_at = frame.captured_at
         self.frame_count += 1
+        self.dirty.update(("captured_at", "frame_count"))
 
     def end(self, ended_at: datetime) -> None:
         self.ended_at = ended_at
+        self.dirty.add("ended_at")
 
     @property
     def is_active(self) -> bool:
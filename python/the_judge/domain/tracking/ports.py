@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Any, Dict, Optional, Type, Tuple
+from typing import List, Any, Dict, Optional, Set, Type, Tuple
 import numpy as np
-from .model import Frame, Face, FaceEmbedding, Body, Composite, Visitor
+from .model import Frame, Face, FaceEmbedding, Body, Composite, Visitor, VisitorCollection
 
 
 class FrameCollectorPort(ABC):
@@ -24,12 +24,36 @@ class FaceDetectorPort(ABC):
         """Detect faces in image and return Composite objects."""
         pass
 
+    def detect_faces_batch(self, images: List[np.ndarray], frame_ids: List[str]) -> List[List[Composite]]:
+        """Detect faces in several images at once. Defaults to one call per image."""
+        return [self.detect_faces(image, frame_id) for image, frame_id in zip(images, frame_ids)]
+
 class BodyDetectorPort(ABC):
     @abstractmethod
     def detect_bodies(self, image: np.ndarray, frame_id: str) -> List[Body]:
         """Detect body bounding boxes in image data."""
         pass
 
+    def detect_bodies_batch(self, images: List[np.ndarray], frame_ids: List[str]) -> List[List[Body]]:
+        """Detect bodies in several images at once. Defaults to one call per image."""
+        return [self.detect_bodies(image, frame_id) for image, frame_id in zip(images, frame_ids)]
+
+class ObjectDetectorPort(ABC):
+    """Face and body detection in one call, for executors that run both models together."""
+
+    # Calls that can run at once; the detect stage gets at least this many workers.
+    workers: int = 1
+
+    @abstractmethod
+    def detect_batch(
+        self, images: List[np.ndarray], frame_ids: List[str]
+    ) -> Tuple[List[List[Composite]], List[List[Body]]]:
+        """Faces and bodies detected in each image."""
+        pass
+
+    def close(self) -> None:
+        pass
+
 class FaceBodyMatcherPort(ABC):
     @abstractmethod
     def match_faces_to_bodies(self, faces: List[Composite], bodies: List[Body]) -> List[Composite]:
@@ -42,7 +66,65 @@ class FaceRecognizerPort(ABC):
         pass
 
     @abstractmethod
-    def match_against_collection(self, composite: Composite, collection: List[Composite]) -> Optional[Visitor]:
+    def match_against_collection(self, composite: Composite, collection: VisitorCollection) -> Optional[Visitor]:
+        """Best matching visitor among the composites already in the collection."""
+        pass
+
+    def add_to_gallery(self, composites: List[Composite]) -> None:
+        """Make persisted embeddings searchable. Optional for recognizers without a gallery."""
+        pass
+
+    def remove_from_gallery(self, embedding_ids: List[str]) -> None:
+        """Forget embeddings that were deleted from the repository."""
+        pass
+
+    def forget_visitors(self, visitor_ids: List[str]) -> None:
+        """Drop any per-visitor recognition state for deleted visitors."""
+        pass
+
+    def close(self) -> None:
+        """Flush any persisted recognition state on shutdown."""
+        pass
+
+class EmbeddingIndexPort(ABC):
+    """Searchable store of normed face embeddings keyed by embedding id, each tagged with its visitor id."""
+    loaded: bool = False
+
+    @abstractmethod
+    def load(self, embedding_ids: List[str], visitor_ids: List[str], vectors: List[np.ndarray]) -> None:
+        """Bulk fill the index once at startup."""
+        pass
+
+    @abstractmethod
+    def add(self, embedding_ids: List[str], visitor_ids: List[str], vectors: List[np.ndarray]) -> None:
+        pass
+
+    @abstractmethod
+    def remove(self, embedding_ids: List[str]) -> None:
+        pass
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, str, float]]]:
+        """Return the top-k (embedding_id, visitor_id, similarity) hits for each query row."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> Tuple[List[str], List[str], np.ndarray]:
+        """Copy of all embedding ids, visitor ids and vectors, row aligned."""
+        pass
+
+    def restore(self) -> Set[str]:
+        """Warm-start from persisted state. Returns the embedding ids restored."""
+        return set()
+
+    def checkpoint(self) -> None:
+        pass
+
+    def close(self) -> None:
         pass
 
 class FaceMLProvider(ABC):
@@ -1,7 +1,8 @@
 # infrastructure/db/engine.py
 from pathlib import Path
+from typing import Dict
 
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, event, Engine
 from sqlalchemy.orm import sessionmaker
 
 from the_judge.settings import get_settings
@@ -10,6 +11,57 @@ from the_judge.settings import get_settings
 _engine: Engine = None
 _session_factory: sessionmaker = None
 
+# PRAGMAs applied to every new SQLite connection, per Settings.sqlite_profile.
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "production": {
+        # Freed pages can be returned in small steps instead of a full VACUUM locking the database.
+        # Only takes effect on a new file; existing ones are converted by one full VACUUM.
+        "auto_vacuum": "INCREMENTAL",
+        # Readers no longer block the writer, and commits append to the WAL instead of rewriting pages.
+        "journal_mode": "WAL",
+        # In WAL mode NORMAL only syncs at checkpoints; a power loss can drop the last commits, never corrupt.
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def create_db_engine(database_url: str, profile: str = "default", pool_size: int = 5,
+                     cache_size_mb: int = 64, mmap_size_mb: int = 256, busy_timeout: float = 5.0,
+                     echo: bool = False) -> Engine:
+    """Create an engine, applying the SQLite profile's pragmas on each new connection."""
+    if not database_url.startswith('sqlite'):
+        return create_engine(database_url, echo=echo)
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile {profile!r}, expected one of {list(SQLITE_PROFILES)}")
+
+    if profile == "default" or database_url in ("sqlite://", "sqlite:///:memory:"):
+        return create_engine(database_url, echo=echo)
+
+    engine = create_engine(
+        database_url,
+        echo=echo,
+        # Pooled connections are handed between the pipeline, writer and timeout threads,
+        # but each is only used by one thread at a time.
+        connect_args={"check_same_thread": False, "timeout": busy_timeout},
+        pool_size=pool_size,
+        max_overflow=pool_size,
+    )
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pragmas["cache_size"] = -cache_size_mb * 1024  # negative: KiB rather than pages
+    pragmas["mmap_size"] = mmap_size_mb * 1024 * 1024
+    pragmas["busy_timeout"] = int(busy_timeout * 1000)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
 
 def get_engine() -> Engine:
     """Get or create SQLAlchemy engine."""
@@ -24,8 +76,13 @@ def get_engine() -> Engine:
             db_path = database_url.replace('sqlite:///', '')
             Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
-        _engine = create_engine(
+        _engine = create_db_engine(
             database_url,
+            profile=config.sqlite_profile,
+            pool_size=config.db_pool_size,
+            cache_size_mb=config.sqlite_cache_size_mb,
+            mmap_size_mb=config.sqlite_mmap_size_mb,
+            busy_timeout=config.sqlite_busy_timeout,
             echo=getattr(config, 'debug', False),  # Use debug flag for SQL logging
         )
     return _engine
@@ -35,7 +92,9 @@ def get_session_factory() -> sessionmaker:
     """Get or create SQLAlchemy session factory."""
     global _session_factory
     if _session_factory is None:
-        _session_factory = sessionmaker(bind=get_engine())
+        # Domain objects (visitors, composites) outlive their unit of work in the
+        # collection buffer and gallery, so keep their state loaded after commit.
+        _session_factory = sessionmaker(bind=get_engine(), expire_on_commit=False)
     return _session_factory
 
 
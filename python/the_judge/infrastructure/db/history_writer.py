@@ -0,0 +1,220 @@
+# the_judge/infrastructure/db/history_writer.py
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Engine, Table
+
+from the_judge.common.logger import setup_logger
+from the_judge.domain.tracking.model import Body, Composite, Detection
+from the_judge.infrastructure.db.engine import get_engine
+from the_judge.infrastructure.db.orm import (
+    EMBEDDING_COLUMNS, bodies as bodies_table, detections as detections_table,
+    face_embeddings, faces,
+)
+from the_judge.settings import get_settings
+
+logger = setup_logger("HistoryWriter")
+
+# Insert order of a batch: referenced rows first. Frame rows are not buffered: sessions point at
+# them, so they are committed with the visitor state before their history is handed over.
+HISTORY_TABLES = (face_embeddings, bodies_table, faces, detections_table)
+
+
+def _row(table: Table, entity: Any, columns=None) -> Dict[str, Any]:
+    return {name: getattr(entity, name) for name in (columns or table.c.keys())}
+
+
+def history_rows(bodies: List[Body], composites: List[Composite],
+                 detections: List[Detection]) -> Dict[str, List[Dict[str, Any]]]:
+    """Column dicts of a frame's append-only rows, keyed by table name."""
+    embedding_columns = ("id",) + EMBEDDING_COLUMNS[get_settings().embedding_storage]
+    return {
+        face_embeddings.name: [_row(face_embeddings, c.embedding, embedding_columns) for c in composites],
+        bodies_table.name: [_row(bodies_table, b) for b in bodies],
+        faces.name: [_row(faces, c.face) for c in composites],
+        detections_table.name: [
+            {
+                "id": d.id,
+                "frame_id": d.frame.id,
+                "face_id": d.face.id,
+                "embedding_id": d.embedding.id,
+                "body_id": d.body.id if d.body else None,
+                "visitor_id": d.visitor.id,
+                "state": d.state,
+                "captured_at": d.captured_at,
+            }
+            for d in detections
+        ],
+    }
+
+
+class HistoryWriter:
+    """Write-behind buffer for bodies, faces, embeddings and detections.
+
+    These rows are never read back while a frame is tracked, so they are
+    collected across frames and inserted by a background thread, one
+    transaction and one executemany per table per batch. A batch goes out once
+    ``max_rows`` rows are pending or ``max_delay`` seconds after its first row.
+    ``add`` blocks while ``max_pending`` rows are waiting, so a slow disk
+    slows tracking down instead of growing the buffer without bound.
+
+    A failed batch is retried with exponential backoff and stays counted as
+    pending. After ``max_retries`` failures the writer is marked failing:
+    ``add`` and ``flush`` raise, so frames stop committing visitor state whose
+    history cannot be written, and the batch keeps being retried until the
+    database accepts it again.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, max_rows: int = 500,
+                 max_delay: float = 1.0, max_pending: Optional[int] = None,
+                 max_retries: int = 5, retry_delay: float = 0.5, max_retry_delay: float = 10.0):
+        self.engine = engine or get_engine()
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_pending = max_pending or 4 * max_rows
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._pending: Dict[str, List[Dict[str, Any]]] = {t.name: [] for t in HISTORY_TABLES}
+        self._count = 0
+        # Rows of the batch being written (or retried); still held in memory.
+        self._writing = 0
+        self._first_at = 0.0
+        self._added = 0
+        self._written = 0
+        self._flush_requested = False
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows_written = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.failure: Optional[Exception] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, bodies: List[Body], composites: List[Composite], detections: List[Detection]) -> None:
+        """Buffer a frame's history; its frame row must already be committed."""
+        rows = history_rows(bodies, composites, detections)
+        size = sum(len(r) for r in rows.values())
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._count + self._writing < self.max_pending or self._closing or self.failure
+            )
+            self.check()
+            if not self._count:
+                self._first_at = time.monotonic()
+            for name, table_rows in rows.items():
+                self._pending[name].extend(table_rows)
+            self._count += size
+            self._added += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything added so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return self._count == 0
+        with self._cond:
+            target = self._added
+            if self._count:
+                self._flush_requested = True
+            self._cond.notify_all()
+            done = self._cond.wait_for(lambda: self._written >= target or self.failure, timeout)
+            if self._written < target:
+                self.check()
+            return bool(done)
+
+    def close(self) -> None:
+        """Write what is pending and stop the writer thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+        logger.info("History writer stopped: %s", self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_rows": self._count + self._writing,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "failing": self.failure is not None,
+        }
+
+    def check(self) -> None:
+        """Raise if history cannot currently be written."""
+        if self.failure is not None:
+            raise RuntimeError(f"History writer cannot write to the database: {self.failure}")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._count or self._closing)
+                if not self._count:
+                    return
+                remaining = self._first_at + self.max_delay - time.monotonic()
+                self._cond.wait_for(
+                    lambda: self._count >= self.max_rows or self._flush_requested or self._closing,
+                    max(remaining, 0.0),
+                )
+                batch, size, target = self._pending, self._count, self._added
+                self._pending = {t.name: [] for t in HISTORY_TABLES}
+                self._count = 0
+                self._writing = size
+                self._flush_requested = False
+                self._cond.notify_all()
+
+            self._write(batch, size)
+            with self._cond:
+                self._writing = 0
+                self._written = target
+                self._cond.notify_all()
+
+    def _write(self, batch: Dict[str, List[Dict[str, Any]]], size: int) -> None:
+        attempt = 0
+        while True:
+            try:
+                with self.engine.begin() as conn:
+                    for table in HISTORY_TABLES:
+                        if batch[table.name]:
+                            conn.execute(table.insert(), batch[table.name])
+                break
+            except Exception as error:
+                attempt += 1
+                if attempt > self.max_retries:
+                    with self._cond:
+                        if self.failure is None:
+                            logger.critical("History writes failing after %d attempts, tracking is stopped "
+                                            "until the database recovers: %s", attempt, error)
+                        self.failure = error
+                        self._cond.notify_all()
+                    if self._closing:
+                        # Nothing will retry it any more.
+                        self.failed_batches += 1
+                        logger.error("Dropping %d history rows on shutdown", size)
+                        return
+                else:
+                    logger.warning("Writing %d history rows failed (attempt %d), retrying: %s", size, attempt, error)
+                self.retries += 1
+                delay = min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay)
+                with self._cond:
+                    self._cond.wait(delay)
+
+        self.batches += 1
+        self.rows_written += size
+        if self.failure is not None:
+            with self._cond:
+                self.failure = None
+                self._cond.notify_all()
+            logger.info("History writes recovered after %d attempts", attempt + 1)
@@ -0,0 +1,69 @@
+# infrastructure/db/migrations.py
+import numpy as np
+from sqlalchemy import bindparam, select, text, update
+
+from the_judge.common.logger import setup_logger
+from the_judge.infrastructure.db.engine import get_engine
+from the_judge.infrastructure.db.orm import EMBEDDING_COLUMNS, face_embeddings, faces
+from the_judge.settings import get_settings
+
+logger = setup_logger("Migrations")
+
+
+def migrate_embedding_storage(batch_size: int = 1000, vacuum: bool = False) -> int:
+    """Re-encode ``face_embeddings`` with the configured dtype and stored vectors.
+
+    Walks the table in primary-key order, one small transaction per batch, so it
+    can be interrupted and re-run. Vectors that are no longer stored are set to
+    NULL; a missing stored vector is derived from the other one (the raw vector
+    is ``normed * faces.embedding_norm``). Returns the number of rows rewritten.
+    """
+    cfg = get_settings()
+    stored = EMBEDDING_COLUMNS[cfg.embedding_storage]
+    engine = get_engine()
+
+    query = (
+        select(
+            face_embeddings.c.id,
+            face_embeddings.c.embedding,
+            face_embeddings.c.normed_embedding,
+            faces.c.embedding_norm,
+        )
+        .select_from(face_embeddings.outerjoin(faces, faces.c.embedding_id == face_embeddings.c.id))
+        .order_by(face_embeddings.c.id)
+        .limit(batch_size)
+    )
+    statement = (
+        update(face_embeddings)
+        .where(face_embeddings.c.id == bindparam("row_id"))
+        .values(embedding=bindparam("raw"), normed_embedding=bindparam("normed"))
+    )
+
+    last_id, migrated = "", 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(query.where(face_embeddings.c.id > last_id)).all()
+            if not rows:
+                break
+            conn.execute(statement, [_reencode(row, stored) for row in rows])
+        last_id = rows[-1].id
+        migrated += len(rows)
+        logger.info("Re-encoded %d embeddings", migrated)
+
+    if vacuum and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    return migrated
+
+
+def _reencode(row, stored) -> dict:
+    raw, normed = row.embedding, row.normed_embedding
+    if normed is None and raw is not None:
+        normed = raw / max(float(np.linalg.norm(raw)), 1e-12)
+    if raw is None and normed is not None and row.embedding_norm:
+        raw = normed * row.embedding_norm
+    return {
+        "row_id": row.id,
+        "raw": raw if "embedding" in stored else None,
+        "normed": normed if "normed_embedding" in stored else None,
+    }
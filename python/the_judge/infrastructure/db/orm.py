@@ -2,8 +2,11 @@ from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Float
 from sqlalchemy.orm import registry, relationship
 from the_judge.domain.tracking.model import Frame, Face, Body, Detection, Visitor, FaceEmbedding, VisitorState, VisitorSession
 from the_judge.infrastructure.db.types.numpy_array import NumpyArray
+from the_judge.settings import get_settings
+import numpy as np
 import uuid
 
+_cfg = get_settings()
 metadata = MetaData()
 mapper_registry = registry()
 
@@ -33,10 +36,17 @@ faces = Table(
 face_embeddings = Table(
     'face_embeddings', metadata,
     Column('id', String(36), primary_key=True),
-    Column('embedding', NumpyArray),
-    Column('normed_embedding', NumpyArray)
+    Column('embedding', NumpyArray(_cfg.embedding_dtype)),
+    Column('normed_embedding', NumpyArray(_cfg.embedding_dtype))
 )
 
+# Which FaceEmbedding vectors are written; the other one is derived on load.
+EMBEDDING_COLUMNS = {
+    "both": ("embedding", "normed_embedding"),
+    "raw": ("embedding",),
+    "normed": ("normed_embedding",),
+}
+
 bodies = Table(
     'bodies', metadata,
     Column('id', String(36), primary_key=True),
@@ -84,7 +94,10 @@ sessions = Table(
 
 def start_mappers():
     mapper_registry.map_imperatively(Frame, frames)
-    mapper_registry.map_imperatively(FaceEmbedding, face_embeddings)
+    stored_vectors = EMBEDDING_COLUMNS[_cfg.embedding_storage]
+    mapper_registry.map_imperatively(FaceEmbedding, face_embeddings, exclude_properties=[
+        name for name in ("embedding", "normed_embedding") if name not in stored_vectors
+    ])
     
     mapper_registry.map_imperatively(Visitor, visitors, properties={
         'current_session': relationship(
@@ -121,6 +134,7 @@ def start_mappers():
     def _init_transients(v):
         if not hasattr(v, "events") or v.events is None:
             v.events = []
+        v.dirty = set()
 
     @event.listens_for(Visitor, "load")
     def _visitor_on_load(target, context):
@@ -130,6 +144,19 @@ def start_mappers():
     def _visitor_on_refresh(target, context, attrs):
         _init_transients(target)
 
+    @event.listens_for(VisitorSession, "load")
+    def _session_on_load(target, context):
+        target.dirty = set()
+
+    @event.listens_for(FaceEmbedding, "load")
+    def _embedding_on_load(target, context):
+        # Unmapped vectors: the raw magnitude is not recoverable, the normed one is.
+        if "normed_embedding" not in stored_vectors:
+            raw = target.embedding
+            target.normed_embedding = None if raw is None else raw / max(float(np.linalg.norm(raw)), 1e-12)
+        if "embedding" not in stored_vectors:
+            target.embedding = None
+
 
 
     
@@ -1,44 +1,86 @@
-from typing import Type, Any, Optional, List
+from typing import Type, Any, Optional, List, Dict, Iterable, Tuple
 from dataclasses import asdict
 import uuid
 
 from abc import ABC, abstractmethod
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, inspect
+from sqlalchemy.orm import Session, joinedload, lazyload, noload, raiseload, selectinload
+from sqlalchemy import bindparam, delete, desc, inspect, select, update
 from the_judge.domain.tracking.model import Frame, Face, Body, Detection, Visitor
+from the_judge.infrastructure.db.orm import detections, face_embeddings, faces, sessions, visitors
+
+
+# Relationship name (or "*" for all others) -> loading strategy, e.g.
+# {"embedding": "selectin", "*": "raise"}.
+LoadPlan = Dict[str, str]
+
+LOADERS = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "select": lazyload,
+    "noload": noload,
+    "raise": raiseload,
+}
 
 
 class AbstractRepository(ABC):
     @abstractmethod
-    def add(self, entity: Any) -> None:
+    def add(self, entity: Any, flush: bool = True) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_all(self, entities: List[Any], flush: bool = True) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def flush(self) -> None:
         raise NotImplementedError
     
     @abstractmethod
-    def get(self, entity_class: Type, entity_id: Any) -> Optional[Any]:
+    def get(self, entity_class: Type, entity_id: Any, load: Optional[LoadPlan] = None) -> Optional[Any]:
         raise NotImplementedError
     
     @abstractmethod
-    def list(self, entity_class: Type) -> List[Any]:
+    def list(self, entity_class: Type, load: Optional[LoadPlan] = None) -> List[Any]:
         raise NotImplementedError
     
     @abstractmethod
-    def get_by(self, entity_class: Type, **filters) -> Optional[Any]:
+    def list_ids(self, entity_class: Type) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_by_ids(self, entity_class: Type, entity_ids: List[str], load: Optional[LoadPlan] = None) -> List[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_values(self, entity_class: Type, *columns: str, **filters) -> List[tuple]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_by(self, entity_class: Type, load: Optional[LoadPlan] = None, **filters) -> Optional[Any]:
         raise NotImplementedError
     
     @abstractmethod
-    def list_by(self, entity_class: Type, **filters) -> List[Any]:
+    def list_by(self, entity_class: Type, load: Optional[LoadPlan] = None, **filters) -> List[Any]:
         raise NotImplementedError
     
     @abstractmethod
     def delete(self, entity: Any) -> None:
         raise NotImplementedError
     
+    @abstractmethod
+    def save_changes(self, entities: Iterable[Any]) -> None:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete_visitors(self, visitor_ids: List[str]) -> List[str]:
+        raise NotImplementedError
+    
     @abstractmethod
     def get_recent(self, entity_class: Type, limit: int) -> List[Any]: 
         raise NotImplementedError
         
     @abstractmethod
-    def merge(self, entity: Any) -> Any:
+    def merge(self, entity: Any, flush: bool = True) -> Any:
         raise NotImplementedError
         
     @abstractmethod
@@ -47,41 +89,87 @@ class AbstractRepository(ABC):
 
 
 class TrackingRepository:
+    # Stay well below SQLite's bound-parameter limit for IN (...) queries.
+    IN_CHUNK_SIZE = 500
+
     def __init__(self, session: Session):
         self.session = session
 
-    def add(self, entity: Any) -> Any:
+    def add(self, entity: Any, flush: bool = True) -> Any:
         if getattr(entity, "id", None) in (None, ""):
             setattr(entity, "id", str(uuid.uuid4()))
         self.session.add(entity)
-        self.session.flush()
+        if flush:
+            self.session.flush()
         return entity
 
-    def get(self, entity_class: Type, entity_id: str) -> Optional[Any]:
+    def add_all(self, entities: List[Any], flush: bool = True) -> List[Any]:
+        """Stage many entities for one flush.
+
+        Ids are assigned up front, so the flush sends one executemany INSERT per
+        table instead of a round trip per row. With flush=False the rows go out
+        with the next flush or commit.
+        """
+        entities = list(entities)
+        for entity in entities:
+            if getattr(entity, "id", None) in (None, ""):
+                setattr(entity, "id", str(uuid.uuid4()))
+        self.session.add_all(entities)
+        if flush:
+            self.session.flush()
+        return entities
+
+    def flush(self) -> None:
+        self.session.flush()
+
+    def get(self, entity_class: Type, entity_id: str, load: Optional[LoadPlan] = None) -> Optional[Any]:
         entity = (
-            self.session.query(entity_class)
+            self._query(entity_class, load)
             .filter_by(id=entity_id)
             .first()
         )
         return entity
 
-    def list(self, entity_class: Type) -> List[Any]:
-        entities = self.session.query(entity_class).all()
+    def list(self, entity_class: Type, load: Optional[LoadPlan] = None) -> List[Any]:
+        entities = self._query(entity_class, load).all()
+        return entities
+
+    def list_ids(self, entity_class: Type) -> List[str]:
+        """Get all primary keys without hydrating entities."""
+        id_col = inspect(entity_class).c.id
+        return [row[0] for row in self.session.query(id_col).all()]
+
+    def list_by_ids(self, entity_class: Type, entity_ids: List[str], load: Optional[LoadPlan] = None) -> List[Any]:
+        """Get all entities whose id is in entity_ids, in chunked IN queries."""
+        entity_ids = list(entity_ids)
+        id_col = inspect(entity_class).c.id
+        entities = []
+        for start in range(0, len(entity_ids), self.IN_CHUNK_SIZE):
+            chunk = entity_ids[start:start + self.IN_CHUNK_SIZE]
+            entities.extend(self._query(entity_class, load).filter(id_col.in_(chunk)).all())
         return entities
 
-    def get_by(self, entity_class: Type, **filters) -> Optional[Any]:
+    def list_values(self, entity_class: Type, *columns: str, **filters) -> List[tuple]:
+        """Get raw column tuples for all matching rows, skipping entity hydration."""
+        cols = inspect(entity_class).c
+        return [
+            tuple(row)
+            for row in self.session.query(*(cols[name] for name in columns)).filter_by(**filters).all()
+        ]
+
+    def get_by(self, entity_class: Type, load: Optional[LoadPlan] = None, **filters) -> Optional[Any]:
         """Get first entity matching the given filters."""
         entity = (
-            self.session.query(entity_class)
+            self._query(entity_class, load)
             .filter_by(**filters)
             .first()
         )
         return entity
     
-    def list_by(self, entity_class: Type, **filters) -> List[Any]:
+    def list_by(self, entity_class: Type, load: Optional[LoadPlan] = None, **filters) -> List[Any]:
         """Get all entities matching the given filters."""
         entities = (
-            self.session.query(entity_class)
+            self._query(entity_class, load)
             .filter_by(**filters)
             .all()
         )
@@ -92,14 +180,71 @@ class TrackingRepository:
         self.session.delete(entity)
         self.session.flush()
     
-    def merge(self, entity: Any) -> Any:
+    def merge(self, entity: Any, flush: bool = True) -> Any:
         """Merge entity (insert if new, update if exists)."""
         if getattr(entity, "id", None) in (None, ""):
             setattr(entity, "id", str(uuid.uuid4()))
-        merged = self.session.merge(entity)
-        self.session.flush()
+        # The lookup merge may run must not flush rows staged with flush=False.
+        with self.session.no_autoflush:
+            merged = self.session.merge(entity)
+        if flush:
+            self.session.flush()
         return merged
 
+    def save_changes(self, entities: Iterable[Any]) -> None:
+        """Write aggregates that track their changed fields in ``dirty``.
+
+        New entities are inserted. Entities loaded by this session are left to
+        its flush, which already writes only changed columns. Any other (held in
+        memory across units of work) gets a Core UPDATE of its dirty fields,
+        batched per table and field set, without the SELECT merge() would issue.
+        ``dirty`` is left as is: the caller clears it once the transaction commits,
+        so a rollback keeps the changes for the next save.
+        """
+        updates: Dict[Tuple[Any, Tuple[str, ...]], List[Dict[str, Any]]] = {}
+        for entity in entities:
+            state = inspect(entity)
+            if state.transient:
+                self.session.add(entity)
+            elif state.session is not self.session and entity.dirty:
+                fields = tuple(sorted(entity.dirty))
+                row = {name: getattr(entity, name) for name in fields}
+                row["_id"] = entity.id
+                updates.setdefault((state.mapper.local_table, fields), []).append(row)
+
+        for (table, fields), rows in updates.items():
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values({name: bindparam(name) for name in fields})
+            )
+            self.session.connection().execute(stmt, rows)
+
+    def delete_visitors(self, visitor_ids: List[str]) -> List[str]:
+        """Delete visitors with their sessions, detections, faces and embeddings.
+
+        Set-based: a handful of DELETE ... WHERE IN statements per chunk of
+        ids, whatever the number of rows. Returns the deleted embedding ids so
+        callers can evict them from in-memory indexes.
+        """
+        visitor_ids = list(visitor_ids)
+        conn = self.session.connection()
+        embedding_ids: List[str] = []
+        for start in range(0, len(visitor_ids), self.IN_CHUNK_SIZE):
+            chunk = visitor_ids[start:start + self.IN_CHUNK_SIZE]
+            chunk_embeddings = list(conn.execute(
+                select(detections.c.embedding_id).where(detections.c.visitor_id.in_(chunk)).distinct()
+            ).scalars())
+            conn.execute(delete(detections).where(detections.c.visitor_id.in_(chunk)))
+            for emb_start in range(0, len(chunk_embeddings), self.IN_CHUNK_SIZE):
+                emb_chunk = chunk_embeddings[emb_start:emb_start + self.IN_CHUNK_SIZE]
+                conn.execute(delete(faces).where(faces.c.embedding_id.in_(emb_chunk)))
+                conn.execute(delete(face_embeddings).where(face_embeddings.c.id.in_(emb_chunk)))
+            conn.execute(delete(sessions).where(sessions.c.visitor_id.in_(chunk)))
+            conn.execute(delete(visitors).where(visitors.c.id.in_(chunk)))
+            embedding_ids.extend(chunk_embeddings)
+        return embedding_ids
+
     def get_recent(self, entity_class: Type, limit: int) -> List[Any]:
         col = self._order_col(entity_class)
         return (
@@ -118,6 +263,17 @@ class TrackingRepository:
             .all()
         )
     
+    def _query(self, entity_class: Type, load: Optional[LoadPlan]):
+        """Query with per-query relationship loading instead of the mappers' lazy='select'."""
+        query = self.session.query(entity_class)
+        if not load:
+            return query
+        options = []
+        for name, strategy in load.items():
+            loader = LOADERS[strategy]
+            options.append(loader("*") if name == "*" else loader(getattr(entity_class, name)))
+        return query.options(*options)
+
     def _order_col(self, cls: Type):
         cols = inspect(cls).c
         for name in ("captured_at", "pk"):
@@ -0,0 +1,279 @@
+# infrastructure/db/retention.py
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Engine, delete, exists, func, or_, select, text, update
+
+from the_judge.common.datetime_utils import now
+from the_judge.common.logger import setup_logger
+from the_judge.infrastructure.db.engine import get_engine
+from the_judge.infrastructure.db.orm import bodies, detections, face_embeddings, faces, frames, sessions
+
+logger = setup_logger("Retention")
+
+
+@dataclass
+class RetentionPolicy:
+    # Detections older than this are pruned (None: no age limit)
+    max_age: Optional[timedelta] = timedelta(days=30)
+    # Newest detections kept per visitor (None: no count limit)
+    max_detections_per_visitor: Optional[int] = 500
+    # Highest-quality detections per visitor survive both limits, so the visitor stays recognizable
+    keep_best_embeddings: int = 10
+    # Ended sessions older than this are merged into one summary row per visitor (None: never)
+    session_summary_age: Optional[timedelta] = timedelta(days=7)
+    # Frames left without detections or sessions are deleted, with their bodies, after this long
+    orphan_frame_age: timedelta = timedelta(hours=1)
+    # Rows per transaction, and rows considered per table in one run
+    batch_size: int = 500
+    max_rows_per_run: int = 50_000
+    # Free pages returned to the OS per incremental_vacuum step, and per run (auto_vacuum=INCREMENTAL files)
+    vacuum_step_pages: int = 256
+    vacuum_max_pages_per_run: int = 25_600
+    # A full VACUUM locks the database for as long as it takes to rewrite the file. It only runs
+    # inside this (start, end) hour window, once vacuum_free_ratio of the file is free (None: never).
+    full_vacuum_hours: Optional[Tuple[int, int]] = None
+    vacuum_free_ratio: float = 0.25
+
+
+@dataclass
+class RetentionStats:
+    runs: int = 0
+    detections: int = 0
+    faces: int = 0
+    embeddings: int = 0
+    bodies: int = 0
+    frames: int = 0
+    sessions_merged: int = 0
+    bytes_reclaimed: int = 0
+    last_run_seconds: float = 0.0
+
+
+class RetentionEngine:
+    """Prunes tracking history so the database stops growing without bound.
+
+    Every step works through at most ``max_rows_per_run`` rows in transactions
+    of ``batch_size`` rows, so tracking writes are only ever blocked briefly,
+    and picks up where it left off on the next run.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[RetentionPolicy] = None,
+        engine: Optional[Engine] = None,
+        on_embeddings_deleted: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.policy = policy or RetentionPolicy()
+        self.engine = engine or get_engine()
+        # Deleted embeddings must also leave the in-memory recognition index.
+        self.on_embeddings_deleted = on_embeddings_deleted
+        self.totals = RetentionStats()
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> RetentionStats:
+        """One full pass: prune detections, summarize sessions, drop orphan frames, then maintenance."""
+        start = time.perf_counter()
+        run = RetentionStats(runs=1)
+        self._prune_detections(run)
+        self._summarize_sessions(run)
+        self._prune_orphan_frames(run)
+        self._maintain(run)
+        run.last_run_seconds = time.perf_counter() - start
+
+        for name, value in asdict(run).items():
+            if name != "last_run_seconds":
+                setattr(self.totals, name, getattr(self.totals, name) + value)
+        self.totals.last_run_seconds = run.last_run_seconds
+        logger.info("Retention run reclaimed: %s", asdict(run))
+        return run
+
+    def stats(self) -> Dict[str, float]:
+        return asdict(self.totals)
+
+    async def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+
+    def _prune_detections(self, run: RetentionStats) -> None:
+        policy = self.policy
+        if policy.max_age is None and policy.max_detections_per_visitor is None:
+            return
+
+        quality = func.coalesce(faces.c.quality_score, faces.c.det_score, 0.0)
+        ranked = (
+            select(
+                detections.c.id,
+                detections.c.face_id,
+                detections.c.embedding_id,
+                detections.c.captured_at,
+                func.row_number().over(
+                    partition_by=detections.c.visitor_id, order_by=detections.c.captured_at.desc()
+                ).label("recency"),
+                func.row_number().over(
+                    partition_by=detections.c.visitor_id,
+                    order_by=(quality.desc(), detections.c.captured_at.desc()),
+                ).label("quality_rank"),
+            )
+            .select_from(detections.outerjoin(faces, faces.c.id == detections.c.face_id))
+            .subquery()
+        )
+        expired = []
+        if policy.max_age is not None:
+            expired.append(ranked.c.captured_at < now() - policy.max_age)
+        if policy.max_detections_per_visitor is not None:
+            expired.append(ranked.c.recency > policy.max_detections_per_visitor)
+        query = (
+            select(ranked.c.id, ranked.c.face_id, ranked.c.embedding_id)
+            .where(or_(*expired), ranked.c.quality_rank > policy.keep_best_embeddings)
+            .limit(policy.max_rows_per_run)
+        )
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        for batch in _batches(rows, policy.batch_size):
+            detection_ids = [row.id for row in batch]
+            face_ids = [row.face_id for row in batch]
+            embedding_ids = [row.embedding_id for row in batch]
+            with self.engine.begin() as conn:
+                run.detections += conn.execute(delete(detections).where(detections.c.id.in_(detection_ids))).rowcount
+                run.faces += conn.execute(delete(faces).where(faces.c.id.in_(face_ids))).rowcount
+                run.embeddings += conn.execute(
+                    delete(face_embeddings).where(face_embeddings.c.id.in_(embedding_ids))
+                ).rowcount
+            self._evict(embedding_ids)
+
+    def _summarize_sessions(self, run: RetentionStats) -> None:
+        policy = self.policy
+        if policy.session_summary_age is None:
+            return
+
+        old = (sessions.c.ended_at.is_not(None), sessions.c.ended_at < now() - policy.session_summary_age)
+        with self.engine.connect() as conn:
+            visitor_ids = conn.execute(
+                select(sessions.c.visitor_id).where(*old)
+                .group_by(sessions.c.visitor_id).having(func.count() > 1)
+                .limit(policy.max_rows_per_run)
+            ).scalars().all()
+
+        for batch in _batches(visitor_ids, policy.batch_size):
+            with self.engine.begin() as conn:
+                rows = conn.execute(
+                    select(sessions).where(sessions.c.visitor_id.in_(batch), *old)
+                    .order_by(sessions.c.visitor_id, sessions.c.started_at)
+                ).all()
+                for _, group in groupby(rows, key=lambda row: row.visitor_id):
+                    group = list(group)
+                    last = max(group, key=lambda row: row.ended_at)
+                    # The first session becomes the summary spanning all of them.
+                    conn.execute(
+                        update(sessions).where(sessions.c.id == group[0].id).values(
+                            end_frame_id=last.end_frame_id,
+                            ended_at=last.ended_at,
+                            captured_at=max(row.captured_at for row in group),
+                            frame_count=sum(row.frame_count or 0 for row in group),
+                        )
+                    )
+                    merged = [row.id for row in group[1:]]
+                    conn.execute(delete(sessions).where(sessions.c.id.in_(merged)))
+                    run.sessions_merged += len(merged)
+
+    def _prune_orphan_frames(self, run: RetentionStats) -> None:
+        policy = self.policy
+        query = (
+            select(frames.c.id)
+            .where(
+                frames.c.captured_at < now() - policy.orphan_frame_age,
+                ~exists().where(detections.c.frame_id == frames.c.id),
+                ~exists().where(sessions.c.start_frame_id == frames.c.id),
+                ~exists().where(sessions.c.end_frame_id == frames.c.id),
+            )
+            .limit(policy.max_rows_per_run)
+        )
+        with self.engine.connect() as conn:
+            frame_ids = conn.execute(query).scalars().all()
+
+        for batch in _batches(frame_ids, policy.batch_size):
+            with self.engine.begin() as conn:
+                # Faces never matched to a visitor have no detection; they go with their frame.
+                embedding_ids = conn.execute(
+                    select(faces.c.embedding_id).where(faces.c.frame_id.in_(batch))
+                ).scalars().all()
+                run.faces += conn.execute(delete(faces).where(faces.c.frame_id.in_(batch))).rowcount
+                run.embeddings += conn.execute(
+                    delete(face_embeddings).where(face_embeddings.c.id.in_(embedding_ids))
+                ).rowcount
+                run.bodies += conn.execute(delete(bodies).where(bodies.c.frame_id.in_(batch))).rowcount
+                run.frames += conn.execute(delete(frames).where(frames.c.id.in_(batch))).rowcount
+            self._evict(embedding_ids)
+
+    def _maintain(self, run: RetentionStats) -> None:
+        if self.engine.dialect.name != "sqlite":
+            return
+        policy = self.policy
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            pages = conn.execute(text("PRAGMA page_count")).scalar()
+            free = conn.execute(text("PRAGMA freelist_count")).scalar()
+            # Refreshes planner statistics for tables that changed enough to matter.
+            conn.execute(text("PRAGMA optimize"))
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+                # Each step is its own short write, so tracking commits slip in between.
+                released = 0
+                while free and released < policy.vacuum_max_pages_per_run:
+                    step = min(policy.vacuum_step_pages, policy.vacuum_max_pages_per_run - released)
+                    # The pragma frees one page per VM step; the driver's execute() only steps once.
+                    conn.connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({step});")
+                    remaining = conn.execute(text("PRAGMA freelist_count")).scalar()
+                    if remaining >= free:
+                        break
+                    released += free - remaining
+                    free = remaining
+                run.bytes_reclaimed += released * page_size
+            elif policy.vacuum_free_ratio and pages and free / pages >= policy.vacuum_free_ratio:
+                if self._in_vacuum_window():
+                    logger.info("Vacuuming: %d of %d pages free", free, pages)
+                    # Also converts the file, so later runs can vacuum incrementally.
+                    conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+                    conn.execute(text("VACUUM"))
+                    run.bytes_reclaimed += (pages - conn.execute(text("PRAGMA page_count")).scalar()) * page_size
+                else:
+                    logger.info("%d of %d pages free; full VACUUM waits for the maintenance window", free, pages)
+            if conn.execute(text("PRAGMA journal_mode")).scalar() == "wal":
+                conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    def _in_vacuum_window(self) -> bool:
+        if self.policy.full_vacuum_hours is None:
+            return False
+        start, end = self.policy.full_vacuum_hours
+        hour = now().hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def _evict(self, embedding_ids: List[str]) -> None:
+        if embedding_ids and self.on_embeddings_deleted is not None:
+            self.on_embeddings_deleted(embedding_ids)
+
+
+def _batches(items, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
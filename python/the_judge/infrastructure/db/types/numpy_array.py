@@ -1,18 +1,70 @@
+import struct
+
 import numpy as np
 from sqlalchemy import LargeBinary
 from sqlalchemy.types import TypeDecorator
 
 
 class NumpyArray(TypeDecorator):
+    """Stores arrays as bytes, optionally quantized.
+
+    Encoded values start with a small header (magic, dtype code, shape and,
+    for int8, the per-vector scale). Values without the header are legacy raw
+    float32 buffers and are still decoded as before. Results are always
+    float32 regardless of the storage dtype.
+    """
     impl = LargeBinary
     cache_ok = True
 
+    MAGIC = b"NPA\x01"
+    HEADER = struct.Struct("<4sBB")
+    DTYPE_CODES = {"float32": 0, "float16": 1, "int8": 2}
+    SCALE = struct.Struct("<f")
+
+    def __init__(self, storage_dtype: str = "float32", *args, **kwargs):
+        if storage_dtype not in self.DTYPE_CODES:
+            raise ValueError(f"Unsupported storage dtype {storage_dtype!r}")
+        super().__init__(*args, **kwargs)
+        self.storage_dtype = storage_dtype
+
     def process_bind_param(self, value, dialect):
         if value is not None:
-            return value.tobytes()
+            return self.encode(np.asarray(value), self.storage_dtype)
         return value
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            return np.frombuffer(value, dtype=np.float32)
+            return self.decode(value)
         return value
+
+    @classmethod
+    def encode(cls, array: np.ndarray, storage_dtype: str) -> bytes:
+        shape = struct.pack(f"<{array.ndim}I", *array.shape)
+        header = cls.HEADER.pack(cls.MAGIC, cls.DTYPE_CODES[storage_dtype], array.ndim) + shape
+
+        if storage_dtype == "int8":
+            scale = float(np.abs(array).max()) / 127.0 if array.size else 0.0
+            quantized = np.zeros(array.shape, dtype=np.int8) if scale == 0.0 else (
+                np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+            )
+            return header + cls.SCALE.pack(scale) + quantized.tobytes()
+        return header + array.astype(storage_dtype).tobytes()
+
+    @classmethod
+    def decode(cls, value: bytes) -> np.ndarray:
+        if not value.startswith(cls.MAGIC):
+            return np.frombuffer(value, dtype=np.float32)
+
+        _, code, ndim = cls.HEADER.unpack_from(value)
+        offset = cls.HEADER.size
+        shape = struct.unpack_from(f"<{ndim}I", value, offset)
+        offset += 4 * ndim
+
+        if code == cls.DTYPE_CODES["int8"]:
+            (scale,) = cls.SCALE.unpack_from(value, offset)
+            offset += cls.SCALE.size
+            quantized = np.frombuffer(value, dtype=np.int8, offset=offset)
+            return (quantized.astype(np.float32) * scale).reshape(shape)
+
+        storage = np.float16 if code == cls.DTYPE_CODES["float16"] else np.float32
+        return np.frombuffer(value, dtype=storage, offset=offset).astype(np.float32).reshape(shape)
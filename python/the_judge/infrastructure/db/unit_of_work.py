@@ -1,5 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from typing import Callable, List
 from sqlalchemy.orm import Session
 from the_judge.infrastructure.db.repository import AbstractRepository, TrackingRepository
 from the_judge.infrastructure.db.engine import get_session_factory
@@ -9,6 +10,7 @@ class AbstractUnitOfWork(ABC):
     repository: AbstractRepository
 
     def __enter__(self) -> "AbstractUnitOfWork":
+        self._commit_hooks: List[Callable[[], None]] = []
         return self
 
     def __exit__(self, exc_type, *_):
@@ -16,6 +18,22 @@ class AbstractUnitOfWork(ABC):
             self.rollback()       
         self._session.close()     
 
+    def on_commit(self, hook: Callable[[], None]) -> None:
+        """Run ``hook`` once the transaction has committed; dropped on rollback."""
+        self._commit_hooks.append(hook)
+
+    def _run_commit_hooks(self) -> None:
+        # Every hook runs even if one fails: the data is committed either way.
+        hooks, self._commit_hooks = self._commit_hooks, []
+        errors = []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as error:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
     @abstractmethod
     def commit(self) -> None: ...
     @abstractmethod
@@ -37,6 +55,8 @@ class SqlAlchemyUnitOfWork(AbstractUnitOfWork):
 
     def commit(self) -> None:
         self._session.commit()
+        self._run_commit_hooks()
 
     def rollback(self) -> None:
+        self._commit_hooks.clear()
         self._session.rollback()
\ No newline at end of file
@@ -15,30 +15,38 @@ class BodyDetector(BodyDetectorPort):
         self.model = body_model
     
     def detect_bodies(self, image: np.ndarray, frame_id: str) -> List[Body]:
+        return self.detect_bodies_batch([image], [frame_id])[0]
+
+    def detect_bodies_batch(self, images: List[np.ndarray], frame_ids: List[str]) -> List[List[Body]]:
         if self.model is None:
             logger.warning("YOLO model not available, returning empty body list")
-            return []
+            return [[] for _ in images]
         
         try:
-            results = self.model(image, verbose=False)[0]
-            bodies = []
-            
-            for r in results.boxes.data:
-                x1, y1, x2, y2, conf, cls = r.tolist()
-                if int(cls) == 0:  # Person class
-                    rect = (int(x1), int(y1), int(x2), int(y2))
-                    
-                    body = Body(
-                        id=str(uuid.uuid4()),
-                        frame_id=frame_id,
-                        bbox=rect,
-                        captured_at=datetime.now()
-                    )
-                    bodies.append(body)
+            # A list input runs all images through the network as one batch.
+            results = self.model(list(images), verbose=False)
+            batches = [self._to_bodies(result, frame_id) for result, frame_id in zip(results, frame_ids)]
             
-            logger.info(f"Detected {len(bodies)} bodies in frame_id {frame_id}")
-            return bodies
+            logger.info(f"Detected {sum(map(len, batches))} bodies in {len(images)} frames")
+            return batches
             
         except Exception as e:
             logger.error(f"Error detecting bodies: {e}")
-            return []
+            return [[] for _ in images]
+
+    def _to_bodies(self, results, frame_id: str) -> List[Body]:
+        bodies = []
+        captured_at = datetime.now()
+        for r in results.boxes.data:
+            x1, y1, x2, y2, conf, cls = r.tolist()
+            if int(cls) == 0:  # Person class
+                rect = (int(x1), int(y1), int(x2), int(y2))
+                
+                body = Body(
+                    id=str(uuid.uuid4()),
+                    frame_id=frame_id,
+                    bbox=rect,
+                    captured_at=captured_at
+                )
+                bodies.append(body)
+        return bodies
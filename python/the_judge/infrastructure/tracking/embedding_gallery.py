@@ -0,0 +1,147 @@
+# the_judge/infrastructure/tracking/embedding_gallery.py
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from the_judge.common.logger import setup_logger
+from the_judge.domain.tracking.ports import EmbeddingIndexPort
+
+logger = setup_logger("EmbeddingGallery")
+
+
+class EmbeddingGallery(EmbeddingIndexPort):
+    """Process-resident gallery of normed face embeddings.
+
+    Vectors live in one contiguous matrix with parallel embedding-id and
+    visitor-id arrays, so all query faces of a frame are scored with a single
+    matrix multiply and resolve straight to a visitor. A float16 matrix halves
+    memory; it is scored in float32 chunks to bound temporary allocations.
+    """
+
+    SCORE_CHUNK_ROWS = 65536
+
+    def __init__(self, initial_capacity: int = 1024, dtype=np.float32) -> None:
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.empty((0, 0), dtype=self.dtype)
+        self._ids: List[str] = []
+        self._visitor_ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, embedding_id: str) -> bool:
+        return embedding_id in self._rows
+
+    @property
+    def dim(self) -> int:
+        return self._matrix.shape[1]
+
+    def snapshot(self) -> Tuple[List[str], List[str], np.ndarray]:
+        """Copy of the current embedding ids, visitor ids and vectors, row aligned."""
+        with self._lock:
+            size = len(self._ids)
+            return list(self._ids), list(self._visitor_ids), self._matrix[:size].astype(np.float32)
+
+    def load(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        """Bulk fill the gallery once; later calls are no-ops."""
+        with self._lock:
+            if self.loaded:
+                return
+            self.add(embedding_ids, visitor_ids, vectors)
+            self.loaded = True
+            logger.info("Gallery loaded with %d embeddings", len(self))
+
+    def add(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        vectors = [np.asarray(v, dtype=np.float32).ravel() for v in vectors]
+        if not vectors:
+            return
+
+        with self._lock:
+            new_ids, new_visitor_ids, new_vectors = [], [], []
+            for embedding_id, visitor_id, vector in zip(embedding_ids, visitor_ids, vectors):
+                if embedding_id in self._rows:
+                    continue
+                new_ids.append(embedding_id)
+                new_visitor_ids.append(visitor_id)
+                new_vectors.append(vector)
+            if not new_ids:
+                return
+
+            self._reserve(len(self._ids) + len(new_ids), new_vectors[0].shape[0])
+            start = len(self._ids)
+            self._matrix[start:start + len(new_ids)] = np.stack(new_vectors)
+            for offset, embedding_id in enumerate(new_ids):
+                self._rows[embedding_id] = start + offset
+            self._ids.extend(new_ids)
+            self._visitor_ids.extend(new_visitor_ids)
+
+    def remove(self, embedding_ids: Iterable[str]) -> None:
+        """Drop embeddings by swapping the last row into each freed slot."""
+        with self._lock:
+            for embedding_id in embedding_ids:
+                row = self._rows.pop(embedding_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = moved_id
+                    self._visitor_ids[row] = self._visitor_ids[last]
+                    self._rows[moved_id] = row
+                self._ids.pop()
+                self._visitor_ids.pop()
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, str, float]]]:
+        """Return the top-k (embedding_id, visitor_id, similarity) hits for each query row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            size = len(self._ids)
+            if size == 0 or queries.shape[0] == 0:
+                return [[] for _ in range(queries.shape[0])]
+
+            sims = self._scores(queries, size)
+            k = min(k, size)
+            if k == 1:
+                top = sims.argmax(axis=1)[:, None]
+            else:
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+                top = np.take_along_axis(top, order, axis=1)
+
+            return [
+                [(self._ids[col], self._visitor_ids[col], float(sims[row, col])) for col in top[row]]
+                for row in range(queries.shape[0])
+            ]
+
+    def _scores(self, queries: np.ndarray, size: int) -> np.ndarray:
+        if self.dtype == np.float32:
+            return queries @ self._matrix[:size].T
+        sims = np.empty((queries.shape[0], size), dtype=np.float32)
+        for start in range(0, size, self.SCORE_CHUNK_ROWS):
+            end = min(start + self.SCORE_CHUNK_ROWS, size)
+            sims[:, start:end] = queries @ self._matrix[start:end].astype(np.float32).T
+        return sims
+
+    def _reserve(self, size: int, dim: int) -> None:
+        capacity, current_dim = self._matrix.shape
+        if current_dim not in (0, dim):
+            raise ValueError(f"Embedding dim {dim} does not match gallery dim {current_dim}")
+        if size <= capacity:
+            return
+        new_capacity = max(self._initial_capacity, capacity * 2, size)
+        matrix = np.empty((new_capacity, dim), dtype=self.dtype)
+        if self._ids:
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = matrix
@@ -4,6 +4,8 @@ from typing import List, Callable, Tuple
 
 import cv2
 import numpy as np
+from insightface.app.common import Face as InsightFace
+from insightface.utils import face_align
 
 from the_judge.domain.tracking.ports import FaceDetectorPort
 from the_judge.domain.tracking.model import Face, FaceEmbedding, Composite
@@ -28,10 +30,47 @@ class FaceDetector(FaceDetectorPort):
         self.min_norm = min_norm
 
     def detect_faces(self, image: np.ndarray, frame_id: str) -> List[Composite]:
+        return self._to_composites(self.app.get(image), frame_id)
+
+    def detect_faces_batch(self, images: List[np.ndarray], frame_ids: List[str]) -> List[List[Composite]]:
+        """Detect per image, then embed the aligned crops of every image in one recognition batch."""
+        recognizer = getattr(self.app, "models", {}).get("recognition")
+        if recognizer is None or not hasattr(self.app, "det_model"):
+            return [self.detect_faces(image, frame_id) for image, frame_id in zip(images, frame_ids)]
+
+        per_image = [self._detect(image) for image in images]
+
+        crops = [
+            face_align.norm_crop(image, landmark=face.kps, image_size=recognizer.input_size[0])
+            for image, faces in zip(images, per_image) for face in faces
+        ]
+        if crops:
+            embeddings = recognizer.get_feat(crops)
+            for face, embedding in zip((f for faces in per_image for f in faces), embeddings):
+                face.embedding = embedding.flatten()
+
+        return [self._to_composites(faces, frame_id) for faces, frame_id in zip(per_image, frame_ids)]
+
+    def _detect(self, image: np.ndarray) -> list:
+        """FaceAnalysis.get without the recognition model, skipping faces that fail the cheap checks."""
+        bboxes, kpss = self.app.det_model.detect(image, max_num=0, metric="default")
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = InsightFace(bbox=bboxes[i, 0:4], kps=None if kpss is None else kpss[i], det_score=bboxes[i, 4])
+            w, h = face.bbox[2] - face.bbox[0], face.bbox[3] - face.bbox[1]
+            if face.det_score < self.det_thresh or w * h < self.min_area:
+                continue
+            for taskname, model in self.app.models.items():
+                if taskname not in ("detection", "recognition"):
+                    model.get(image, face)
+            faces.append(face)
+        return faces
+
+    def _to_composites(self, raw_faces, frame_id: str) -> List[Composite]:
         composites: List[Composite] = []
         current_time = now()
 
-        for raw in self.app.get(image):  
+        for raw in raw_faces:
             if not self._quality(raw):
                 continue
 
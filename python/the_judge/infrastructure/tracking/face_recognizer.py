@@ -1,13 +1,16 @@
 # the_judge/infrastructure/tracking/face_recognizer.py
 from __future__ import annotations
 
-from typing import Callable, List, Optional
+import threading
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
 
 from the_judge.common.logger import setup_logger
-from the_judge.domain.tracking.model import FaceEmbedding, Composite, Detection, Visitor
-from the_judge.domain.tracking.ports import FaceRecognizerPort
+from the_judge.domain.tracking.model import FaceEmbedding, Composite, Detection, Visitor, VisitorCollection
+from the_judge.domain.tracking.ports import FaceRecognizerPort, EmbeddingIndexPort
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+from the_judge.infrastructure.tracking.prototype_store import PrototypeStore
 from the_judge.infrastructure.db.unit_of_work import AbstractUnitOfWork
 
 logger = setup_logger("FaceRecognizer")
@@ -20,99 +23,150 @@ class FaceRecognizer(FaceRecognizerPort):
         face_model,
         uow_factory: Callable[[], AbstractUnitOfWork],
         threshold: float = 0.5,
+        gallery: Optional[EmbeddingIndexPort] = None,
+        prototypes: Optional[PrototypeStore] = None,
+        prototype_margin: float = 0.05,
+        visitor_source: Optional[Callable[[List[str]], Dict[str, Visitor]]] = None,
     ) -> None:
         self.face_model = face_model
         self.uow_factory = uow_factory
         self.threshold = threshold
+        self.gallery = gallery if gallery is not None else EmbeddingGallery()
+        # Prototypes answer confident matches; anything within the margin falls back to the full gallery.
+        self.prototypes = prototypes
+        self.prototype_margin = prototype_margin
+        # Resolves matched visitor ids in memory (the live registry) instead of querying the repository.
+        self.visitor_source = visitor_source
+        self._gallery_lock = threading.Lock()
 
     def recognize_faces(self, uow: AbstractUnitOfWork, faces: List[Composite]) -> List[Composite]:
-        """Recognize faces against known embeddings in database. Returns composite objects with matched visitors attached."""
+        """Recognize faces against known embeddings in the gallery. Returns composite objects with matched visitors attached."""
         if not faces:
             return []
 
-        results = []
-        
-        # Get all embeddings from repository
-        all_embeddings = uow.repository.list(FaceEmbedding)
+        self._ensure_gallery(uow)
+        matched_visitor_ids = self._find_best_matching_visitors(faces)
+        visitors = self._fetch_visitors(uow, matched_visitor_ids)
 
-        for face_composite in faces:
-            visitor = self._find_visitor(face_composite, all_embeddings, uow)
+        results = []
+        for face_composite, visitor_id in zip(faces, matched_visitor_ids):
             updated_composite = Composite(
                 face=face_composite.face,
                 embedding=face_composite.embedding,
                 body=face_composite.body,
-                visitor=visitor
+                visitor=visitors.get(visitor_id)
             )
             results.append(updated_composite)
 
         return results
 
-    def match_against_collection(self, composite: Composite, collection: List[Composite]) -> Optional[Visitor]:
-        for existing in collection:
-            if self._sim(composite.embedding.normed_embedding, existing.embedding.normed_embedding) > self.threshold:
-                return existing.visitor
-        return None
-    
-    def _find_visitor(
-        self, 
-        query_composite: Composite, 
-        gallery_embeddings: List[FaceEmbedding],
-        uow: AbstractUnitOfWork
-    ) -> Optional[Visitor]:
-        """
-        1. Search for matching embedding in repository
-        2. If found, search detection table with that embedding_id 
-        3. Get visitor_id from detection and return full Visitor object
-        """
-        if not self._valid_composite(query_composite):
-            return None
-
-        # Step 1: Find best matching embedding
-        best_embedding = self._find_best_matching_embedding(query_composite, gallery_embeddings)
-        
-        if not best_embedding:
+    def match_against_collection(self, composite: Composite, collection: VisitorCollection) -> Optional[Visitor]:
+        """Best visitor in the collection above threshold, scored with one matrix-vector product."""
+        query = composite.embedding.normed_embedding
+        matrix, visitors = collection.embeddings()
+        if query is None or not visitors:
             return None
 
-        # Step 2: Get detection by embedding_id
-        detection = uow.repository.get_by(Detection, embedding_id=best_embedding.id)
-        
-        if detection:
-            visitor_id = detection.visitor.id
-            if visitor_id:
-                # Step 3: Get full Visitor object
-                visitor = uow.repository.get(Visitor, visitor_id)
-                return visitor
-
-        # No detection found with this embedding or no visitor found
-        return None
-    
-    def _find_best_matching_embedding(
-        self, 
-        query_composite: Composite, 
-        gallery_embeddings: List[FaceEmbedding]
-    ) -> Optional[FaceEmbedding]:
-        """Find the best matching embedding in the gallery."""
-        best_embedding, best_sim = None, 0.0
-        query_normed = query_composite.embedding.normed_embedding
-
-        for gallery_embedding in gallery_embeddings:
-            if gallery_embedding.normed_embedding is None:
-                continue
-                
-            sim = self._sim(query_normed, gallery_embedding.normed_embedding)
-            if sim >= self.threshold and sim > best_sim:
-                best_embedding, best_sim = gallery_embedding, sim
-
-        return best_embedding
-
+        sims = matrix @ np.asarray(query, dtype=np.float32).ravel()
+        best = int(sims.argmax())
+        return visitors[best] if sims[best] > self.threshold else None
+
+    def add_to_gallery(self, composites: List[Composite]) -> None:
+        composites = [c for c in composites if c.visitor and c.embedding.normed_embedding is not None]
+        self.gallery.add(
+            [c.embedding.id for c in composites],
+            [c.visitor.id for c in composites],
+            [c.embedding.normed_embedding for c in composites]
+        )
+        if self.prototypes is not None:
+            for c in composites:
+                self.prototypes.update(c.visitor.id, c.embedding.normed_embedding, c.face.quality_score)
+
+    def remove_from_gallery(self, embedding_ids: List[str]) -> None:
+        self.gallery.remove(embedding_ids)
+
+    def forget_visitors(self, visitor_ids: List[str]) -> None:
+        if self.prototypes is not None:
+            self.prototypes.remove(visitor_ids)
+
+    def close(self) -> None:
+        self.gallery.close()
+
+    def _ensure_gallery(self, uow: AbstractUnitOfWork) -> None:
+        """Warm-start the gallery and reconcile it with the repository the first time it is needed."""
+        with self._gallery_lock:
+            if not self.gallery.loaded:
+                self._reconcile_gallery(uow)
+
+    def _reconcile_gallery(self, uow: AbstractUnitOfWork) -> None:
+        restored = self.gallery.restore()
+        # Only embeddings linked to a visitor through a detection can ever resolve to a match.
+        visitor_by_embedding = dict(uow.repository.list_values(Detection, "embedding_id", "visitor_id"))
+
+        stale = restored - visitor_by_embedding.keys()
+        if stale:
+            self.gallery.remove(list(stale))
+
+        embeddings = [
+            e for e in uow.repository.list_by_ids(FaceEmbedding, list(visitor_by_embedding.keys() - restored))
+            if e.normed_embedding is not None
+        ]
+        self.gallery.load(
+            [e.id for e in embeddings],
+            [visitor_by_embedding[e.id] for e in embeddings],
+            [e.normed_embedding for e in embeddings]
+        )
+        logger.info(
+            "Gallery reconciled: %d restored, %d stale removed, %d loaded from repository",
+            len(restored), len(stale), len(embeddings)
+        )
+
+        if self.prototypes is not None:
+            _, visitor_ids, vectors = self.gallery.snapshot()
+            self.prototypes.rebuild(visitor_ids, vectors)
+
+    def _find_best_matching_visitors(self, query_composites: List[Composite]) -> List[Optional[str]]:
+        """Search the gallery for all valid query faces at once. Returns the best visitor id per face."""
+        best: List[Optional[str]] = [None] * len(query_composites)
+        valid = [i for i, c in enumerate(query_composites) if self._valid_composite(c)]
+        if not valid:
+            return best
+
+        queries = np.stack([query_composites[i].embedding.normed_embedding for i in valid])
+        if self.prototypes is not None and len(self.prototypes):
+            valid, queries = self._match_prototypes(valid, queries, best)
+            if not valid:
+                return best
+
+        for i, hits in zip(valid, self.gallery.search(queries, k=1)):
+            if hits and hits[0][2] >= self.threshold:
+                best[i] = hits[0][1]
+
+        return best
+
+    def _match_prototypes(self, valid: List[int], queries: np.ndarray, best: List[Optional[str]]):
+        """Resolve clear-cut queries from prototypes. Returns the ambiguous ones for a full gallery search."""
+        ambiguous = []
+        for row, (i, (visitor_id, sim, runner_up)) in enumerate(zip(valid, self.prototypes.search(queries))):
+            clear_match = (sim >= self.threshold + self.prototype_margin
+                           and sim - runner_up >= self.prototype_margin)
+            clear_miss = sim < self.threshold - self.prototype_margin
+            if clear_match:
+                best[i] = visitor_id
+            elif not clear_miss:
+                ambiguous.append(row)
+        return [valid[row] for row in ambiguous], queries[ambiguous]
+
+    def _fetch_visitors(self, uow: AbstractUnitOfWork, visitor_ids: List[Optional[str]]) -> Dict[str, Visitor]:
+        """Load every matched visitor of the frame in a single query."""
+        wanted = {visitor_id for visitor_id in visitor_ids if visitor_id}
+        if not wanted:
+            return {}
+        if self.visitor_source is not None:
+            return self.visitor_source(list(wanted))
+        visitors = uow.repository.list_by_ids(Visitor, list(wanted), load={"current_session": "selectin"})
+        return {visitor.id: visitor for visitor in visitors}
 
     def _valid_composite(self, fc: Composite) -> bool:
         return (fc.embedding.normed_embedding is not None and 
                 (fc.face.quality_score or 0) > 0.5)
-
-    def _sim(self, a: np.ndarray, b: np.ndarray) -> float:
-        # Use InsightFace's optimised function if available
-        model = getattr(self.face_model, "model", None)
-        if model and hasattr(model, "compute_sim"):
-            return float(model.compute_sim(a, b))
-        return float(np.dot(a, b))
\ No newline at end of file
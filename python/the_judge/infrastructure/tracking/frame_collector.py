@@ -1,13 +1,14 @@
-import uuid, asyncio
+import os, uuid, asyncio
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
-from typing import Callable
+from typing import Callable, Optional
 
 from the_judge.domain.tracking.model import Frame
 from the_judge.domain.tracking.ports import FrameCollectorPort
 from the_judge.domain.tracking.events import FrameSaved
 from the_judge.application.messagebus import MessageBus
+from the_judge.application.services.ingest_queue import IngestQueue
 from the_judge.common.logger import setup_logger
 from the_judge.common.datetime_utils import now
 from the_judge.settings import get_settings
@@ -18,12 +19,24 @@ class FrameCollector(FrameCollectorPort):
     def __init__(
         self, 
         bus: MessageBus, 
-        max_workers: int = 2
+        max_workers: int = 2,
+        ingest_queue: Optional[IngestQueue] = None,
+        max_pending_writes: int = 8
     ):
         self._cameras: set[str] = set()
         self.cfg = get_settings()
         self.bus = bus
+        # When set, frames go through the bounded queue instead of straight onto the bus.
+        self.ingest_queue = ingest_queue
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending_writes: set[asyncio.Future] = set()
+        # Encoded frames held for a slow disk; past this, writes are skipped rather than queued.
+        self.max_pending_writes = max_pending_writes
+        self.dropped_writes = 0
+
+    @property
+    def camera_count(self) -> int:
+        return len(self._cameras)
 
     async def register_camera(self, command):
         self._cameras.add(command.camera_name)
@@ -41,14 +54,6 @@ class FrameCollector(FrameCollectorPort):
             logger.warning(f"No frame data received from {command.camera_name}")
             return
 
-        collection_dir = Path(self.cfg.get_stream_path(command.collection_id))
-        collection_dir.mkdir(parents=True, exist_ok=True)
-        filepath = collection_dir / f"{command.camera_name}.jpg"
-
-        await asyncio.get_event_loop().run_in_executor(
-            self.executor, filepath.write_bytes, command.frame_data
-        )
-
         frame_id = str(uuid.uuid4())
         frame = Frame(
             id=frame_id,
@@ -58,11 +63,46 @@ class FrameCollector(FrameCollectorPort):
         )
         
         event = FrameSaved(
-            frame=frame
+            frame=frame,
+            frame_data=command.frame_data
         )
 
-        self.bus.handle(event)
+        if self.ingest_queue is not None:
+            await self.ingest_queue.put(command.camera_name, event)
+        else:
+            self.bus.handle(event)
 
-        logger.info(
-            f"Saved frame from {command.camera_name} to {filepath.absolute()}"
-        )
+        if self.cfg.persist_frames and len(self._pending_writes) >= self.max_pending_writes:
+            self.dropped_writes += 1
+            logger.warning(
+                f"Skipped writing frame {frame_id} to disk: {len(self._pending_writes)} writes pending "
+                f"({self.dropped_writes} skipped so far)"
+            )
+        elif self.cfg.persist_frames:
+            # Side stage: processing already has the bytes, so the write is not awaited.
+            filepath = Path(self.cfg.get_stream_path(command.collection_id)) / f"{command.camera_name}.jpg"
+            write = asyncio.get_running_loop().run_in_executor(
+                self.executor, self._write_frame, filepath, command.frame_data
+            )
+            self._pending_writes.add(write)
+            write.add_done_callback(self._on_write_done)
+
+        logger.info(f"Received frame {frame_id} from {command.camera_name}")
+
+    async def flush(self) -> None:
+        """Wait for frames still being written to disk."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    @staticmethod
+    def _write_frame(filepath: Path, data: bytes) -> None:
+        # Write then rename so readers never see a half-written image from the same camera.
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = filepath.with_name(f".{filepath.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, filepath)
+
+    def _on_write_done(self, write: asyncio.Future) -> None:
+        self._pending_writes.discard(write)
+        if not write.cancelled() and write.exception():
+            logger.error(f"Failed to persist frame: {write.exception()}")
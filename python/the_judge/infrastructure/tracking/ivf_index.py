@@ -0,0 +1,254 @@
+# the_judge/infrastructure/tracking/ivf_index.py
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from the_judge.common.logger import setup_logger
+from the_judge.domain.tracking.ports import EmbeddingIndexPort
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+
+logger = setup_logger("IVFIndex")
+
+
+class IVFIndex(EmbeddingIndexPort):
+    """Inverted-file index over normed embeddings.
+
+    A spherical k-means coarse quantizer splits the gallery into ``nlist``
+    inverted lists; a query only scans the ``nprobe`` lists whose centroids
+    are closest. ``nprobe`` trades recall for latency and can be changed at
+    runtime. Until enough vectors exist to train, everything lives in one
+    list and search is exact.
+
+    Retraining as the gallery grows runs on a background thread over a
+    snapshot; queries keep using the current lists until the retrained ones
+    are swapped in, with adds and removes made meanwhile replayed onto them.
+    """
+
+    def __init__(
+        self,
+        nlist: int = 256,
+        nprobe: int = 8,
+        *,
+        min_points_per_list: int = 39,
+        max_points_per_list: int = 256,
+        kmeans_iters: int = 10,
+        retrain_growth: float = 2.0,
+        seed: int = 0,
+        dtype=np.float32,
+    ) -> None:
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_points_per_list = min_points_per_list
+        self.max_points_per_list = max_points_per_list
+        self.kmeans_iters = kmeans_iters
+        self.retrain_growth = retrain_growth
+        self.dtype = dtype
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[EmbeddingGallery] = [EmbeddingGallery(dtype=dtype)]
+        self._list_of: Dict[str, int] = {}
+        self._trained_size = 0
+        self._training: Optional[threading.Thread] = None
+        # Adds ("ids, owners, matrix") and removes ("ids, None, None") made while training.
+        self._journal: List[Tuple[List[str], Optional[List[str]], Optional[np.ndarray]]] = []
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    def __contains__(self, embedding_id: str) -> bool:
+        return embedding_id in self._list_of
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def load(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        with self._lock:
+            if self.loaded:
+                return
+            rows = [
+                (i, visitor_id, np.asarray(v, dtype=np.float32).ravel())
+                for i, visitor_id, v in zip(embedding_ids, visitor_ids, vectors)
+                if i not in self._list_of
+            ]
+            if rows:
+                ids = [i for i, _, _ in rows]
+                owners = [o for _, o, _ in rows]
+                matrix = np.stack([v for _, _, v in rows])
+                self._insert(ids, owners, matrix)
+                if self._training is not None:
+                    self._journal.append((ids, owners, matrix))
+            # Nothing is being served yet, so train inline unless a retrain
+            # is already under way; that one picks the rows up from the journal.
+            if self._training is None and self._should_train():
+                self._swap(*self._build(*self.snapshot()))
+            self.loaded = True
+            logger.info("IVF index loaded with %d embeddings in %d lists", len(self), len(self._lists))
+
+    def add(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        vectors = [np.asarray(v, dtype=np.float32).ravel() for v in vectors]
+        with self._lock:
+            rows = [
+                (i, visitor_id, v) for i, visitor_id, v in zip(embedding_ids, visitor_ids, vectors)
+                if i not in self._list_of
+            ]
+            if not rows:
+                return
+            ids = [i for i, _, _ in rows]
+            owners = [visitor_id for _, visitor_id, _ in rows]
+            matrix = np.stack([v for _, _, v in rows])
+            self._insert(ids, owners, matrix)
+
+            if self._training is not None:
+                self._journal.append((ids, owners, matrix))
+            elif self._should_train():
+                self._start_training()
+
+    def remove(self, embedding_ids: Iterable[str]) -> None:
+        with self._lock:
+            removed = self._remove(self._lists, self._list_of, embedding_ids)
+            if self._training is not None and removed:
+                self._journal.append((removed, None, None))
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """Block until a background retrain (if any) has been swapped in."""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+        return self._training is None
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, str, float]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            if not self.is_trained:
+                return self._lists[0].search(queries, k)
+
+            nprobe = max(1, min(self.nprobe, len(self._lists)))
+            coarse = queries @ self._centroids.T
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+            # Scan each probed list once for every query that selected it.
+            candidates: List[List[Tuple[str, str, float]]] = [[] for _ in range(queries.shape[0])]
+            for list_no in np.unique(probes):
+                query_rows = np.flatnonzero((probes == list_no).any(axis=1))
+                hits = self._lists[list_no].search(queries[query_rows], k)
+                for row, row_hits in zip(query_rows, hits):
+                    candidates[row].extend(row_hits)
+
+        return [sorted(c, key=lambda hit: hit[2], reverse=True)[:k] for c in candidates]
+
+    def snapshot(self) -> Tuple[List[str], List[str], np.ndarray]:
+        with self._lock:
+            parts = [inverted.snapshot() for inverted in self._lists if len(inverted)]
+            if not parts:
+                return [], [], np.empty((0, 0), dtype=np.float32)
+            ids = [i for part_ids, _, _ in parts for i in part_ids]
+            owners = [v for _, part_owners, _ in parts for v in part_owners]
+            return ids, owners, np.concatenate([matrix for _, _, matrix in parts])
+
+    def _insert(self, ids: List[str], owners: List[str], matrix: np.ndarray) -> None:
+        self._assign(self._centroids, self._lists, self._list_of, ids, owners, matrix)
+
+    @staticmethod
+    def _assign(
+        centroids: Optional[np.ndarray],
+        lists: List[EmbeddingGallery],
+        list_of: Dict[str, int],
+        ids: List[str],
+        owners: List[str],
+        matrix: np.ndarray,
+    ) -> None:
+        if centroids is None:
+            assignments = np.zeros(len(ids), dtype=np.int64)
+        else:
+            assignments = (matrix @ centroids.T).argmax(axis=1)
+        for list_no in np.unique(assignments):
+            rows = np.flatnonzero(assignments == list_no)
+            list_ids = [ids[r] for r in rows]
+            lists[list_no].add(list_ids, [owners[r] for r in rows], matrix[rows])
+            for embedding_id in list_ids:
+                list_of[embedding_id] = int(list_no)
+
+    @staticmethod
+    def _remove(lists: List[EmbeddingGallery], list_of: Dict[str, int], embedding_ids: Iterable[str]) -> List[str]:
+        by_list: Dict[int, List[str]] = {}
+        for embedding_id in embedding_ids:
+            list_no = list_of.pop(embedding_id, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(embedding_id)
+        for list_no, ids in by_list.items():
+            lists[list_no].remove(ids)
+        return [i for ids in by_list.values() for i in ids]
+
+    def _should_train(self) -> bool:
+        size = len(self)
+        if size < self.nlist * self.min_points_per_list:
+            return False
+        return not self.is_trained or size >= self._trained_size * self.retrain_growth
+
+    def _start_training(self) -> None:
+        snapshot = self.snapshot()
+        self._journal = []
+        self._training = threading.Thread(
+            target=self._train_in_background, args=snapshot, name="ivf-train", daemon=True
+        )
+        self._training.start()
+
+    def _train_in_background(self, ids: List[str], owners: List[str], matrix: np.ndarray) -> None:
+        try:
+            centroids, lists, list_of = self._build(ids, owners, matrix)
+            with self._lock:
+                for journal_ids, journal_owners, journal_matrix in self._journal:
+                    if journal_owners is None:
+                        self._remove(lists, list_of, journal_ids)
+                    else:
+                        self._assign(centroids, lists, list_of, journal_ids, journal_owners, journal_matrix)
+                self._swap(centroids, lists, list_of)
+        except Exception:
+            logger.exception("IVF retraining failed; keeping the current lists")
+        finally:
+            with self._lock:
+                self._journal = []
+                self._training = None
+
+    def _build(
+        self, ids: List[str], owners: List[str], matrix: np.ndarray
+    ) -> Tuple[np.ndarray, List[EmbeddingGallery], Dict[str, int]]:
+        sample_size = min(len(ids), self.nlist * self.max_points_per_list)
+        sample = matrix[self._rng.choice(len(ids), sample_size, replace=False)]
+        centroids = self._spherical_kmeans(sample)
+
+        lists = [EmbeddingGallery(initial_capacity=64, dtype=self.dtype) for _ in range(self.nlist)]
+        list_of: Dict[str, int] = {}
+        self._assign(centroids, lists, list_of, ids, owners, matrix)
+        return centroids, lists, list_of
+
+    def _swap(self, centroids: np.ndarray, lists: List[EmbeddingGallery], list_of: Dict[str, int]) -> None:
+        self._centroids, self._lists, self._list_of = centroids, lists, list_of
+        self._trained_size = len(list_of)
+        logger.info("Trained IVF quantizer: %d lists over %d embeddings", self.nlist, len(list_of))
+
+    def _spherical_kmeans(self, sample: np.ndarray) -> np.ndarray:
+        centroids = sample[self._rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assignments = (sample @ centroids.T).argmax(axis=1)
+            onehot = np.zeros((len(sample), self.nlist), dtype=np.float32)
+            onehot[np.arange(len(sample)), assignments] = 1.0
+            sums = onehot.T @ sample
+            counts = np.bincount(assignments, minlength=self.nlist)
+
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[self._rng.choice(len(sample), len(empty), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
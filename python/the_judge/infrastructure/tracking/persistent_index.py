@@ -0,0 +1,324 @@
+# the_judge/infrastructure/tracking/persistent_index.py
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from the_judge.common.logger import setup_logger
+from the_judge.domain.tracking.ports import EmbeddingIndexPort
+
+logger = setup_logger("PersistentIndex")
+
+
+class EmbeddingIndexFile:
+    """Append-only, memory-mapped embedding file.
+
+    Layout: a fixed header, a contiguous ``capacity x dim`` matrix, then a
+    record table holding each row's embedding id, visitor id and alive flag. Rows are
+    appended in place; deletes only clear the alive flag until the file is
+    compacted. The header row count is only advanced on ``checkpoint`` so a
+    crash loses at most the rows written since, which boot reconciliation
+    then restores from the database.
+    """
+
+    MAGIC = b"JDGIDX01"
+    VERSION = 2
+    HEADER = struct.Struct("<8sIIIQQ")
+    HEADER_SIZE = 64
+    DTYPES = {0: np.float32, 1: np.float16}
+    RECORD = np.dtype([("id", "S36"), ("visitor_id", "S36"), ("alive", "u1")])
+
+    def __init__(self, path: Path, dim: int, dtype=np.float32, initial_capacity: int = 4096) -> None:
+        self.path = Path(path)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.initial_capacity = initial_capacity
+        self.count = 0
+        self.capacity = 0
+        self._rows: Dict[str, int] = {}
+        self._matrix = None
+        self._records = None
+
+    def __contains__(self, embedding_id: str) -> bool:
+        return embedding_id in self._rows
+
+    @property
+    def tombstones(self) -> int:
+        return self.count - len(self._rows)
+
+    def open(self) -> Tuple[List[str], List[str], np.ndarray]:
+        """Map the file (creating it if missing or incompatible) and return its live rows."""
+        if not self._read_header():
+            self._create(self.initial_capacity)
+        self._map()
+
+        alive = np.flatnonzero(self._records["alive"][:self.count])
+        records = self._records[alive]
+        ids = [raw.decode("ascii") for raw in records["id"]]
+        visitor_ids = [raw.decode("ascii") for raw in records["visitor_id"]]
+        self._rows = dict(zip(ids, alive.tolist()))
+        return ids, visitor_ids, np.asarray(self._matrix[alive], dtype=np.float32)
+
+    def append(self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], matrix: np.ndarray) -> None:
+        if self.count + len(embedding_ids) > self.capacity:
+            self.compact(max(self.capacity * 2, len(self._rows) + len(embedding_ids)))
+
+        start = self.count
+        end = start + len(embedding_ids)
+        self._matrix[start:end] = matrix
+        self._records["id"][start:end] = [i.encode("ascii") for i in embedding_ids]
+        self._records["visitor_id"][start:end] = [v.encode("ascii") for v in visitor_ids]
+        self._records["alive"][start:end] = 1
+        for offset, embedding_id in enumerate(embedding_ids):
+            self._rows[embedding_id] = start + offset
+        self.count = end
+
+    def delete(self, embedding_ids: Iterable[str]) -> None:
+        for embedding_id in embedding_ids:
+            row = self._rows.pop(embedding_id, None)
+            if row is not None:
+                self._records["alive"][row] = 0
+
+    def checkpoint(self) -> None:
+        self._matrix.flush()
+        self._records.flush()
+        self._write_header(self.path, self.capacity, self.count)
+
+    def compact(self, capacity: int = 0) -> None:
+        """Rewrite the file with only live rows, optionally growing it."""
+        rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+        capacity = max(capacity, self.initial_capacity, len(rows))
+        matrix = np.array(self._matrix[rows]) if len(rows) else None
+        records = np.array(self._records[rows]) if len(rows) else None
+        self._unmap()
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        self._allocate(tmp_path, capacity)
+        if len(rows):
+            # Drop the temporary mappings before the rename; Windows refuses to replace mapped files.
+            tmp_matrix = self._view(tmp_path, capacity, "matrix")
+            tmp_matrix[:len(rows)] = matrix
+            tmp_matrix.flush()
+            tmp_records = self._view(tmp_path, capacity, "records")
+            tmp_records[:len(rows)] = records
+            tmp_records.flush()
+            del tmp_matrix, tmp_records
+        self._write_header(tmp_path, capacity, len(rows))
+        os.replace(tmp_path, self.path)
+
+        self.capacity, self.count = capacity, len(rows)
+        self._rows = {
+            raw.decode("ascii"): row
+            for row, raw in enumerate(records["id"] if len(rows) else [])
+        }
+        self._map()
+
+    def close(self) -> None:
+        if self._matrix is not None:
+            self.checkpoint()
+            self._unmap()
+
+    @classmethod
+    def read_header(cls, path: Path) -> Optional[Tuple[int, int, int, int]]:
+        """``(dtype_code, dim, capacity, count)`` of a well-formed index file, else None."""
+        path = Path(path)
+        if not path.exists() or path.stat().st_size < cls.HEADER_SIZE:
+            return None
+        with open(path, "rb") as fh:
+            magic, version, dtype_code, dim, capacity, count = cls.HEADER.unpack(fh.read(cls.HEADER.size))
+        if magic != cls.MAGIC or version != cls.VERSION or dtype_code not in cls.DTYPES or not dim or count > capacity:
+            return None
+        matrix_bytes = capacity * dim * np.dtype(cls.DTYPES[dtype_code]).itemsize
+        expected_size = cls.HEADER_SIZE + (matrix_bytes + 7) // 8 * 8 + capacity * cls.RECORD.itemsize
+        if path.stat().st_size < expected_size:
+            return None
+        return dtype_code, dim, capacity, count
+
+    def _read_header(self) -> bool:
+        header = self.read_header(self.path)
+        if header is None or header[1] != self.dim or self.DTYPES[header[0]] != self.dtype.type:
+            if self.path.exists():
+                logger.warning("Index file %s is incompatible, rebuilding", self.path)
+            return False
+        self.capacity, self.count = header[2], header[3]
+        return True
+
+    def _create(self, capacity: int) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._allocate(self.path, capacity)
+        self._write_header(self.path, capacity, 0)
+        self.capacity, self.count = capacity, 0
+
+    def _allocate(self, path: Path, capacity: int) -> None:
+        with open(path, "wb") as fh:
+            fh.truncate(self._records_offset(capacity) + capacity * self.RECORD.itemsize)
+
+    def _write_header(self, path: Path, capacity: int, count: int) -> None:
+        dtype_code = next(code for code, t in self.DTYPES.items() if t == self.dtype.type)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, dtype_code, self.dim, capacity, count)
+        with open(path, "r+b") as fh:
+            fh.write(header.ljust(self.HEADER_SIZE, b"\0"))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def _records_offset(self, capacity: int) -> int:
+        matrix_bytes = capacity * self.dim * self.dtype.itemsize
+        return self.HEADER_SIZE + (matrix_bytes + 7) // 8 * 8
+
+    def _view(self, path: Path, capacity: int, region: str) -> np.memmap:
+        if region == "matrix":
+            return np.memmap(path, dtype=self.dtype, mode="r+", offset=self.HEADER_SIZE, shape=(capacity, self.dim))
+        return np.memmap(path, dtype=self.RECORD, mode="r+", offset=self._records_offset(capacity), shape=(capacity,))
+
+    def _map(self) -> None:
+        self._matrix = self._view(self.path, self.capacity, "matrix")
+        self._records = self._view(self.path, self.capacity, "records")
+
+    def _unmap(self) -> None:
+        self._matrix = None
+        self._records = None
+
+
+class PersistentIndex(EmbeddingIndexPort):
+    """Keeps an in-memory index mirrored to an ``EmbeddingIndexFile``.
+
+    ``restore`` warm-starts the inner index from the memory-mapped file so a
+    restart does not decode every ``face_embeddings`` row; the caller then
+    reconciles the restored ids against the database.
+    """
+
+    def __init__(
+        self,
+        inner: EmbeddingIndexPort,
+        path: Path,
+        *,
+        dim: Optional[int] = None,
+        dtype=np.float32,
+        checkpoint_every: int = 256,
+        checkpoint_seconds: float = 30.0,
+        compact_ratio: float = 0.5,
+    ) -> None:
+        self.inner = inner
+        self.path = Path(path)
+        # Expected embedding size; a file of any other size is rebuilt rather than restored.
+        self.dim = dim
+        self.dtype = dtype
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._file: EmbeddingIndexFile = None
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    @property
+    def loaded(self) -> bool:
+        return self.inner.loaded
+
+    def __len__(self) -> int:
+        return len(self.inner)
+
+    def restore(self) -> Set[str]:
+        """Load the file contents into the inner index. Returns the restored ids."""
+        with self._lock:
+            if self._file is not None:
+                return set()
+            dim = self._stored_dim()
+            if not dim:
+                return set()
+            return self._open_file(dim)
+
+    def load(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        vectors = [np.asarray(v, dtype=np.float32).ravel() for v in vectors]
+        with self._lock:
+            self._write(embedding_ids, visitor_ids, vectors)
+            self.inner.load(embedding_ids, visitor_ids, vectors)
+            self.checkpoint()
+
+    def add(
+        self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        vectors = [np.asarray(v, dtype=np.float32).ravel() for v in vectors]
+        with self._lock:
+            self._write(embedding_ids, visitor_ids, vectors)
+            self.inner.add(embedding_ids, visitor_ids, vectors)
+            self._maybe_checkpoint()
+
+    def remove(self, embedding_ids: Iterable[str]) -> None:
+        embedding_ids = list(embedding_ids)
+        with self._lock:
+            if self._file is not None:
+                self._file.delete(embedding_ids)
+                self._pending += len(embedding_ids)
+            self.inner.remove(embedding_ids)
+            self._maybe_checkpoint()
+
+    def search(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, str, float]]]:
+        return self.inner.search(queries, k)
+
+    def snapshot(self) -> Tuple[List[str], List[str], np.ndarray]:
+        return self.inner.snapshot()
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            if self._file.tombstones > self.compact_ratio * max(self._file.count, 1):
+                self._file.compact(self._file.capacity)
+            self._file.checkpoint()
+            self._pending = 0
+            self._last_checkpoint = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self.checkpoint()
+                self._file.close()
+                self._file = None
+
+    def _write(self, embedding_ids: Sequence[str], visitor_ids: Sequence[str], vectors: List[np.ndarray]) -> None:
+        if not vectors:
+            return
+        if self._file is None:
+            self._open_file(vectors[0].shape[0])
+        new = [
+            (i, visitor_id, v) for i, visitor_id, v in zip(embedding_ids, visitor_ids, vectors)
+            if i not in self._file
+        ]
+        if not new:
+            return
+        self._file.append(
+            [i for i, _, _ in new], [visitor_id for _, visitor_id, _ in new], np.stack([v for _, _, v in new])
+        )
+        self._pending += len(new)
+
+    def _open_file(self, dim: int) -> Set[str]:
+        start = time.perf_counter()
+        self._file = EmbeddingIndexFile(self.path, dim, self.dtype)
+        ids, visitor_ids, matrix = self._file.open()
+        if ids:
+            self.inner.add(ids, visitor_ids, matrix)
+        logger.info(
+            "Restored %d embeddings from %s in %.3fs", len(ids), self.path, time.perf_counter() - start
+        )
+        return set(ids)
+
+    def _stored_dim(self) -> int:
+        # An unreadable header or a dim other than the configured one is rebuilt when the file is opened.
+        header = EmbeddingIndexFile.read_header(self.path)
+        if header is None or self.dim:
+            return self.dim or 0
+        return header[1]
+
+    def _maybe_checkpoint(self) -> None:
+        if (self._pending >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds):
+            self.checkpoint()
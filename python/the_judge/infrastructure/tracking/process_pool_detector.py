@@ -0,0 +1,107 @@
+# the_judge/infrastructure/tracking/process_pool_detector.py
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from the_judge.common.logger import setup_logger
+from the_judge.domain.tracking.model import Body, Composite, Face, FaceEmbedding
+from the_judge.domain.tracking.ports import ObjectDetectorPort
+
+logger = setup_logger("ProcessPoolDetector")
+
+# (shape, byte offset) of each frame inside the shared block
+FrameLayout = List[Tuple[Tuple[int, ...], int]]
+# Per frame: face records as (face fields, embedding fields), body records as body fields
+DetectionRecords = Tuple[List[Tuple[Dict, Dict]], List[Dict]]
+
+_face_detector = None
+_body_detector = None
+
+
+def _init_worker(device: str) -> None:
+    """Load this worker's own model instances."""
+    global _face_detector, _body_detector
+    from the_judge.infrastructure.tracking.providers import InsightFaceProvider, YOLOProvider
+    from the_judge.infrastructure.tracking.face_detector import FaceDetector
+    from the_judge.infrastructure.tracking.body_detector import BodyDetector
+
+    _face_detector = FaceDetector(InsightFaceProvider(device).get_face_model())
+    _body_detector = BodyDetector(YOLOProvider(device).get_body_model())
+
+
+def _detect_shared(block_name: str, layout: FrameLayout, frame_ids: List[str]) -> List[DetectionRecords]:
+    """Run both detectors on frames read in place from shared memory."""
+    block = SharedMemory(name=block_name)
+    images = []
+    try:
+        images = [
+            np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+            for shape, offset in layout
+        ]
+        faces = _face_detector.detect_faces_batch(images, frame_ids)
+        bodies = _body_detector.detect_bodies_batch(images, frame_ids)
+    finally:
+        # Views must be gone before the mapping can be closed.
+        images.clear()
+        block.close()
+
+    # Plain field dicts: domain classes may be ORM-instrumented in the parent, never pickle instances.
+    return [
+        ([(asdict(c.face), asdict(c.embedding)) for c in frame_faces], [asdict(b) for b in frame_bodies])
+        for frame_faces, frame_bodies in zip(faces, bodies)
+    ]
+
+
+class ProcessPoolDetector(ObjectDetectorPort):
+    """Runs face and body detection in worker processes that each own their models.
+
+    Frames are copied once into a shared-memory block and read in place by the
+    worker; only detection records travel back through the pipe.
+    """
+
+    def __init__(self, processes: int = 2, device: str = "cpu", start_method: str = "spawn"):
+        self.workers = processes
+        self.pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(device,),
+        )
+        logger.info("Started %d inference processes on %s", processes, device)
+
+    def detect_batch(
+        self, images: List[np.ndarray], frame_ids: List[str]
+    ) -> Tuple[List[List[Composite]], List[List[Body]]]:
+        if not images:
+            return [], []
+
+        layout: FrameLayout = []
+        size = 0
+        for image in images:
+            layout.append((image.shape, size))
+            size += (image.nbytes + 63) // 64 * 64
+
+        block = SharedMemory(create=True, size=size)
+        try:
+            for image, (shape, offset) in zip(images, layout):
+                np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=offset)[...] = image
+            records = self.pool.submit(_detect_shared, block.name, layout, list(frame_ids)).result()
+        finally:
+            block.close()
+            block.unlink()
+
+        faces = [
+            [Composite(face=Face(**face), embedding=FaceEmbedding(**embedding)) for face, embedding in frame_faces]
+            for frame_faces, _ in records
+        ]
+        bodies = [[Body(**body) for body in frame_bodies] for _, frame_bodies in records]
+        return faces, bodies
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,147 @@
+# the_judge/infrastructure/tracking/prototype_store.py
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from the_judge.common.logger import setup_logger
+from the_judge.infrastructure.tracking.embedding_gallery import EmbeddingGallery
+
+logger = setup_logger("PrototypeStore")
+
+
+@dataclass
+class VisitorPrototype:
+    visitor_id: str
+    total: np.ndarray
+    count: int = 0
+    exemplars: List[Tuple[float, np.ndarray]] = field(default_factory=list)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.total / max(float(np.linalg.norm(self.total)), 1e-12)
+
+    def vectors(self) -> List[np.ndarray]:
+        return [self.mean] + [vector for _, vector in self.exemplars]
+
+
+class PrototypeStore:
+    """Compact per-visitor summary of the gallery.
+
+    Each visitor is represented by the normalised running mean of its
+    embeddings plus up to ``max_exemplars`` diverse, high-quality exemplars,
+    so a visitor seen in hundreds of frames costs a handful of rows per search.
+    """
+
+    def __init__(self, max_exemplars: int = 4, diversity_sim: float = 0.9) -> None:
+        self.max_exemplars = max_exemplars
+        self.diversity_sim = diversity_sim
+        self._lock = threading.RLock()
+        self._prototypes: Dict[str, VisitorPrototype] = {}
+        self._rows = EmbeddingGallery(initial_capacity=256)
+
+    def __len__(self) -> int:
+        return len(self._prototypes)
+
+    def rebuild(self, visitor_ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Seed prototypes from existing gallery rows whose quality is unknown."""
+        if not len(visitor_ids):
+            return
+        # Sort rows by owner once so every visitor's embeddings are a contiguous slice.
+        owners, inverse, counts = np.unique(np.asarray(visitor_ids), return_inverse=True, return_counts=True)
+        grouped = np.asarray(vectors)[np.argsort(inverse.ravel(), kind="stable")]
+        row_ids: List[str] = []
+        row_owners: List[str] = []
+        rows: List[np.ndarray] = []
+        with self._lock:
+            for visitor_id, members in zip(owners, np.split(grouped, np.cumsum(counts)[:-1])):
+                prototype = VisitorPrototype(str(visitor_id), members.sum(axis=0), len(members))
+                prototype.exemplars = [(0.0, v) for v in self._diverse_subset(members, prototype.mean)]
+                self._prototypes[prototype.visitor_id] = prototype
+                prototype_rows = prototype.vectors()
+                row_ids.extend(self._row_ids(prototype.visitor_id, self.max_exemplars)[:len(prototype_rows)])
+                row_owners.extend([prototype.visitor_id] * len(prototype_rows))
+                rows.extend(prototype_rows)
+            self._rows.remove([i for v in owners for i in self._row_ids(str(v), self.max_exemplars)])
+            self._rows.add(row_ids, row_owners, rows)
+        logger.info("Rebuilt %d prototypes from %d embeddings", len(owners), len(visitor_ids))
+
+    def update(self, visitor_id: str, vector: np.ndarray, quality: Optional[float]) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        quality = quality or 0.0
+        with self._lock:
+            prototype = self._prototypes.get(visitor_id)
+            if prototype is None:
+                prototype = VisitorPrototype(visitor_id, np.zeros_like(vector))
+                self._prototypes[visitor_id] = prototype
+
+            prototype.total = prototype.total + vector
+            prototype.count += 1
+            self._offer_exemplar(prototype, vector, quality)
+            self._write_rows(prototype)
+
+    def remove(self, visitor_ids: Iterable[str]) -> None:
+        with self._lock:
+            for visitor_id in visitor_ids:
+                if self._prototypes.pop(visitor_id, None):
+                    self._rows.remove(self._row_ids(visitor_id, self.max_exemplars))
+
+    def search(self, queries: np.ndarray) -> List[Tuple[Optional[str], float, float]]:
+        """Best visitor, its similarity and the runner-up visitor's similarity for each query."""
+        k = 2 * (self.max_exemplars + 1)
+        results = []
+        for hits in self._rows.search(queries, k=k):
+            best: Dict[str, float] = {}
+            for _, visitor_id, sim in hits:
+                best[visitor_id] = max(sim, best.get(visitor_id, -1.0))
+            ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+            if not ranked:
+                results.append((None, -1.0, -1.0))
+                continue
+            runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+            results.append((ranked[0][0], ranked[0][1], runner_up))
+        return results
+
+    def _offer_exemplar(self, prototype: VisitorPrototype, vector: np.ndarray, quality: float) -> None:
+        exemplars = prototype.exemplars
+        if not exemplars:
+            exemplars.append((quality, vector))
+            return
+
+        sims = np.array([float(vector @ e) for _, e in exemplars])
+        nearest = int(sims.argmax())
+        if sims[nearest] >= self.diversity_sim:
+            # Near-duplicate of an existing exemplar: keep whichever is sharper.
+            if quality > exemplars[nearest][0]:
+                exemplars[nearest] = (quality, vector)
+        elif len(exemplars) < self.max_exemplars:
+            exemplars.append((quality, vector))
+        else:
+            weakest = min(range(len(exemplars)), key=lambda i: exemplars[i][0])
+            if quality > exemplars[weakest][0]:
+                exemplars[weakest] = (quality, vector)
+
+    def _diverse_subset(self, members: np.ndarray, mean: np.ndarray) -> List[np.ndarray]:
+        """Greedy farthest-point selection, starting from the member furthest from the mean."""
+        chosen = [int((members @ mean).argmin())]
+        closest = members @ members[chosen[0]]
+        while len(chosen) < min(self.max_exemplars, len(members)):
+            candidate = int(closest.argmin())
+            if closest[candidate] >= self.diversity_sim:
+                break
+            chosen.append(candidate)
+            closest = np.maximum(closest, members @ members[candidate])
+        return [members[i] for i in chosen]
+
+    def _write_rows(self, prototype: VisitorPrototype) -> None:
+        row_ids = self._row_ids(prototype.visitor_id, self.max_exemplars)
+        self._rows.remove(row_ids)
+        vectors = prototype.vectors()
+        self._rows.add(row_ids[:len(vectors)], [prototype.visitor_id] * len(vectors), vectors)
+
+    @staticmethod
+    def _row_ids(visitor_id: str, exemplar_count: int) -> List[str]:
+        return [f"{visitor_id}/mean"] + [f"{visitor_id}/{i}" for i in range(exemplar_count)]
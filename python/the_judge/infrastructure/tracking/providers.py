@@ -26,17 +26,18 @@ def suppress_stdout_stderr():
 
 
 class InsightFaceProvider(FaceMLProvider):
-    def __init__(self):
+    def __init__(self, device: str = "cuda"):
         cfg = get_settings()
         model_path = Path(cfg.model_path).resolve() / "insightface"
         model_path.mkdir(parents=True, exist_ok=True)
 
+        on_gpu = device.startswith("cuda")
         with suppress_stdout_stderr():
             self.app = FaceAnalysis(
-                providers=["CUDAExecutionProvider"],
+                providers=["CUDAExecutionProvider"] if on_gpu else ["CPUExecutionProvider"],
                 root=str(model_path),
             )
-            self.app.prepare(ctx_id=0, det_size=(640, 640))
+            self.app.prepare(ctx_id=0 if on_gpu else -1, det_size=(640, 640))
         logger.info("InsightFace initialized from %s", model_path)
     
     def get_face_model(self):
@@ -44,7 +45,7 @@ class InsightFaceProvider(FaceMLProvider):
 
 
 class YOLOProvider(BodyMLProvider):
-    def __init__(self):
+    def __init__(self, device: str = "cuda"):
         cfg = get_settings()
         model_dir = Path(cfg.model_path).resolve() / "yolo"
         model_dir.mkdir(parents=True, exist_ok=True)
@@ -58,7 +59,7 @@ class YOLOProvider(BodyMLProvider):
             self.model.save(str(model_path))
             logger.info("YOLO model downloaded and saved to %s", model_path)
             
-        self.model.to("cuda")
+        self.model.to(device)
         self.model.conf, self.model.iou, self.model.classes = 0.3, 0.5, [0]
     
     def get_body_model(self):
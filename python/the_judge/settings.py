@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from pydantic import Field, BaseModel
 
 class Settings(BaseModel):    
@@ -13,15 +13,92 @@ class Settings(BaseModel):
     # Camera settings
     capture_interval: float = Field(default=10.0, env="CAPTURE_INTERVAL")
     
+    # Recent collections kept open for late frames from slow cameras
+    collection_window_size: int = Field(default=4, env="COLLECTION_WINDOW_SIZE")
+    collection_window_seconds: float = Field(default=300.0, env="COLLECTION_WINDOW_SECONDS")
+    
+    # Bounded per-camera ingest queue: "block" | "drop_oldest" | "keep_latest"
+    ingest_policy: str = Field(default="drop_oldest", env="INGEST_POLICY")
+    ingest_queue_capacity: int = Field(default=4, env="INGEST_QUEUE_CAPACITY")
+    
+    # Cross-camera batching: wait up to this long for a collection's frames; empty disables
+    collection_batch_wait: Optional[float] = Field(default=0.25, env="COLLECTION_BATCH_WAIT")
+    collection_batch_max: int = Field(default=16, env="COLLECTION_BATCH_MAX")
+    
+    # Processing stages (decode -> detect -> match -> track) with bounded queues between them;
+    # frames are tracked one at a time, in the order they were received
+    pipeline_decode_workers: int = Field(default=2, env="PIPELINE_DECODE_WORKERS")
+    pipeline_detect_workers: int = Field(default=1, env="PIPELINE_DETECT_WORKERS")
+    pipeline_queue_size: int = Field(default=8, env="PIPELINE_QUEUE_SIZE")
+    # Run the face and body models in parallel on each frame
+    concurrent_detection: bool = Field(default=True, env="CONCURRENT_DETECTION")
+    
+    # Inference execution: "thread" (models in this process) or "process" (worker pool, shared-memory frames)
+    inference_mode: str = Field(default="thread", env="INFERENCE_MODE")
+    inference_processes: int = Field(default=2, env="INFERENCE_PROCESSES")
+    inference_device: str = Field(default="cuda", env="INFERENCE_DEVICE")
+    
     # Detection settings
     face_detection_threshold: float = Field(default=0.5, env="FACE_DETECTION_THRESHOLD")
     face_recognition_threshold: float = Field(default=0.5, env="FACE_RECOGNITION_THRESHOLD")
+    # Recognition index: "flat" (exact) or "ivf" (approximate)
+    face_index_backend: str = Field(default="flat", env="FACE_INDEX_BACKEND")
+    ivf_nlist: int = Field(default=256, env="IVF_NLIST")
+    ivf_nprobe: int = Field(default=8, env="IVF_NPROBE")
+    # Memory-mapped index file for fast warm starts; empty disables persistence.
+    # face_index_dtype ("float32" | "float16") applies to both the file and the in-memory gallery.
+    face_index_path: Optional[Path] = Field(default=Path("storage/index/embeddings.idx"), env="FACE_INDEX_PATH")
+    face_index_dtype: str = Field(default="float32", env="FACE_INDEX_DTYPE")
+    # Recognition model embedding size; an index file of another size is rebuilt
+    face_embedding_dim: int = Field(default=512, env="FACE_EMBEDDING_DIM")
+    face_index_checkpoint_every: int = Field(default=256, env="FACE_INDEX_CHECKPOINT_EVERY")
+    face_index_checkpoint_seconds: float = Field(default=30.0, env="FACE_INDEX_CHECKPOINT_SECONDS")
+    # Per-visitor prototypes searched before the full gallery
+    prototype_matching: bool = Field(default=True, env="PROTOTYPE_MATCHING")
+    prototype_exemplars: int = Field(default=4, env="PROTOTYPE_EXEMPLARS")
+    prototype_margin: float = Field(default=0.05, env="PROTOTYPE_MARGIN")
+    # Embedding column storage: dtype "float32" | "float16" | "int8", vectors "both" | "normed" | "raw"
+    embedding_dtype: str = Field(default="float16", env="EMBEDDING_DTYPE")
+    embedding_storage: str = Field(default="normed", env="EMBEDDING_STORAGE")
     model_path: Path = Field(default_factory=lambda: Path(__file__).parent / "infrastructure" / "models", env="MODEL_PATH")
     
     # Storage paths
     storage_dir: Path = Field(default=Path("storage"), env="STORAGE_DIR")
     stream_dir: Path = Field(default=Path("storage/stream"), env="STREAM_DIR")
+    # Also write received frames to stream_dir; processing never reads them back
+    persist_frames: bool = Field(default=True, env="PERSIST_FRAMES")
+    # Frames waiting on a slow disk; further writes are skipped until they drain
+    persist_frames_max_pending: int = Field(default=8, env="PERSIST_FRAMES_MAX_PENDING")
     database_url: str = Field(default="sqlite:///storage/db/tracking.db", env="DATABASE_URL")
+    # SQLite tuning: "production" (WAL, synchronous=NORMAL, cache, mmap, busy timeout) or "default" (driver defaults)
+    sqlite_profile: str = Field(default="production", env="SQLITE_PROFILE")
+    sqlite_cache_size_mb: int = Field(default=64, env="SQLITE_CACHE_SIZE_MB")
+    sqlite_mmap_size_mb: int = Field(default=256, env="SQLITE_MMAP_SIZE_MB")
+    sqlite_busy_timeout: float = Field(default=5.0, env="SQLITE_BUSY_TIMEOUT")
+    # Pipeline track workers + history writer + timeout worker, with headroom
+    db_pool_size: int = Field(default=8, env="DB_POOL_SIZE")
+    # Write frames, faces, bodies, embeddings and detections in background batches
+    history_write_behind: bool = Field(default=True, env="HISTORY_WRITE_BEHIND")
+    history_batch_rows: int = Field(default=500, env="HISTORY_BATCH_ROWS")
+    history_batch_seconds: float = Field(default=1.0, env="HISTORY_BATCH_SECONDS")
+    # How often rows of expired visitors are deleted, in bulk, off the timeout sweep
+    expiry_purge_seconds: float = Field(default=10.0, env="EXPIRY_PURGE_SECONDS")
+    # History retention: age/count limits per visitor (the best embeddings are always kept),
+    # session summaries and SQLite maintenance, run every retention_interval_seconds.
+    # It deletes history, so it only runs with RETENTION_ENABLED=true; the limits below then apply
+    # (None turns a limit off)
+    retention_enabled: bool = Field(default=False, env="RETENTION_ENABLED")
+    retention_interval_seconds: float = Field(default=3600.0, env="RETENTION_INTERVAL_SECONDS")
+    retention_max_age_days: Optional[float] = Field(default=30.0, env="RETENTION_MAX_AGE_DAYS")
+    retention_max_detections_per_visitor: Optional[int] = Field(default=500, env="RETENTION_MAX_DETECTIONS_PER_VISITOR")
+    retention_keep_best_embeddings: int = Field(default=10, env="RETENTION_KEEP_BEST_EMBEDDINGS")
+    retention_session_summary_days: Optional[float] = Field(default=7.0, env="RETENTION_SESSION_SUMMARY_DAYS")
+    retention_batch_size: int = Field(default=500, env="RETENTION_BATCH_SIZE")
+    # Free pages are returned in small incremental_vacuum steps; a full VACUUM (which locks out tracking)
+    # only runs inside the (start_hour, end_hour) window, and never by default
+    retention_vacuum_step_pages: int = Field(default=256, env="RETENTION_VACUUM_STEP_PAGES")
+    retention_full_vacuum_hours: Optional[Tuple[int, int]] = Field(default=None, env="RETENTION_FULL_VACUUM_HOURS")
+    retention_vacuum_free_ratio: float = Field(default=0.25, env="RETENTION_VACUUM_FREE_RATIO")
     
     class Config:
         env_file = ".env"